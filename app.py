@@ -1,5 +1,11 @@
 #! /usr/bin/env python3
-import os, sys, ctypes, signal
+import sys
+# --profile-startup prints where the time goes until the window is ready, see startup.py
+from startup import StartupProfile
+startupProfile = StartupProfile()
+if __name__=='__main__' and "--profile-startup" in sys.argv:
+	startupProfile.watchImports()
+import os, ctypes, signal, multiprocessing
 from pathlib import Path
 from os import path
 
@@ -19,14 +25,30 @@ else:
 	bundle_dir = path.abspath(Path(__file__).parent)
 	executable_dir = bundle_dir
 
-import os, subprocess, json, xlsxwriter, qtawesome, shutil, version
+if __name__=='__main__':
+	# worker processes of the frozen app start here
+	multiprocessing.freeze_support()
+	if "--batch" in sys.argv:
+		# headless batch mode, runs without Qt and libvlc. batch becomes the main module so the worker processes import it instead of this file
+		import runpy
+		sys.argv = [sys.argv[0]] + [arg for arg in sys.argv[1:] if arg != "--batch"]
+		runpy.run_module("batch", run_name="__main__", alter_sys=True)
+	elif "--rater" in sys.argv:
+		# rating-only client of a multi-rater session, without video
+		import runpy
+		sys.argv = [sys.argv[0]] + [arg for arg in sys.argv[1:] if arg != "--rater"]
+		runpy.run_module("rater", run_name="__main__", alter_sys=True)
+
+import os, version
 from PyQt5 import QtCore, QtGui, QtWidgets
 from PyQt5.QtCore import Qt
 from PyQt5.QtWidgets import QApplication, QHBoxLayout, QPushButton, QLabel, QMessageBox
 from PyQt5.QtGui import QFont
-from PyQt5.QtWidgets import QShortcut
-from PyQt5.QtGui import QKeySequence
-from playsound import playsound
+
+# decoded sounds and other derived files that can be rebuilt at any time
+cache_dir = path.join(QtCore.QStandardPaths.writableLocation(QtCore.QStandardPaths.GenericCacheLocation), "PsychometricStudy")
+# default.json of the user, it takes precedence over the ones next to the app
+config_dir = path.join(QtCore.QStandardPaths.writableLocation(QtCore.QStandardPaths.GenericConfigLocation), "PsychometricStudy")
 
 try:
 	# Load VLC
@@ -40,19 +62,40 @@ try:
 
 	import vlc
 	from vlc import EventType
-except:
+# python-vlc raises NotImplementedError when it finds no libvlc
+except (ImportError, OSError, NotImplementedError) as e:
 	app = QApplication(sys.argv)
 	# show error message box if VLC libraries can't be loaded
 	msgBox = QMessageBox()
 	msgBox.setIcon(QMessageBox.Critical)
 	msgBox.setText("Failed to load VLC libraries.")
+	msgBox.setInformativeText(str(e))
 	msgBox.setWindowTitle("Error")
 	sys.exit(msgBox.exec_())
+from playback import PlaybackStats
+from deck import Deck
+from mediacache import MediaCache
+from icons import IconCache, buttonStyleSheet
+from sampler import RatingSampler, SAMPLE_RATES
+from samplestore import SampleStore, MarkerStore
+from settings import SettingsWatcher, SCHEMA_BY_NAME, settingsFiles, loadSettings
+from saveworker import BackgroundSaver, SaveSnapshot, IncrementalSave, incrementalFilename
+import exporters
+import journal
+from journal import SessionJournal
+from feedbacksound import FeedbackSound
+from latency import LatencyTracker
+from keyinput import ButtonKeys
+# the live plot, the timeline previews, playlists and input devices are imported when they are first used
 import time, datetime
 from time import gmtime, strftime
 app_name = "Psychometric Study"
+startupProfile.mark("imports")
 
 class ClickableSlider(QtWidgets.QSlider):
+    # position 0..1 under the mouse and its global position, needs mouse tracking
+    hovered = QtCore.pyqtSignal(float, QtCore.QPoint)
+    left = QtCore.pyqtSignal()
 
     def mousePressEvent(self, event):
         if event.button() == QtCore.Qt.LeftButton:
@@ -61,25 +104,34 @@ class ClickableSlider(QtWidgets.QSlider):
             # Set the slider position to the clicked value
             self.setValue(int(click_value))
         super().mousePressEvent(event)
+
+    def mouseMoveEvent(self, event):
+        self.hovered.emit(min(max(event.pos().x() / self.width(), 0.0), 1.0), self.mapToGlobal(QtCore.QPoint(event.pos().x(), 0)))
+        super().mouseMoveEvent(event)
+
+    def leaveEvent(self, event):
+        self.left.emit()
+        super().leaveEvent(event)
 	
 
 
 class Window (QtWidgets.QMainWindow):
 	points = 0
-	x_axis = []
-	y_axis = []
-	points_list = []
-	markers_list = []
 	locked = False
 	playedTimes = 0
 
-	MINUTE = 0
-	SECOND = 1
-	MS = 2
-	UNIT = 2
+	MINUTE = journal.MINUTE
+	SECOND = journal.SECOND
+	MS = journal.MS
+	UNIT = MS
 
 	eta = 0  # elapsed time for counter
 
+	# ratings of an analog input device, emitted from its polling thread
+	deviceRatingChanged = QtCore.pyqtSignal(float)
+	# raters connected to or disconnected from the coordinator, emitted from its thread
+	ratersChanged = QtCore.pyqtSignal()
+
 	def __init__(self):
 		super(Window, self).__init__()
 		if sys.platform == "darwin":
@@ -93,35 +145,34 @@ class Window (QtWidgets.QMainWindow):
 		self.widget = QtWidgets.QWidget(self)
 		self.setCentralWidget(self.widget)
 
-		self.defaultConfig = {}
-		try:
-			# Check if the file exists
-			if os.path.isfile("default.json"):
-				# Open the file
-				with open("default.json", "r") as file:
-					# Load the JSON data from the file
-					self.defaultConfig = json.load(file)
-			else:
-				print("The config file does not exist.")
-
-		except Exception as e:
-			print(f"An error occurred: {e}")
+		# validated settings from default.json, the environment and the command line, see settings.py
+		self.settingsFiles = settingsFiles(bundle_dir, executable_dir, config_dir)
+		self.settings = loadSettings(self.settingsFiles)
+		if len(self.settings.errors) > 0:
+			QtCore.QTimer.singleShot(0, lambda: QtWidgets.QMessageBox.warning(self, "Settings", "\n".join(self.settings.errors)))
+		# changes to the files are applied without a restart where possible
+		self.settingsWatcher = SettingsWatcher(self.settingsFiles, self.settings, self)
+		self.settingsWatcher.reloaded.connect(self.settingsReloaded)
+		startupProfile.mark("settings")
 
 		self.excelFilename = None
-		self.videoframe = QtWidgets.QFrame()
-		self.palette = self.videoframe.palette()
-		self.palette.setColor(QtGui.QPalette.Window, QtGui.QColor(0, 0, 0))
-		self.videoframe.setPalette(self.palette)
-		self.videoframe.setAutoFillBackground(True)
-		self.videoframe.sizePolicy = QtWidgets.QSizePolicy(
-		    QtWidgets.QSizePolicy.Expanding, QtWidgets.QSizePolicy.Expanding)
-		self.videoframe.setSizePolicy(self.videoframe.sizePolicy)
+		# per-session columnar storage of the ratings and markers
+		self.samples = SampleStore()
+		self.markers = MarkerStore()
+		# every sample and marker is also appended to a journal on disk, to recover the session after a crash
+		self.journal = None
+		# every libvlc player draws into its own frame, the frame of the playing clip is shown
+		self.videoStack = QtWidgets.QStackedWidget()
+		self.videoStack.setSizePolicy(QtWidgets.QSizePolicy.Expanding, QtWidgets.QSizePolicy.Expanding)
 
 		self.hboxlayout = QtWidgets.QHBoxLayout()
 		# add some margins on the left and right
 		self.hboxlayout.setContentsMargins(10, 10, 10, 10)
 
-		self.shortcuts = []
+		# hotkeys call the button handlers directly and repeat held keys at their own rate
+		self.buttonKeys = ButtonKeys(self, self.settings.keyRepeatDelay, self.settings.keyRepeatRate)
+		# time from a hotkey or button press to the recorded sample
+		self.latency = LatencyTracker()
 
 		self.fontColor = "#3e3e3e"
 
@@ -157,12 +208,17 @@ class Window (QtWidgets.QMainWindow):
 
 		for button in self.buttons:
 			button.setdefault("color", self.fontColor)
+		self.buttonsByName = {button["name"]: button for button in self.buttons}
+		self.iconSize = 80
+		# the rendered icons are also kept in the cache directory, so later starts do not need qtawesome
+		self.iconCache = IconCache(directory=os.path.join(cache_dir, "icons"))
 
 		for button in self.buttons:
 			if "type" not in button or button["type"] == "button":
 				btn = QPushButton('')
+				btn.setObjectName(button["name"])
 				setattr(self, button["name"], btn)
-				btn.setIconSize(QtCore.QSize(80, 80))
+				btn.setIconSize(QtCore.QSize(self.iconSize, self.iconSize))
 				# set focus policy to no focus
 				btn.setFocusPolicy(QtCore.Qt.NoFocus)
 
@@ -170,10 +226,7 @@ class Window (QtWidgets.QMainWindow):
 				btn = QtWidgets.QSpacerItem(90, 90, QtWidgets.QSizePolicy.Fixed, QtWidgets.QSizePolicy.Fixed)
 				
 			if "icon" in button:
-				if "color" in button:
-					btn.setIcon(qtawesome.icon(button["icon"], color=button["color"]))
-				else:
-					btn.setIcon(qtawesome.icon(button["icon"], color=self.fontColor))
+				btn.setIcon(self.iconCache.icon(button["icon"], button["color"], self.iconSize))
 			elif "type" not in button or button["type"] == "button":
 				# set width and height to take the same space as the icon plus the padding
 				btn.setFixedSize(90, 90)
@@ -206,26 +259,18 @@ class Window (QtWidgets.QMainWindow):
 
 			if "type" not in button or button["type"] == "button":
 				if "hotkey" in button:
-					# loop over button["hotkey"] and add a shortcut for each one
+					# the hotkey runs the same handler as the button, without going through a click
+					handler = self.hotkeyHandler(self.beforeClick(button["pressed"] if "pressed" in button else button["clicked"]))
 					for hotkey in button["hotkey"]:
-						buttonShortcut = QShortcut(QKeySequence(hotkey), self)
-						if "setAutoRepeat" in button:
-							buttonShortcut.setAutoRepeat(button["setAutoRepeat"])
-						else:
-							buttonShortcut.setAutoRepeat(False)
-						buttonShortcut.setEnabled(True)
-						# add lamda to connect and only run handler if button is enabled and visibily press the button
-						buttonShortcut.activated.connect(lambda btn=btn: btn.animateClick(100) if btn.isEnabled() else None)
-						# add the shortcut to the list of shortcuts
-						self.shortcuts.append(buttonShortcut)
-				if "color" in button:
-					btn.setStyleSheet("color: " + button["color"])
-				else:
-					btn.setStyleSheet("color: " + self.fontColor)
+						self.buttonKeys.bind(hotkey, btn, handler, button.get("released"), button.get("setAutoRepeat", False))
+
+		self.widget.setStyleSheet(buttonStyleSheet(self.buttons, self.fontColor))
 
 		self.vboxlayout = QtWidgets.QVBoxLayout()
 		self.vboxlayout.setContentsMargins(0, 0, 0, 0)
-		self.vboxlayout.addWidget(self.videoframe)
+		self.vboxlayout.addWidget(self.videoStack)
+		# live strip chart of the ratings and markers for the supervisor of the session, built when it is first shown
+		self.ratingPlot = None
 
 		hbox = QtWidgets.QHBoxLayout()
 		hbox.setContentsMargins(10, 0, 10, 0)
@@ -236,9 +281,12 @@ class Window (QtWidgets.QMainWindow):
 		self.slider.setMinimum(0)
 		self.slider.setMaximum(10000)
 		self.slider.setEnabled(False)
-		self.sliderNewValue = -1 # This is used to note if the slider was moved to avoid calling vlc too often when scrubbing
-		self.sliderLastChange = datetime.datetime.now()
+		# scrubbing seeks right away, the seek scheduler of the engine merges the seeks that libvlc cannot keep up with
 		self.slider.valueChanged.connect(self.sliderChanged)
+		# hovering shows a preview from the timeline index instead of seeking
+		self.slider.setMouseTracking(True)
+		self.slider.hovered.connect(self.sliderHovered)
+		self.slider.left.connect(self.sliderLeft)
 		
 
 		self.totalTime = QtWidgets.QLabel("0:00:00")
@@ -269,57 +317,372 @@ class Window (QtWidgets.QMainWindow):
 		self.hotkeyLabel.setStyleSheet("color: " + self.fontColor)
 		self.vboxlayout.addWidget(self.hotkeyLabel)
 
+		self.saver = BackgroundSaver(self)
+		self.saver.started.connect(self.saveStarted)
+		self.saver.progress.connect(self.saveProgress)
+		self.saver.saved.connect(self.saveSucceeded)
+		self.saver.failed.connect(self.saveFailed)
+		self.saver.cancelled.connect(self.saveCancelled)
+		self.saveProgressBar = QtWidgets.QProgressBar()
+		self.saveProgressBar.setRange(0, 100)
+		self.saveProgressBar.setMaximumWidth(200)
+		self.cancelSaveButton = QPushButton("Cancel")
+		self.cancelSaveButton.clicked.connect(self.cancelSave)
+		self.statusBar().addPermanentWidget(self.saveProgressBar)
+		self.statusBar().addPermanentWidget(self.cancelSaveButton)
+		self.saveProgressBar.hide()
+		self.cancelSaveButton.hide()
+		# thumbnails and loudness of the video for the previews on the slider, built in worker processes and cached on disk.
+		# The indexer and the preview are created for the first video that is indexed, see timelineIndexer.
+		self.timelineIndex = None
+		self.timelinePreview = None
+		self.indexer = None
+		self.indexProgressBar = QtWidgets.QProgressBar()
+		self.indexProgressBar.setRange(0, 100)
+		self.indexProgressBar.setMaximumWidth(200)
+		self.indexProgressBar.setFormat("Timeline %p%")
+		self.cancelIndexButton = QPushButton("Cancel indexing")
+		self.cancelIndexButton.clicked.connect(self.cancelIndexing)
+		self.statusBar().addPermanentWidget(self.indexProgressBar)
+		self.statusBar().addPermanentWidget(self.cancelIndexButton)
+		self.indexProgressBar.hide()
+		self.cancelIndexButton.hide()
+		# live input latency in the status bar, for checking a setup before running a study
+		self.latencyLabel = None
+		if "--latency" in sys.argv or self.settings.showLatencyOverlay:
+			self.latencyLabel = QLabel()
+			self.statusBar().addPermanentWidget(self.latencyLabel)
+			self.updateLatencyOverlay()
+
+		startupProfile.mark("controls")
 		self.createMenu()
-		self.setUpVLC()
-
+		startupProfile.mark("menu")
 		self.prevSecond = 0
-		if "defaultVideoPath" in self.defaultConfig:
-			self.loadVideoFromPath(self.defaultConfig["defaultVideoPath"])
-
 		self.isPaused = True
-
-		self.timer = QtCore.QTimer(self)
-		self.timer.setInterval(200)
-		self.timer.timeout.connect(self.updateUI)
-		self.timer.start()
+		self.hasUnsavedChanges = False
+		# with "incrementalSave" quick saves only append the new rows, the full export is written at the end
+		self.incremental = None
+		self.exportPending = False
+		self.controlState = {}
+		self.setUpVLC()
+		startupProfile.mark("vlc")
+		if self.settings.showLivePlot:
+			self.toggleLivePlot(True)
+		self.updateControls()
+		# the default video and the recovery of unfinished sessions wait for the first paint, so the window shows up first
+		self.painted = False
+		self.startupSteps = set()
+
+	def paintEvent(self, event):
+		super(Window, self).paintEvent(event)
+		if not self.painted:
+			self.painted = True
+			startupProfile.mark("firstPaint")
+			QtCore.QTimer.singleShot(0, self.afterFirstPaint)
+
+	def afterFirstPaint(self):
+		# the startup is over once the default video is loaded, which can happen before or after this returns
+		self.startupSteps = {"recovery"}
+		if self.settings.playlist is not None:
+			from playlist import PlaylistError, playlistFromConfig
+			self.startupSteps.add("video")
+			try:
+				self.startPlaylist(playlistFromConfig(self.settings.playlist, self.settings.directoryOf("playlist")))
+			except PlaylistError as e:
+				self.startupSteps.discard("video")
+				print(f"An error occurred: {e}")
+		elif self.settings.defaultVideoPath:
+			self.startupSteps.add("video")
+			self.loadVideoFromPath(self.settings.defaultVideoPath)
+		# look for sessions that did not end cleanly
+		self.recoverJournals()
+		self.startupStepDone("recovery")
+
+	def startupStepDone(self, step):
+		if step not in self.startupSteps:
+			return
+		self.startupSteps.discard(step)
+		startupProfile.mark(step)
+		if len(self.startupSteps) == 0:
+			startupProfile.mark("ready")
+			if "--profile-startup" in sys.argv:
+				startupProfile.printReport(os.path.join(executable_dir, "startup-profile.txt"))
+				if "--quit-after-startup" in sys.argv:
+					QtCore.QCoreApplication.instance().quit()
 
 	def setUpVLC(self):
+		self.stats = PlaybackStats("--stats" in sys.argv or self.settings.printPlaybackStats, self)
 		self.vlc_instance = vlc.Instance()
-		self.mediaplayer = self.vlc_instance.media_player_new()
+		# keyframe seeks for the slider and the skip button, faster but less exact
+		self.fastSeek = self.settings.fastSeek
 		self.media = None
-		self.mediaplayer.video_set_key_input(False) # disable hotkeys on VLC
-		self.mediaplayer.video_set_mouse_input(False) # disable mouse events on VLC
-
-		if sys.platform.startswith('linux'):  # for Linux using the X Server
-			self.mediaplayer.set_xwindow(int(self.videoframe.winId()))
-		elif sys.platform == "win32":  # for Windows
-			self.mediaplayer.set_hwnd(self.videoframe.winId())
-		elif sys.platform == "darwin":  # for MacOS
-			self.mediaplayer.set_nsobject(int(self.videoframe.winId()))
+		self.mediaInfo = None
+		self.afterLoad = None
+		# static metadata of the videos is parsed in the background once and then cached on disk
+		self.mediaCache = MediaCache(os.path.join(cache_dir, "media.json"))
+		# a playlist session plays its clips one after another on two decks, see Deck
+		self.playlist = None
+		self.clipOffset = 0
+		self.decks = []
+		self.deck = None
+		self.activateDeck(self.newDeck())
+		self.stats.isPlaying = lambda: self.engine.isPlaying()
+		# the ratings are sampled on a worker thread so they keep being recorded while the GUI is busy
+		self.sampler = RatingSampler(self.sessionTime, lambda: self.engine.vlcIsPlaying(), self.recordSample, self.settings.sampleRate)
+		self.sampler.start()
+		# the click sound stays loaded in its own output instead of starting a new player per click
+		self.feedbackSound = FeedbackSound(self.vlc_instance, bundle_dir + os.sep + "buttonSound.mp3", cache_dir, parent=self)
+		self.inputPoller = None
+		if self.settings.inputDevice is not None:
+			self.startInputDevice(self.settings.inputDevice)
+		self.coordinator = None
+		if "--coordinator" in sys.argv or self.settings.coordinator:
+			address = self.settings.coordinator
+			self.startCoordinator(address if isinstance(address, str) else None)
+
+	def newDeck(self):
+		videoframe = QtWidgets.QFrame()
+		palette = videoframe.palette()
+		palette.setColor(QtGui.QPalette.Window, QtGui.QColor(0, 0, 0))
+		videoframe.setPalette(palette)
+		videoframe.setAutoFillBackground(True)
+		self.videoStack.addWidget(videoframe)
+		deck = Deck(self.vlc_instance, self.stats, self.mediaCache, videoframe, parent=self)
+		deck.loader.loaded.connect(self.mediaLoaded)
+		deck.ready.connect(self.nextClipReady)
+		self.decks.append(deck)
+		return deck
+
+	def activateDeck(self, deck):
+		# the controls follow the engine of the deck that is shown, the UI is driven by libvlc events instead of polling the player
+		if self.deck is not None:
+			self.engine.stateChanged.disconnect(self.playerStateChanged)
+			self.engine.timeChanged.disconnect(self.playerTimeChanged)
+			self.engine.durationChanged.disconnect(self.playerDurationChanged)
+			self.engine.endReached.disconnect(self.playerEndReached)
+		self.deck = deck
+		self.mediaplayer = deck.mediaplayer
+		self.engine = deck.engine
+		self.media = deck.media
+		self.mediaInfo = deck.info
+		self.engine.stateChanged.connect(self.playerStateChanged)
+		self.engine.timeChanged.connect(self.playerTimeChanged)
+		self.engine.durationChanged.connect(self.playerDurationChanged)
+		self.engine.endReached.connect(self.playerEndReached)
+		self.videoStack.setCurrentWidget(deck.frame)
+
+	def standbyDeck(self):
+		if len(self.decks) < 2:
+			return self.newDeck()
+		return self.decks[1] if self.deck is self.decks[0] else self.decks[0]
+
+	def sessionTime(self, monotonicTime=None):
+		# media time of the playing clip plus the durations of the clips played before it, safe to call from any thread
+		return self.clipOffset + self.engine.mediaTime(monotonicTime)
+
+	def hotkeyHandler(self, eventHandler):
+		def keyHandler():
+			self.latency.begin("key")
+			eventHandler()
+		return keyHandler
 
 	def beforeClick(self, func):
 		# make an event handler
 		def eventHandler(event=None):
+			self.latency.mark("handler")
 			try:
-				playsound(bundle_dir + os.sep + "buttonSound.mp3", block=False)
-				self.lastButtonSoundPlayed = datetime.datetime.now()
+				self.feedbackSound.play()
 			finally:
 				# dynamically call func
 				func(event)
+				# an input that did not record a sample or marker is not counted
+				self.latency.end()
+				self.updateLatencyOverlay()
 			
 		return eventHandler
 
+	def updateLatencyOverlay(self):
+		if self.latencyLabel is not None:
+			last, p95 = self.latency.last, self.latency.percentile(95)
+			self.latencyLabel.setText("Input to record: " + (f"{last * 1000:.1f} ms, p95 {p95 * 1000:.1f} ms, {self.latency.count()} inputs" if last is not None else "-"))
+
 	def updateCounter(self):
-		self.counterLabel.setText(str(self.points))
+		self.setControl("counterLabel", "setText", f"{self.points:g}")
+
+	def startInputDevice(self, config):
+		# an analog dial or joystick sets the rating, read on its own thread and passed to the sampler with the time of the reading
+		import inputdevices
+		from inputdevices import AxisMapper, AxisPoller, InputDeviceError
+		device = inputdevices.deviceFromConfig(config)
+		mapper = AxisMapper(self.lower_slider_value, self.upper_slider_value, config.get("smoothing", inputdevices.DEFAULT_SMOOTHING),
+			config.get("deadband", inputdevices.DEFAULT_DEADBAND), config.get("resolution", inputdevices.DEFAULT_RESOLUTION), config.get("invert", False))
+		self.inputPoller = AxisPoller(device, mapper, self.deviceRating, config.get("rate", inputdevices.DEFAULT_POLL_RATE))
+		self.deviceRatingChanged.connect(self.applyDeviceRating)
+		try:
+			self.inputPoller.start()
+		except InputDeviceError as e:
+			self.inputPoller = None
+			QtWidgets.QMessageBox.warning(self, "Input Device", str(e))
+
+	def startCoordinator(self, address=None):
+		# other raters follow the media clock of this app and their ratings go into its export, see rater.py.
+		# asyncio is only imported for a multi-rater session.
+		from multirater import Coordinator, MultiRaterError, DEFAULT_ADDRESS
+		self.coordinator = Coordinator(address or DEFAULT_ADDRESS, self.sessionTime, lambda: self.engine.vlcIsPlaying(), changed=self.ratersChanged.emit)
+		try:
+			self.coordinator.start()
+		except MultiRaterError as e:
+			self.coordinator = None
+			QtWidgets.QMessageBox.warning(self, "Multi-rater Session", str(e))
+			return
+		self.ratersLabel = QLabel()
+		self.statusBar().addPermanentWidget(self.ratersLabel)
+		self.ratersChanged.connect(self.updateRatersLabel)
+		self.updateRatersLabel()
+
+	def updateRatersLabel(self):
+		self.ratersLabel.setText(f"Raters: {self.coordinator.connected()} connected on {self.coordinator.address}")
+
+	def stopCoordinator(self):
+		if self.coordinator is not None:
+			self.coordinator.stop()
+			self.coordinator = None
+
+	def printSeekStats(self):
+		if self.stats.enabled:
+			requested, sent, median, maximum = self.engine.seeker.stats()
+			if median is not None:
+				print(f"seeks: {requested} requested, {sent} sent to libvlc, seek latency median {median * 1000:.0f} ms, max {maximum * 1000:.0f} ms")
+
+	def stopInputDevice(self):
+		if self.inputPoller is not None:
+			self.inputPoller.stop()
+			self.inputPoller = None
+
+	def updatePlotSpan(self):
+		if self.ratingPlot is not None and self.hasMedia():
+			self.ratingPlot.setSpan((self.clipOffset + self.engine.duration)/self.timeFactor())
+
+	def toggleLivePlot(self, checked):
+		if checked and self.ratingPlot is None:
+			# the plot reads the whole session from the stores when it is built
+			from ratingplot import RatingPlot
+			self.ratingPlot = RatingPlot(self.samples, self.markers)
+			self.ratingPlot.setFixedHeight(self.settings.livePlotHeight)
+			self.ratingPlot.setRange(self.lower_slider_value, self.upper_slider_value)
+			self.vboxlayout.insertWidget(self.vboxlayout.indexOf(self.videoStack) + 1, self.ratingPlot)
+			self.updatePlotSpan()
+		if self.ratingPlot is not None:
+			self.ratingPlot.setVisible(checked)
+
+	def settingsReloaded(self, settings, changes):
+		# a settings file changed, the live settings are applied now and the others after a restart
+		restart = []
+		for name in changes:
+			if not SCHEMA_BY_NAME[name].live:
+				restart.append(name)
+				continue
+			setattr(self.settings, name, getattr(settings, name))
+			self.applySetting(name)
+		if len(settings.errors) > 0:
+			self.statusBar().showMessage("Settings: " + "; ".join(settings.errors), 10000)
+		elif len(restart) > 0:
+			self.statusBar().showMessage("Settings: " + ", ".join(restart) + " will change after a restart", 10000)
+		elif len(changes) > 0:
+			self.statusBar().showMessage("Settings: " + ", ".join(changes) + " changed", 5000)
+
+	def applySetting(self, name):
+		# settings that are not read at every use
+		if name in ("lowerSliderValue", "upperSliderValue"):
+			self.lower_slider_value = self.settings.lowerSliderValue
+			self.upper_slider_value = self.settings.upperSliderValue
+			self.updateInputRange()
+		elif name == "skipTimeInSec":
+			self.skipTimeInSec = self.settings.skipTimeInSec
+		elif name == "sampleRate":
+			self.sampler.setRate(self.settings.sampleRate)
+		elif name in ("keyRepeatDelay", "keyRepeatRate"):
+			self.buttonKeys.setRepeat(self.settings.keyRepeatDelay, self.settings.keyRepeatRate)
+		elif name == "showLivePlot":
+			self.livePlotAction.setChecked(self.settings.showLivePlot)
+		elif name == "livePlotHeight" and self.ratingPlot is not None:
+			self.ratingPlot.setFixedHeight(self.settings.livePlotHeight)
+
+	def updateInputRange(self):
+		if self.ratingPlot is not None:
+			self.ratingPlot.setRange(self.lower_slider_value, self.upper_slider_value)
+		if self.inputPoller is not None:
+			self.inputPoller.mapper.setRange(self.lower_slider_value, self.upper_slider_value)
+			self.inputPoller.resend()
+
+	def deviceRating(self, value, monotonicTime):
+		# called from the polling thread
+		self.sampler.setRating(value, monotonicTime)
+		self.deviceRatingChanged.emit(value)
+
+	def applyDeviceRating(self, value):
+		self.points = value
+		self.updateCounter()
 
 	def sliderChanged(self, val):
-		self.sliderNewValue = val
+		self.changeVideoPositionFromSlider(val)
 
 	def changeVideoPositionFromSlider(self, val):
 		newPosition = val/10000.0
 		if newPosition >= 1.0:
 			newPosition = 0.99999
-		self.mediaplayer.set_position(float(newPosition))
+		self.engine.setPosition(float(newPosition), self.fastSeek)
+
+	def sliderHovered(self, position, globalPos):
+		if self.timelineIndex is not None and self.hasMedia():
+			self.timelinePreview.showAt(self.timelineIndex, position * self.engine.duration, globalPos)
+
+	def sliderLeft(self):
+		if self.timelinePreview is not None:
+			self.timelinePreview.hide()
+
+	def timelineIndexer(self):
+		if self.indexer is None:
+			from timeline import TimelineIndexer, TimelinePreview
+			self.timelinePreview = TimelinePreview(self)
+			self.indexer = TimelineIndexer(os.path.join(cache_dir, "timeline"), self.settings.timelineWorkers, parent=self)
+			self.indexer.progress.connect(self.indexProgress)
+			self.indexer.finished.connect(self.indexFinished)
+			self.indexer.failed.connect(self.indexFailed)
+			self.indexer.cancelled.connect(self.indexCancelled)
+		return self.indexer
+
+	def startTimelineIndex(self):
+		self.timelineIndex = None
+		self.sliderLeft()
+		if self.settings.timelineIndex and self.mediaInfo is not None:
+			self.timelineIndexer().index(self.filename, self.mediaInfo)
+
+	def indexProgress(self, fraction):
+		self.indexProgressBar.setValue(int(fraction * 100))
+		self.indexProgressBar.show()
+		self.cancelIndexButton.show()
+
+	def indexFinished(self, path, index):
+		self.indexFinishedOrStopped()
+		if path == self.filename:
+			self.timelineIndex = index
+
+	def indexFailed(self, message):
+		self.indexFinishedOrStopped()
+		print(f"The timeline index could not be built: {message}")
+
+	def indexCancelled(self):
+		self.indexFinishedOrStopped()
+		self.statusBar().showMessage("Indexing the timeline was cancelled", 10000)
+
+	def indexFinishedOrStopped(self):
+		self.indexProgressBar.hide()
+		self.cancelIndexButton.hide()
+
+	def cancelIndexing(self, event=None):
+		if self.indexer is not None:
+			self.indexer.cancel()
 
 	def sliderSilentValue(self, val):
 		self.slider.blockSignals(True)
@@ -332,8 +695,9 @@ class Window (QtWidgets.QMainWindow):
 	def pause(self, event = None):
 		self.isPaused = True
 		if self.mediaplayer != None:
-			if (self.mediaplayer.get_state() == vlc.State.Playing):
+			if self.engine.isPlaying():
 				self.mediaplayer.pause()
+		self.updateControls()
 			
 
 	def backButtonClicked(self, event = None):
@@ -343,18 +707,19 @@ class Window (QtWidgets.QMainWindow):
 		self.seekBySeconds(1)
 
 	def skipButtonClicked(self, event = None):
-		self.seekBySeconds(self.skipTimeInSec)
+		self.seekBySeconds(self.skipTimeInSec, self.fastSeek)
 		
-	def seekBySeconds(self, skipTimeInSec):
+	def seekBySeconds(self, skipTimeInSec, fast=False):
 		if self.hasMedia():
-			videoLength = self.media.get_duration()
-			videoTime = self.mediaplayer.get_time() 
+			videoLength = self.engine.duration
+			# repeated presses add up from the target of the last seek, which is cached right away
+			videoTime = self.engine.time
 			if videoTime + (skipTimeInSec * 1000) > videoLength:
-				self.mediaplayer.set_time(videoLength)
+				self.engine.setTime(videoLength, fast)
 			elif videoTime + (skipTimeInSec * 1000) < 0:
-				self.mediaplayer.set_time(0)
+				self.engine.setTime(0, fast)
 			else:
-				self.mediaplayer.set_time(videoTime + (skipTimeInSec * 1000))
+				self.engine.setTime(videoTime + (skipTimeInSec * 1000), fast)
 
 	def releaseButton(self):
 		self.locked = False
@@ -365,6 +730,8 @@ class Window (QtWidgets.QMainWindow):
 			self.points += 1
 			self.locked = True
 			self.eta = time.time()
+			self.latency.expect(self.points)
+			self.sampler.setRating(self.points)
 
 	def decrease(self, event = None):
 		tf = self.timeFactor()
@@ -372,6 +739,8 @@ class Window (QtWidgets.QMainWindow):
 			self.points -= 1
 			self.locked = True
 			self.eta = time.time()
+			self.latency.expect(self.points)
+			self.sampler.setRating(self.points)
 
 	def restartVideo(self):
 		if self.mediaplayer != None:
@@ -380,222 +749,258 @@ class Window (QtWidgets.QMainWindow):
 			# initialise seconds elapsed
 			self.sliderSilentValue(0)
 			self.prevSecond = 0
-			self.mediaplayer.set_position(0.0)
+			self.engine.setPosition(0.0)
 
 	def stopButtonClicked(self, event = None):
 		self.restartVideo()
 
-	def updateUI(self):
-		hasMedia = self.hasMedia()
+	def setControl(self, name, method, value):
+		# only touch the widget if the value is different from the last one that was applied
+		key = (name, method)
+		if self.controlState.get(key) != value:
+			self.controlState[key] = value
+			getattr(getattr(self, name), method)(value)
 
+	def updateControls(self):
+		hasMedia = self.hasMedia()
 		if hasMedia:
-			self.isPaused = self.mediaplayer.get_state() in {vlc.State.Paused, vlc.State.NothingSpecial}
+			self.isPaused = not self.engine.isActive()
 
 		showButtons = not self.isPaused
-		self.backButton.setEnabled(hasMedia)
-		self.nextButton.setEnabled(hasMedia)
-		self.skipButton.setEnabled(hasMedia)
-		self.stopButton.setEnabled(hasMedia)
-		self.saveButton.setEnabled(hasMedia and self.hasUnsavedChanges)
-		self.incButton.setEnabled(showButtons)
-		self.decButton.setEnabled(showButtons)
-		self.markerButton.setEnabled(showButtons)
-		self.deleteButton.setEnabled(hasMedia and len(self.points_list) > 0)
-		self.slider.setEnabled(hasMedia)
+		for name in ["backButton", "nextButton", "skipButton", "stopButton", "slider"]:
+			self.setControl(name, "setEnabled", hasMedia)
+		self.setControl("saveButton", "setEnabled", hasMedia and self.hasUnsavedChanges)
+		for name in ["incButton", "decButton", "markerButton"]:
+			self.setControl(name, "setEnabled", showButtons)
+		self.setControl("deleteButton", "setEnabled", hasMedia and len(self.samples) > 0)
 
 		# show the correct icon on the play/pause Button
-		if showButtons:
-			button_names = ["pauseButton"]
-		else:
-			button_names = ["playButton"]
-		buttonItem = [button for button in self.buttons if button["name"] in button_names][0]
-		self.playButton.setIcon(qtawesome.icon(buttonItem["icon"], color=buttonItem["color"]))
+		if self.controlState.get("showPauseIcon") != showButtons:
+			self.controlState["showPauseIcon"] = showButtons
+			buttonItem = self.buttonsByName["pauseButton" if showButtons else "playButton"]
+			self.playButton.setIcon(self.iconCache.icon(buttonItem["icon"], buttonItem["color"], self.iconSize))
 
 		if hasMedia:
-				playerTime = self.mediaplayer.get_time()
-				sec = int(playerTime/1000)
-				self.timeElapsed.setText(str(datetime.timedelta(seconds=sec)))
-				videoLength = self.media.get_duration()
-				if videoLength > 0:
-					# handle the slider being moved or move the slider
-					if self.sliderNewValue != -1 and (datetime.datetime.now() - self.sliderLastChange >= datetime.timedelta(seconds=0.5)):
-						self.changeVideoPositionFromSlider(self.sliderNewValue)
-						self.sliderNewValue = -1
-						self.sliderLastChange = datetime.datetime.now()
-					elif self.sliderNewValue == -1:
-						scaled_player_time = int((playerTime / videoLength) * 10000)
-						self.sliderSilentValue(scaled_player_time)
-
-		if hasMedia and self.mediaplayer.is_playing():
-			self.updateCounter()		
-			tf = self.timeFactor()
-
-			if (sec != self.prevSecond):
-				self.points_list.append([int(playerTime/tf), self.points])
-				self.hasUnsavedChanges = True
+			windowTitle = app_name + ('*' if self.hasUnsavedChanges else '')
+			if self.windowTitle() != windowTitle:
+				self.setWindowTitle(windowTitle)
 
-			if "autoReturnRatingsToZero" in self.defaultConfig and self.defaultConfig["autoReturnRatingsToZero"] == True:
+	def setUnsavedChanges(self, value):
+		if self.hasUnsavedChanges != value:
+			self.hasUnsavedChanges = value
+			self.updateControls()
+
+	def playerStateChanged(self, state):
+		if state == vlc.State.Playing and self.playlist is not None:
+			gap = self.playlist.clipStarted(self.engine.stateTime)
+			if gap is not None:
+				message = f"Clip {self.playlist.index + 1} of {len(self.playlist)} started {gap * 1000:.1f} ms after the end of the previous clip"
+				print(message)
+				self.statusBar().showMessage(message, 5000)
+		self.updateControls()
+
+	def playerDurationChanged(self, duration):
+		self.totalTime.setText(str(datetime.timedelta(seconds=int(duration/1000))))
+		self.updatePlotSpan()
+		self.updateControls()
+
+	def playerTimeChanged(self, playerTime):
+		if not self.hasMedia():
+			return
+		sec = int(playerTime/1000)
+		self.setControl("timeElapsed", "setText", str(datetime.timedelta(seconds=sec)))
+		if self.ratingPlot is not None:
+			self.ratingPlot.setPlayhead((self.clipOffset + playerTime)/self.timeFactor())
+		# move the slider unless the user is scrubbing
+		if not self.slider.isSliderDown():
+			scaled_player_time = int((playerTime / self.engine.duration) * 10000)
+			if self.slider.value() != scaled_player_time:
+				self.sliderSilentValue(scaled_player_time)
+
+		if self.engine.isPlaying():
+			self.updateCounter()
+			# the sampler thread records the ratings, only reflect that in the controls here
+			if len(self.samples) > 0 and not self.hasUnsavedChanges:
+				self.setUnsavedChanges(True)
+			elif len(self.samples) > 0 and not self.controlState.get(("deleteButton", "setEnabled")):
+				self.updateControls()
+
+			if self.settings.autoReturnRatingsToZero and self.inputPoller is None:
 				if (sec != self.prevSecond) and self.locked == False:
-					tf = self.timeFactor()
 					if (time.time()-self.eta) >= 2:
 						if self.points > 0:
 							self.points -= 1
 						if self.points < 0:
 							self.points += 1
+						self.sampler.setRating(self.points)
+
+			self.prevSecond = sec
+
+	def playerEndReached(self):
+		if self.playlist is not None and self.playlist.hasNext():
+			self.playlist.clipEnded(self.engine.stateTime)
+			self.nextClip()
+			return
+		# If the end is reached while playing or skipping, we need to stop the video and show the last frame with a workaround so the controls keep working.
+		# The engine does that step by step on the libvlc events, so the UI keeps running meanwhile
+		if self.mediaplayer != None and self.media and self.mediaplayer.will_play() == False:
+			self.isPaused = True
+			self.engine.endOfMedia.start()
 
-			self.prevSecond = int(playerTime/1000)
+		if self.hasMedia() and (self.hasUnsavedChanges or self.exportPending):
+			# automatically open saveAs if the file played to the end, after this event has been handled
+			if self.settings.saveAfterPlaying:
+				QtCore.QTimer.singleShot(0, self.saveAfterPlaying)
 
-		# If the end is reached while playing or skipping, we need to stop the video and show the last frame with a workaround so the controls keep working
-		if self.mediaplayer != None and self.media and self.mediaplayer.get_state() == vlc.State.Ended and self.mediaplayer.will_play() == False:
-			self.isPaused = True
-			self.mediaplayer.stop()
-			vlc_playing = set([3, 4]) #  3 - Playing | 4 - Paused
-			media_state = self.mediaplayer.get_state()
-			while media_state not in vlc_playing:
-				self.mediaplayer.play()
-				time.sleep(0.01)
-				media_state = self.mediaplayer.get_state()
-			while media_state != vlc.State.Paused:
-				self.mediaplayer.pause()
-				time.sleep(0.01)
-				media_state = self.mediaplayer.get_state()
-			self.mediaplayer.set_position(0.999)
+	def recordSample(self, mediaTime, value, monotonicTime):
+		# called from the sampler thread
+		sampleTime = int(mediaTime/self.timeFactor())
+		self.samples.append(sampleTime, value, monotonicTime)
+		if self.journal is not None:
+			self.journal.append(journal.SAMPLE, sampleTime, value, monotonicTime)
+		self.latency.recorded(value, monotonicTime)
 
-		if self.hasMedia() and self.hasUnsavedChanges:
-			windowTitle = app_name + '*'
-			if self.windowTitle() != windowTitle:
-				self.setWindowTitle(windowTitle)
-			if self.mediaplayer.get_position() >= 0.999 and self.mediaplayer.is_playing():
-				# automatically open saveAs if the file played to the end.
-				if not ("saveAfterPlaying" in self.defaultConfig and self.defaultConfig["saveAfterPlaying"] != True):
-						self.saveAs(None)
-		if self.hasMedia() and not self.hasUnsavedChanges:
-			windowTitle = app_name
-			if self.windowTitle() != windowTitle:
-				self.setWindowTitle(windowTitle)
+	def exportFormat(self):
+		return self.settings.exportFormat
 
 	def setTheFilename(self):
-		self.excelFilename = QtWidgets.QFileDialog.getSaveFileName(
-		    None, 'Save File', '', 'Excel Files (*.xlsx);;All Files (*)')[0]
+		# the filters of the dialog select the export format, the format from default.json comes first
+		available = sorted(exporters.availableExporters(), key=lambda exporter: exporter.name != self.exportFormat())
+		filters = [exporter.fileFilter() for exporter in available]
+		self.excelFilename, selectedFilter = QtWidgets.QFileDialog.getSaveFileName(
+		    None, 'Save File', self.saveFolder(''), ';;'.join(filters + ['All Files (*)']))
 		if self.excelFilename == '':
 			self.excelFilename = None
+		elif selectedFilter in filters and os.path.splitext(self.excelFilename)[1] == '':
+			self.excelFilename += available[filters.index(selectedFilter)].extension
 		
 	def saveButton(self, event):
 		if self.excelFilename is None:
 			self.saveAs(event)
+		else:
+			self.quickSave(event)
+
+	def incrementalSaving(self):
+		return self.settings.incrementalSave
+
+	def quickSave(self, event=None):
+		# intermediate saves during the session, incremental ones leave the full export for the end
+		if self.incrementalSaving():
+			self.saveIncrement()
 		else:
 			self.save(event)
 
+	def saveAfterPlaying(self):
+		# the final export goes to the file of the incremental saves without asking again
+		if self.incrementalSaving() and self.excelFilename is not None:
+			self.save(None)
+		else:
+			self.saveAs(None)
+
+	def finalExport(self):
+		# on quit, the rows of the incremental saves still need their full export
+		if self.exportPending and self.excelFilename is not None and self.hasData():
+			self.save(None)
+
 	def saveAs(self, event):
 		self.setTheFilename()
 		if self.excelFilename is not None:
 			self.save(event)
 
 	def hasData(self):
-		return len(self.points_list) > 0 or len(self.markers_list) > 0
+		return len(self.samples) > 0 or len(self.markers) > 0 or (self.coordinator is not None and any(len(store) > 0 for name, store in self.coordinator.raters()))
 
-	def save(self, event):
-		self.pause()
+	def saveFolder(self, default):
+		# "defaultExcelSaveFolder", relative paths are relative to the default.json that sets it
+		if self.settings.defaultExcelSaveFolder is None:
+			return default
+		return os.path.join(self.settings.directoryOf("defaultExcelSaveFolder"), os.path.expanduser(self.settings.defaultExcelSaveFolder))
 
-		self.x_axis = []
-		self.y_axis = []
-		self.markers_axis = []
-		temporaryList = {}
+	def defaultFilename(self):
+		return self.saveFolder(executable_dir) + os.sep + os.path.basename(
+		    self.playlist.name if self.playlist is not None else self.filename)+" ("+str(self.playedTimes)+") "+strftime("%Y-%m-%d %H-%M-%S", gmtime()) + exporters.exporterByName(self.exportFormat()).extension
 
+	def save(self, event):
 		if self.excelFilename is None:
-			self.excelFilename = executable_dir + os.sep + os.path.basename(
-			    self.filename)+" ("+str(self.playedTimes)+") "+strftime("%Y-%m-%d %H-%M-%S", gmtime()) + ".xlsx"
+			self.excelFilename = self.defaultFilename()
 
 		if self.hasData():
-			for i in range(0, len(self.points_list)):
-				[y, value] = self.points_list[i]
-				temporaryList[y] = value
-			# Only take the latest value in the list
-
-			# iterate over the hash temporaryList	and get the key and value
-			sortedMarkersList = dict(sorted(self.markers_list)).items()
-			# turn sortedMarkersList which is an array with [key,value] into a list with key: value
-			sortedMarkersList = {k: v for k, v in sortedMarkersList}
-			
-			for y, value in dict(sorted(temporaryList.items())).items():
-				self.x_axis.append(y)
-				self.y_axis.append(value)
-				if self.lower_slider_value < 0 and self.upper_slider_value > 0:
-					markerPosition = 0
-				else:
-					markerPosition = self.lower_slider_value
-				if y in sortedMarkersList:
-					currentMarker = markerPosition if sortedMarkersList[y] == 1 else None
-				else:
-					currentMarker = None
-				
-				self.markers_axis.append(currentMarker)
-
-			workbook = xlsxwriter.Workbook(self.excelFilename)
-			worksheet = workbook.add_worksheet()
-
-			data = [self.x_axis, self.y_axis, self.markers_axis]
-			for i in range(0, len(data[0])):
-				data[0][i] = str(datetime.timedelta(seconds=int(data[0][i])))
-			worksheet.write_column('A1', data[0])
-			worksheet.write_column('B1', data[1])
-			worksheet.write_column('C1', data[2])
-
-			chart = workbook.add_chart({'type': 'line'})
-
-			chart.add_series({
-				'categories': '=Sheet1!$A$1:$A$'+str(len(self.x_axis)),
-				'values': '=Sheet1!$B$1:$B$'+str(len(self.y_axis)),
-				'name': 'Psychometric Study'
-			})
-
-			marker_chart = workbook.add_chart({'type': 'scatter'})
-			marker_chart.add_series({
-				'categories': '=Sheet1!$A$1:$A$'+str(len(self.x_axis)),
-				'values': '=Sheet1!$C$1:$C$'+str(len(self.markers_axis)),
-				'name': 'Markers'
-			})
-
-			# Combine the charts.
-			chart.combine(marker_chart)
-
-			chart.set_y_axis({'name': 'response', 'name_font': {
-			                 'size': 14, 'bold': True}, 'num_font':  {'italic': True},
-							'min': self.lower_slider_value, 'max': self.upper_slider_value,
-							'crossing': self.lower_slider_value
-							 })
-			time = "sec"
-
-			chart.set_x_axis({'name': 'time ('+str(time)+')',
-			                 'name_font': {'size': 14, 'bold': True}, 'num_font':  {'italic': True},
-							 
-							  'major_gridlines': {
-									'visible': True,
-									'line': {'width': 1, 'dash_type': 'solid'}
-								},
-								'position_axis': 'on_tick'
-							})
-
-			worksheet.insert_chart('D1', chart)
-			try:
-				workbook.close()
-			except:
-				QtWidgets.QMessageBox.critical(self, "File not Saved", "File could not be saved at " + str(self.excelFilename), QtWidgets.QMessageBox.Yes)
-			else: 
-				QtWidgets.QMessageBox.information(self, "File Saved", "File saved at " + str(self.excelFilename), QtWidgets.QMessageBox.Yes)
-				self.hasUnsavedChanges = False
-
-			self.playedTimes += 1
-
-			if "openExcelAfterSave" in self.defaultConfig:
-				if self.defaultConfig["openExcelAfterSave"] == True:
-					# open the excel file right after the save
-					self.openExcelFile()
+			exporter = exporters.exporterForFilename(self.excelFilename, self.exportFormat())
+			# the file is written on a worker thread from a snapshot, so playback and rating continue meanwhile
+			self.saver.save(SaveSnapshot.take(self.excelFilename, exporter.name, self.samples, self.markers, self.timeFactor(),
+				self.lower_slider_value, self.upper_slider_value, self.sessionMetadata(), self.coordinator.raters() if self.coordinator is not None else None))
 		else:
 			QtWidgets.QMessageBox.critical(self, "Error","You need to provide your response to video", QtWidgets.QMessageBox.Yes)
 
+	def saveIncrement(self):
+		if self.excelFilename is None:
+			self.excelFilename = self.defaultFilename()
+		if not self.hasData():
+			QtWidgets.QMessageBox.critical(self, "Error","You need to provide your response to video", QtWidgets.QMessageBox.Yes)
+			return
+		filename = incrementalFilename(self.excelFilename)
+		if self.incremental is None or self.incremental.filename != filename:
+			self.incremental = IncrementalSave(filename)
+		self.saver.save(SaveSnapshot.take(self.excelFilename, "csv", self.samples, self.markers, self.timeFactor(),
+			self.lower_slider_value, self.upper_slider_value, self.sessionMetadata(), self.coordinator.raters() if self.coordinator is not None else None, self.incremental))
+
+	def sessionMetadata(self):
+		if self.playlist is not None:
+			metadata = self.playlist.metadata()
+		else:
+			metadata = {"video": os.path.basename(self.filename)}
+			if self.mediaInfo is not None:
+				metadata["video_fingerprint"] = self.mediaInfo.fingerprint
+		if self.coordinator is not None:
+			metadata["raters"] = ", ".join(name for name, store in self.coordinator.raters())
+		metadata.update(self.latency.metadata())
+		return metadata
+
+	def saveStarted(self, snapshot):
+		self.saveProgressBar.setValue(0)
+		self.saveProgressBar.show()
+		self.cancelSaveButton.show()
+		self.statusBar().showMessage("Saving " + str(snapshot.filename))
+
+	def saveProgress(self, fraction):
+		self.saveProgressBar.setValue(int(fraction * 100))
+
+	def saveFinished(self):
+		if not self.saver.isBusy():
+			self.saveProgressBar.hide()
+			self.cancelSaveButton.hide()
+
+	def saveSucceeded(self, snapshot, result):
+		print(result)
+		self.saveFinished()
+		self.statusBar().showMessage("File saved at " + str(snapshot.filename), 10000)
+		# samples recorded while the file was written are still unsaved
+		self.setUnsavedChanges(len(self.samples) != snapshot.sampleCount() or len(self.markers) != snapshot.markerCount())
+		# the rows of the incremental saves are in an export once a full export was written after them
+		self.exportPending = snapshot.incremental is not None
+		if snapshot.incremental is not None:
+			return
+		self.playedTimes += 1
+
+		if self.settings.openExcelAfterSave:
+			# open the excel file right after the save
+			self.openExcelFile()
+
+	def saveFailed(self, snapshot, message):
+		self.saveFinished()
+		self.statusBar().clearMessage()
+		QtWidgets.QMessageBox.critical(self, "File not Saved", "File could not be saved at " + str(snapshot.filename) + "\n" + message, QtWidgets.QMessageBox.Yes)
+
+	def saveCancelled(self, snapshot):
+		self.saveFinished()
+		self.statusBar().showMessage("Saving " + str(snapshot.filename) + " was cancelled", 10000)
+
+	def cancelSave(self, event=None):
+		self.saver.cancel()
+
 	def openExcelFile(self):
 		if self.excelFilename != None:
+			import subprocess, shutil
 			# open the excel file, with support for mac, linux and windows
 			if not hasattr(os, 'startfile'):
 				os.startfile = lambda f: subprocess.call(["open", f])
@@ -620,24 +1025,34 @@ class Window (QtWidgets.QMainWindow):
 			self.resetMetrics()
 
 	def hasMedia(self):
-		return self.media != None and self.mediaplayer != None and self.media.get_duration() > 0
+		return self.media != None and self.mediaplayer != None and self.engine.duration > 0
 	
 	def confirmResetMetrics(self):
 		if self.hasMedia():
-			if self.hasData() and self.hasUnsavedChanges:
+			if self.hasData() and (self.hasUnsavedChanges or self.exportPending):
 				self.saveAs(None)
 			if self.excelFilename is not None:
 				self.resetMetrics()
 
 	def resetMetrics(self):
 		if self.hasMedia():
-			tf = self.timeFactor()
-			duration = int(self.media.get_duration() / tf)
-			self.x_axis = [x for x in range(0, duration+1)]
-			self.y_axis = [0 for x in range(0, duration+1)]
-
 			self.points = 0
-			self.points_list = []
+			# reserve room for the whole video so the sampler thread does not need to grow the buffers
+			self.samples.preallocate(self.engine.duration, self.sampler.rate)
+			self.markers.clear()
+			if self.coordinator is not None:
+				self.coordinator.clear()
+			self.sampler.setRating(self.points)
+			self.latency.reset()
+			self.updateLatencyOverlay()
+			self.updateInputRange()
+			if self.ratingPlot is not None:
+				self.ratingPlot.clear()
+			self.updatePlotSpan()
+			# the next incremental save starts a new file
+			self.incremental = None
+			self.exportPending = False
+			self.startJournal()
 
 			# initialise seconds elapsed
 			self.prevSecond = 0
@@ -646,15 +1061,78 @@ class Window (QtWidgets.QMainWindow):
 			self.slider.setRange(0, 10000)
 			self.slider.setValue(0)
 			self.totalTime.setText(str(datetime.timedelta(
-			    seconds=int(self.media.get_duration()/1000))))
+			    seconds=int(self.engine.duration/1000))))
 			self.hasUnsavedChanges = False
+			self.updateControls()
+
+	def startJournal(self):
+		self.closeJournal(delete=True)
+		header = {"video": self.filename, "unit": self.UNIT, "lowerSliderValue": self.lower_slider_value, "upperSliderValue": self.upper_slider_value,
+			"created": strftime("%Y-%m-%d %H:%M:%S")}
+		if self.playlist is not None:
+			header.update(playlist=self.playlist.paths, playlistName=self.playlist.name)
+		try:
+			self.journal = SessionJournal.create(executable_dir, header, self.settings.journalSyncInterval)
+		except OSError as e:
+			print(f"The session journal could not be created: {e}")
+
+	def closeJournal(self, delete=None):
+		# the journal is kept when the app quits with unsaved changes or without the export of its incremental saves,
+		# so they can be recovered on the next start. saver.wait() runs before, so the result of the last save is known here.
+		if self.journal is not None:
+			self.journal.close(delete=(not self.hasUnsavedChanges and not self.exportPending) if delete is None else delete)
+			self.journal = None
+
+	def recoverJournals(self):
+		for path in journal.findJournals(executable_dir):
+			try:
+				header, records = journal.readJournal(path)
+			except (journal.JournalError, OSError) as e:
+				print(f"An error occurred: {e}")
+				continue
+			if len(records) == 0:
+				os.remove(path)
+				continue
+			video = header.get("video", "")
+			videos = header.get("playlist", [video])
+			choice = QMessageBox.question(self, 'Recover Session', f"The session with {video} from {header.get('created')} was not saved. Do you want to recover its {len(records)} ratings and markers?",
+				QMessageBox.Yes | QMessageBox.No, QMessageBox.Yes)
+			if choice != QMessageBox.Yes:
+				os.remove(path)
+				continue
+			missing = [video for video in videos if not os.path.isfile(video)]
+			if len(missing) > 0:
+				QtWidgets.QMessageBox.critical(self, "Error", "The video " + missing[0] + " could not be found. The session is kept in " + path, QtWidgets.QMessageBox.Yes)
+				continue
+			self.lower_slider_value = header.get("lowerSliderValue", self.lower_slider_value)
+			self.upper_slider_value = header.get("upperSliderValue", self.upper_slider_value)
+			afterLoad = lambda path=path, records=records: self.replayRecovered(path, records)
+			if "playlist" in header:
+				# the ratings of all clips are recovered, playback starts again with the first clip
+				from playlist import Playlist
+				self.startPlaylist(Playlist(videos, header.get("playlistName")), afterLoad)
+			else:
+				self.loadVideoFromPath(video, afterLoad)
+			# only one session can be open at a time
+			break
+
+	def replayRecovered(self, path, records):
+		start = time.perf_counter()
+		journal.replayJournal(records, self.samples, self.markers)
+		if self.journal is not None:
+			self.journal.extend(records)
+		print(f"Recovered {len(records)} journal records in {time.perf_counter() - start:.3f} s")
+		os.remove(path)
+		self.setUnsavedChanges(True)
+		self.updateControls()
 
 	def playClicked(self, event):
 		if self.hasMedia():
-			if self.mediaplayer.get_position() >= 0.999: # restart the video in case it is paused at the last frame
+			if self.engine.position >= 0.999: # restart the video in case it is paused at the last frame
 				self.restartVideo()
 			self.mediaplayer.play()
 			self.isPaused = False
+			self.updateControls()
 
 
 	def changePlayButton(self, event):
@@ -669,33 +1147,119 @@ class Window (QtWidgets.QMainWindow):
 		    self, "Load Video File", '', "video files (*.*)")[0])
 		self.loadVideoFromPath(path)
 
-	def loadVideoFromPath(self, path):
+	def loadPlaylist(self):
+		path = str(QtWidgets.QFileDialog.getOpenFileName(
+		    self, "Load Playlist", '', "playlists (*.json *.m3u *.m3u8 *.txt);;All Files (*)")[0])
+		if len(path) > 0:
+			from playlist import PlaylistError, readManifest
+			try:
+				self.startPlaylist(readManifest(path))
+			except PlaylistError as e:
+				QtWidgets.QMessageBox.critical(self, "Error", str(e), QtWidgets.QMessageBox.Yes)
+
+	def startPlaylist(self, playlist, afterLoad=None):
+		missing = [video for video in playlist.paths if not os.path.isfile(video)]
+		if len(missing) > 0:
+			QtWidgets.QMessageBox.critical(self, "Error", "The video " + missing[0] + " of the playlist could not be found.", QtWidgets.QMessageBox.Yes)
+			return
+		self.loadVideoFromPath(playlist.current(), afterLoad, playlist)
+
+	def loadVideoFromPath(self, path, afterLoad=None, playlist=None):
+		# afterLoad is called once the video is ready, which can be after this returns
 		self.filename = path
 		self.playedTimes = 0
 		if len(path) > 0:
-			self.UNIT = self.SECOND
+			self.UNIT = self.MS
 
 			self.isPaused = True
-			self.media = self.vlc_instance.media_new(str(path))
-			self.mediaplayer.set_media(self.media)	
-			self.media.parse()
-			self.playButton.setEnabled(True)
-			self.resetMetrics()
+			self.playlist = playlist
+			self.clipOffset = 0
+			for deck in self.decks:
+				if deck is not self.deck:
+					deck.stop()
+			self.deck.open(path, self.fastSeek)
+			self.media = self.deck.media
+			self.mediaInfo = None
+			self.afterLoad = afterLoad
+			self.playButton.setEnabled(False)
+			if not self.deck.load():
+				self.statusBar().showMessage("Loading " + os.path.basename(path) + " ...")
+
+	def mediaLoaded(self, media, info):
+		if media is not self.media:
+			return
+		self.mediaInfo = info
+		self.engine.setDuration(info.duration)
+		self.statusBar().clearMessage()
+		self.playButton.setEnabled(True)
+		self.resetMetrics()
+		self.startTimelineIndex()
+		if self.playlist is not None:
+			self.playlist.setInfo(self.playlist.index, info)
+			self.preloadNextClip()
+		if self.afterLoad is not None:
+			afterLoad, self.afterLoad = self.afterLoad, None
+			afterLoad()
+		self.startupStepDone("video")
+
+	def preloadNextClip(self):
+		# the other deck opens the next clip while this one plays
+		if self.playlist is not None and self.playlist.hasNext():
+			self.standbyDeck().preload(self.playlist.nextPath(), self.fastSeek)
+
+	def nextClipReady(self, opened):
+		deck = self.sender()
+		if self.playlist is not None and deck is not self.deck:
+			self.playlist.setInfo(self.playlist.index + 1, deck.info)
+			if self.playlist.waiting:
+				self.nextClip()
+
+	def nextClip(self):
+		standby = self.standbyDeck()
+		if not standby.isPrepared():
+			# shown as soon as the next clip is ready
+			self.playlist.waiting = True
+			return
+		self.playlist.waiting = False
+		previous = self.deck
+		self.playlist.advance(self.engine.duration)
+		self.clipOffset = self.playlist.offset()
+		self.filename = standby.path
+		self.activateDeck(standby)
+		self.mediaplayer.play()
+		self.isPaused = False
+		self.prevSecond = 0
+		self.sliderSilentValue(0)
+		self.playerDurationChanged(self.engine.duration)
+		self.playerTimeChanged(self.engine.time)
+		self.startTimelineIndex()
+		# stopping the finished player takes a moment, it is done once the next clip is playing
+		QtCore.QTimer.singleShot(0, lambda: self.releaseDeck(previous))
+
+	def releaseDeck(self, deck):
+		deck.stop()
+		self.preloadNextClip()
 
 	def createMenu(self):
 		menubar = self.menuBar()
 		fileMenu = menubar.addMenu('&File')
 		fileMenu.addAction(QtWidgets.QAction("Load video file", self, triggered=self.loadVideo, shortcut='Ctrl+O'))
-		fileMenu.addAction(QtWidgets.QAction("Save", self, triggered=self.save, shortcut='Ctrl+S'))
+		fileMenu.addAction(QtWidgets.QAction("Load playlist", self, triggered=self.loadPlaylist, shortcut='Ctrl+L'))
+		fileMenu.addAction(QtWidgets.QAction("Save", self, triggered=self.quickSave, shortcut='Ctrl+S'))
 		fileMenu.addAction(QtWidgets.QAction("Save as", self, triggered=self.saveAs, shortcut='Ctrl+Shift+S'))
+		fileMenu.addAction(QtWidgets.QAction("Export", self, triggered=self.save))
+		fileMenu.addAction(QtWidgets.QAction("Cancel saving", self, triggered=self.cancelSave))
+		fileMenu.addAction(QtWidgets.QAction("Cancel indexing", self, triggered=self.cancelIndexing))
 		fileMenu.addSeparator()
-		fileMenu.addAction(QtWidgets.QAction("Open current Excel File", self, triggered=self.openExcelFile, shortcut='Ctrl+E'))
+		fileMenu.addAction(QtWidgets.QAction("Open current File", self, triggered=self.openExcelFile, shortcut='Ctrl+E'))
 		fileMenu.addSeparator()
 		fileMenu.addAction(QtWidgets.QAction("Exit", self, triggered=QtCore.QCoreApplication.instance().quit, shortcut='Ctrl+Q'))
 		
 		self.initDialog()
 		settingsMenu = menubar.addMenu('&Settings')
 		settingsMenu.addAction(QtWidgets.QAction("&Set Range", self, triggered=self.showDialog, shortcut='Ctrl+R'))
+		self.livePlotAction = QtWidgets.QAction("Show &live plot", self, checkable=True, checked=self.settings.showLivePlot, toggled=self.toggleLivePlot, shortcut='Ctrl+P')
+		settingsMenu.addAction(self.livePlotAction)
 
 		# Help Menu
 		helpMenu = menubar.addMenu('&Help')
@@ -705,18 +1269,11 @@ class Window (QtWidgets.QMainWindow):
 
 
 	def initDialog(self):
-		self.lower_slider_value = -10
-		self.upper_slider_value = 10
-		if "lowerSliderValue" in self.defaultConfig:
-			self.lower_slider_value = self.defaultConfig["lowerSliderValue"]
-		if "upperSliderValue" in self.defaultConfig:
-			self.upper_slider_value = self.defaultConfig["upperSliderValue"]
-		if "defaultExcelPath" in self.defaultConfig:
-			self.excelFilename = self.defaultConfig["defaultExcelPath"]
-		if "skipTimeInSec" in self.defaultConfig:
-			self.skipTimeInSec = self.defaultConfig["skipTimeInSec"]
-		else:
-			self.skipTimeInSec = 60
+		self.lower_slider_value = self.settings.lowerSliderValue
+		self.upper_slider_value = self.settings.upperSliderValue
+		if self.settings.defaultExcelPath is not None:
+			self.excelFilename = self.settings.defaultExcelPath
+		self.skipTimeInSec = self.settings.skipTimeInSec
 
 	def showDialog(self):
         # create a dialog for defining the range
@@ -767,6 +1324,18 @@ class Window (QtWidgets.QMainWindow):
 
 		vbox.addLayout(hbox_spinbox )
 
+		sample_rate_combobox = QtWidgets.QComboBox(self)
+		current_rate = int(self.sampler.rate)
+		for rate in sorted(set(SAMPLE_RATES + [current_rate])):
+			sample_rate_combobox.addItem(str(rate) + " Hz", rate)
+		sample_rate_combobox.setCurrentIndex(sample_rate_combobox.findData(current_rate))
+		hbox_sample_rate = QHBoxLayout()
+		hbox_sample_rate.addWidget(QtWidgets.QLabel("Samples per Second", self))
+		hbox_sample_rate.addWidget(sample_rate_combobox)
+		sample_rate_combobox.currentIndexChanged.connect(lambda index: self.sampler.setRate(sample_rate_combobox.itemData(index)))
+
+		vbox.addLayout(hbox_sample_rate)
+
         # add the horizontal layouts and label to the vertical layout
 		vbox.addLayout(hbox_lower)
 		vbox.addLayout(hbox_upper)
@@ -787,6 +1356,7 @@ class Window (QtWidgets.QMainWindow):
 		else:
 			self.lower_slider_value = lower_value
 			self.upper_slider_value = upper_value
+		self.updateInputRange()
 
 		# update the label with the new range values
 		label.setText(f"Range: {lower_value} to {upper_value}")
@@ -794,7 +1364,12 @@ class Window (QtWidgets.QMainWindow):
 	def addMarker(self, event = None):
 		if self.mediaplayer != None:
 			tf = self.timeFactor()
-			self.markers_list.append([int(self.mediaplayer.get_time()/tf), 1])
+			# record a sample at the same time so the marker lines up with a rating row in the export
+			markerTime = int((self.sampler.sample() if self.engine.vlcIsPlaying() else self.sessionTime())/tf)
+			self.markers.append(markerTime, 1)
+			if self.journal is not None:
+				self.journal.append(journal.MARKER, markerTime, 1, time.monotonic())
+			self.latency.recorded()
 
 	def showAbout(self):
 		about_text = "PsychometricStudy Version: " + version.VERSION + "\n\n"
@@ -861,8 +1436,10 @@ class Window (QtWidgets.QMainWindow):
 		about_text += "Version of the software: " + version.VERSION + "\n"
 		about_text += "Python " + sys.version + "\n"
 		about_text += "PyQt " + QtCore.PYQT_VERSION_STR + "\n"
+		import xlsxwriter
 		about_text += "XLSXWriter " + xlsxwriter.__version__ + "\n"
 		about_text += "The Font Awesome and Elusive Icons fonts are licensed under the SIL Open Font License. \n"
+		import qtawesome
 		about_text += "QtAwesome Copyright © 2015-2022 Spyder Project Contributors " + qtawesome.__version__ + "\n"
 		about_text += "VLC " + vlc.__version__ + "\n"
 		QtWidgets.QMessageBox.about(self, "About", about_text)
@@ -870,6 +1447,8 @@ class Window (QtWidgets.QMainWindow):
 def crash_handler(exctype, value, traceback):
     # Handle the exception
 	print("An error occurred:", value)
+	# make sure everything recorded so far is on disk
+	SessionJournal.flushAll()
 
 # handle ctrl+c
 def signal_handler(signal, frame):
@@ -882,5 +1461,16 @@ if __name__=='__main__':
 	app = QtWidgets.QApplication (sys.argv)
 	app.setAttribute(QtCore.Qt.AA_UseHighDpiPixmaps, True)
 	window = Window()
+	startupProfile.mark("window")
+	# let a running save finish before the process exits
+	app.aboutToQuit.connect(window.finalExport)
+	app.aboutToQuit.connect(window.saver.wait)
+	app.aboutToQuit.connect(window.closeJournal)
+	app.aboutToQuit.connect(window.stopInputDevice)
+	app.aboutToQuit.connect(window.cancelIndexing)
+	app.aboutToQuit.connect(window.stopCoordinator)
+	app.aboutToQuit.connect(window.printSeekStats)
+	app.aboutToQuit.connect(window.stats.printSummary)
 	window.show()
+	startupProfile.mark("shown")
 	sys.exit(app.exec_())
\ No newline at end of file
@@ -0,0 +1,198 @@
+#! /usr/bin/env python3
+# Headless batch mode: re-exports session journals and exported files and aggregates them into one table.
+# Runs without a display and without libvlc: python app.py --batch <directory> ... or python batch.py <directory> ...
+import os, sys, glob, time, argparse, multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+import exporters, journal
+from exporters import ExportData, markerPositionForRange
+from samplestore import lastValuePerTimestamp, alignMarkers
+
+# range used for files that do not store it
+DEFAULT_LOWER_VALUE = -10
+DEFAULT_UPPER_VALUE = 10
+
+def readJournalData(path):
+	header, records = journal.readJournal(path)
+	samples = records[records["kind"] == journal.SAMPLE]
+	markers = records[records["kind"] == journal.MARKER]
+	times, values = lastValuePerTimestamp(samples["time"], samples["value"])
+	hasMarker = alignMarkers(times, markers["time"], markers["value"])
+	if header.get("unit") == journal.SECOND:
+		times = times * 1000
+	lowerValue = header.get("lowerSliderValue", DEFAULT_LOWER_VALUE)
+	upperValue = header.get("upperSliderValue", DEFAULT_UPPER_VALUE)
+	return ExportData(times, values, hasMarker, markerPositionForRange(lowerValue, upperValue), lowerValue, upperValue)
+
+def columnsToData(times, values, hasMarker, lowerValue=DEFAULT_LOWER_VALUE, upperValue=DEFAULT_UPPER_VALUE):
+	return ExportData(np.asarray(times, dtype=np.int64), np.asarray(values, dtype=np.float64), np.asarray(hasMarker, dtype=bool),
+		markerPositionForRange(lowerValue, upperValue), lowerValue, upperValue)
+
+def readCsvData(path):
+	table = np.genfromtxt(path, delimiter=",", names=True, dtype=None, encoding="utf-8")
+	table = np.atleast_1d(table)
+	return columnsToData(table["time_ms"], table["rating"], table["marker"])
+
+def readNpzData(path):
+	with np.load(path) as table:
+		return columnsToData(table["time_ms"], table["rating"], table["marker"])
+
+def readArrowData(path):
+	import pyarrow.parquet, pyarrow.feather
+	if path.endswith(".parquet"):
+		table = pyarrow.parquet.read_table(path)
+	else:
+		table = pyarrow.feather.read_table(path)
+	return columnsToData(*[table.column(name).to_numpy() for name in exporters.COLUMNS])
+
+def readHdf5Data(path):
+	import h5py
+	with h5py.File(path, "r") as file:
+		return columnsToData(*[file[name][:] for name in exporters.COLUMNS],
+			lowerValue=int(file.attrs.get("lowerValue", DEFAULT_LOWER_VALUE)), upperValue=int(file.attrs.get("upperValue", DEFAULT_UPPER_VALUE)))
+
+def readXlsxData(path):
+	# workbooks written by the app: time as Excel time or as h:mm:ss text in A, rating in B, marker in C
+	import openpyxl
+	workbook = openpyxl.load_workbook(path, read_only=True)
+	times, values, hasMarker = [], [], []
+	for time_, value, marker in workbook.worksheets[0].iter_rows(min_col=1, max_col=3, values_only=True):
+		if value is None:
+			continue
+		if isinstance(time_, str):
+			hours, minutes, seconds = time_.split(":")
+			times.append(round((int(hours) * 3600 + int(minutes) * 60 + float(seconds)) * 1000))
+		elif hasattr(time_, "hour"):
+			times.append(round((time_.hour * 3600 + time_.minute * 60 + time_.second + time_.microsecond / 1e6) * 1000))
+		else:
+			times.append(round(time_ * exporters.MS_PER_DAY))
+		values.append(value)
+		hasMarker.append(marker is not None)
+	workbook.close()
+	return columnsToData(times, values, hasMarker)
+
+# readers by file extension, parquet and feather need pyarrow and h5 needs h5py, which are optional
+READERS = {
+	journal.JOURNAL_EXTENSION: readJournalData,
+	".csv": readCsvData,
+	".npz": readNpzData,
+	".parquet": readArrowData,
+	".feather": readArrowData,
+	".h5": readHdf5Data,
+	".xlsx": readXlsxData,
+}
+
+def readSession(path):
+	return READERS[os.path.splitext(path)[1].lower()](path)
+
+def sessionName(path):
+	return os.path.splitext(os.path.basename(path))[0]
+
+def isSessionFile(path):
+	# the files the app writes next to a session are skipped: the rows of its incremental saves, which are also in
+	# its export, the metadata of an export (.json) and the partial files of an export that did not finish
+	name = os.path.basename(path)
+	return (os.path.splitext(name)[1].lower() in READERS and not name.lower().endswith(exporters.INCREMENTAL_EXTENSION)
+		and not name.startswith(".") and not name.endswith(".partial"))
+
+def findSessions(directories, recursive=False):
+	paths = []
+	for directory in directories:
+		if os.path.isfile(directory):
+			paths.append(directory)
+			continue
+		pattern = os.path.join(glob.escape(directory), "**" if recursive else "", "*")
+		paths += [path for path in glob.glob(pattern, recursive=recursive) if isSessionFile(path)]
+	return sorted(paths)
+
+def processSession(path, outputDirectory, format):
+	# runs in a worker process: read one session, optionally re-export it and return its columns for the aggregate table
+	start = time.perf_counter()
+	data = readSession(path)
+	if outputDirectory is not None:
+		exporter = exporters.exporterByName(format)
+		exporter.write(os.path.join(outputDirectory, sessionName(path) + exporter.extension), data)
+	return path, data.times, data.values, data.hasMarker, time.perf_counter() - start
+
+class LongTableWriter(object):
+	# Writes the sessions one after another into a long-format table with the columns session, time_ms, rating, marker.
+	# CSV is appended to as the results come in, Parquet is written one row group per session.
+
+	def __init__(self, filename):
+		self.filename = filename
+		self.extension = os.path.splitext(filename)[1].lower()
+		if self.extension == ".csv":
+			self.file = open(filename, "w", newline="", encoding="utf-8")
+			self.file.write(",".join(["session"] + exporters.COLUMNS) + "\n")
+		elif self.extension == ".parquet":
+			import pyarrow, pyarrow.parquet
+			self.schema = pyarrow.schema([("session", pyarrow.string()), ("time_ms", pyarrow.int64()), ("rating", pyarrow.float64()), ("marker", pyarrow.bool_())])
+			self.file = pyarrow.parquet.ParquetWriter(filename, self.schema)
+		else:
+			raise ValueError("The aggregate table can be written as .csv or .parquet, not " + filename)
+
+	def write(self, session, times, values, hasMarker):
+		if self.extension == ".csv":
+			data = ExportData(times, values, hasMarker, 0, 0, 0)
+			prefix = session.replace('"', '""')
+			prefix = '"' + prefix + '",' if "," in prefix or '"' in prefix else prefix + ","
+			for first, chunkTimes, chunkValues, chunkMarkers in exporters.iterateChunks(data):
+				self.file.write("".join([f"{prefix}{ms},{value:g},{int(marker)}\n" for ms, value, marker in zip(chunkTimes, chunkValues, chunkMarkers)]))
+		else:
+			import pyarrow
+			self.file.write_table(pyarrow.table([pyarrow.array([session] * len(times), pyarrow.string()), pyarrow.array(times),
+				pyarrow.array(values), pyarrow.array(hasMarker)], schema=self.schema))
+
+	def close(self):
+		self.file.close()
+
+def main(argv):
+	parser = argparse.ArgumentParser(prog="app.py --batch", description="Re-export and aggregate Psychometric Study sessions without opening the app.")
+	parser.add_argument("inputs", nargs="+", help="directories or files with session journals (*.journal) or exported files")
+	parser.add_argument("--recursive", action="store_true", help="also look into subdirectories")
+	parser.add_argument("--format", default=None, choices=[exporter.name for exporter in exporters.EXPORTERS], help="re-export every session in this format")
+	parser.add_argument("--output-dir", default=None, help="directory for the re-exported sessions (default: next to the first input)")
+	parser.add_argument("--aggregate", default=None, help="write all sessions into one long-format .csv or .parquet table")
+	parser.add_argument("--workers", type=int, default=None, help="number of worker processes (default: number of CPUs)")
+	args = parser.parse_args(argv)
+
+	if args.format is None and args.aggregate is None:
+		parser.error("nothing to do, give --format and/or --aggregate")
+	paths = findSessions(args.inputs, args.recursive)
+	if len(paths) == 0:
+		print("No sessions found in " + ", ".join(args.inputs))
+		return 1
+
+	outputDirectory = None
+	if args.format is not None:
+		outputDirectory = args.output_dir or (args.inputs[0] if os.path.isdir(args.inputs[0]) else os.path.dirname(args.inputs[0]))
+		os.makedirs(outputDirectory, exist_ok=True)
+	aggregate = LongTableWriter(args.aggregate) if args.aggregate is not None else None
+
+	start = time.perf_counter()
+	rows = 0
+	failed = 0
+	with ProcessPoolExecutor(max_workers=args.workers) as executor:
+		futures = {executor.submit(processSession, path, outputDirectory, args.format): path for path in paths}
+		# results are handled in the order they finish, so the aggregate table grows while the workers run
+		for future in as_completed(futures):
+			try:
+				path, times, values, hasMarker, seconds = future.result()
+			except Exception as e:
+				failed += 1
+				print(f"{futures[future]}: failed: {e}")
+				continue
+			if aggregate is not None:
+				aggregate.write(sessionName(path), times, values, hasMarker)
+			rows += len(times)
+			print(f"{path}: {len(times)} rows in {seconds:.3f} s", flush=True)
+	if aggregate is not None:
+		aggregate.close()
+
+	seconds = time.perf_counter() - start
+	print(f"{len(paths) - failed} sessions, {rows} rows in {seconds:.2f} s ({(len(paths) - failed) / seconds:.1f} sessions/s, {rows / seconds:.0f} rows/s)")
+	return 1 if failed > 0 else 0
+
+if __name__ == '__main__':
+	multiprocessing.freeze_support()
+	sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,987 @@
+#! /usr/bin/env python3
+# Benchmarks for the data path of the app. They run without a display and without libvlc.
+# Usage: python benchmark.py <name> [options], see python benchmark.py --help
+import sys, time, argparse, tracemalloc
+import numpy as np
+
+def measure(func):
+	# returns (result, seconds, peak bytes allocated while running func)
+	# the function runs twice because tracing the allocations slows it down
+	start = time.perf_counter()
+	func()
+	seconds = time.perf_counter() - start
+	tracemalloc.start()
+	result = func()
+	peak = tracemalloc.get_traced_memory()[1]
+	tracemalloc.stop()
+	return result, seconds, peak
+
+def syntheticSession(count, rate=100, seed=0):
+	# a session sampled at rate Hz with a rating that changes in small steps, like the Up/Down buttons
+	random = np.random.default_rng(seed)
+	times = (np.arange(count) * (1000 // rate)).astype(np.int64)
+	values = np.clip(np.cumsum(random.integers(-1, 2, count) * (random.random(count) < 0.05)), -10, 10).astype(np.float64)
+	monotonic = times / 1000.0
+	return times, values, monotonic
+
+def benchStore(args):
+	from samplestore import SampleStore
+	for count in args.samples:
+		times, values, monotonic = syntheticSession(count)
+		rows = list(zip(times.tolist(), values.tolist(), monotonic.tolist()))
+
+		def appendToList():
+			# the app creates new number objects for every sample, so do the same here
+			points_list = []
+			for row in rows:
+				points_list.append([row[0] + 0, row[1] + 0.0, row[2] + 0.0])
+			return points_list
+
+		def appendToStore():
+			store = SampleStore(capacity=1024)
+			for row in rows:
+				store.append(*row)
+			return store
+
+		def appendToPreallocatedStore():
+			store = SampleStore()
+			store.preallocate(times[-1], 100)
+			for row in rows:
+				store.append(*row)
+			return store
+
+		print(f"{count} samples")
+		for name, func in [("list of lists", appendToList), ("SampleStore", appendToStore), ("SampleStore preallocated", appendToPreallocatedStore)]:
+			result, seconds, peak = measure(func)
+			print(f"  {name:<26} append {seconds / count * 1e9:8.0f} ns/sample   peak memory {peak / count:6.1f} bytes/sample")
+
+		points_list = appendToList()
+		store = appendToStore()
+		_, seconds, peak = measure(lambda: [row[1] for row in points_list])
+		print(f"  {'list of lists':<26} read value column {seconds * 1000:8.2f} ms, {peak / count:6.1f} bytes/sample copied")
+		_, seconds, peak = measure(lambda: store.view("value"))
+		print(f"  {'SampleStore':<26} read value column {seconds * 1000:8.2f} ms, {peak / count:6.1f} bytes/sample copied")
+
+def legacyReduce(points_list, markers_list, markerPosition):
+	# the dict based reduction save() used before the columnar store
+	x_axis, y_axis, markers_axis = [], [], []
+	temporaryList = {}
+	for y, value in points_list:
+		temporaryList[y] = value
+	sortedMarkersList = {k: v for k, v in dict(sorted(markers_list)).items()}
+	for y, value in dict(sorted(temporaryList.items())).items():
+		x_axis.append(y)
+		y_axis.append(value)
+		markers_axis.append(markerPosition if sortedMarkersList.get(y) == 1 else None)
+	return x_axis, y_axis, markers_axis
+
+def benchReduce(args):
+	from samplestore import SampleStore, MarkerStore, reduceSession
+	for count in args.samples:
+		times, values, monotonic = syntheticSession(count)
+		# a seek backwards halfway through repeats the second quarter of the session
+		seeked = np.concatenate([times[:count // 2], times[count // 4:count // 2], times[count // 2:]])[:count]
+		for name, sessionTimes in [("in order", times), ("with a backwards seek", seeked)]:
+			samples = SampleStore(count)
+			samples.extend(sessionTimes, values, monotonic)
+			markerTimes = sessionTimes[::997]
+			markers = MarkerStore(len(markerTimes))
+			markers.extend(markerTimes, np.ones(len(markerTimes), dtype=np.int8))
+			points_list = [[t, v] for t, v in zip(sessionTimes.tolist(), values.tolist())]
+			markers_list = [[t, 1] for t in markerTimes.tolist()]
+
+			legacy, legacySeconds, legacyPeak = measure(lambda: legacyReduce(points_list, markers_list, 0))
+			reduced, seconds, peak = measure(lambda: reduceSession(samples, markers))
+			assert legacy[0] == reduced[0].tolist() and legacy[1] == reduced[1].tolist()
+			assert [m is not None for m in legacy[2]] == reduced[2].tolist()
+			print(f"{count} samples {name}: dict based {legacySeconds * 1000:8.1f} ms ({legacyPeak / 2**20:6.1f} MiB), "
+				f"sort-and-reduce {seconds * 1000:8.1f} ms ({peak / 2**20:6.1f} MiB), {legacySeconds / seconds:5.1f}x faster")
+
+def legacyWriteXlsx(filename, x_axis, y_axis, markers_axis):
+	# the in-memory workbook with formatted time strings save() wrote before the streaming exporter
+	import xlsxwriter, datetime
+	workbook = xlsxwriter.Workbook(filename)
+	worksheet = workbook.add_worksheet()
+	worksheet.write_column('A1', [str(datetime.timedelta(seconds=x / 1000)) for x in x_axis])
+	worksheet.write_column('B1', y_axis)
+	worksheet.write_column('C1', markers_axis)
+	chart = workbook.add_chart({'type': 'line'})
+	chart.add_series({'categories': '=Sheet1!$A$1:$A$'+str(len(x_axis)), 'values': '=Sheet1!$B$1:$B$'+str(len(y_axis))})
+	worksheet.insert_chart('D1', chart)
+	workbook.close()
+
+def sessionExportData(count):
+	from exporters import ExportData
+	times, values, monotonic = syntheticSession(count)
+	return ExportData(times, values, np.arange(count) % 997 == 0, 0, -10, 10)
+
+def benchXlsx(args):
+	import os, tempfile
+	from exporters import writeXlsx
+	with tempfile.TemporaryDirectory() as directory:
+		filename = os.path.join(directory, "session.xlsx")
+		for count in args.samples:
+			data = sessionExportData(count)
+			x_axis, y_axis = data.times.tolist(), data.values.tolist()
+			markers_axis = np.where(data.hasMarker, 0, None).tolist()
+			_, legacySeconds, legacyPeak = measure(lambda: legacyWriteXlsx(filename, x_axis, y_axis, markers_axis))
+			result, seconds, peak = measure(lambda: writeXlsx(filename, data))
+			print(f"{count} rows: in memory {count / legacySeconds:8.0f} rows/s ({legacyPeak / 2**20:6.1f} MiB), "
+				f"streaming {count / seconds:8.0f} rows/s ({peak / 2**20:6.1f} MiB)")
+
+def benchJournal(args):
+	import os, tempfile
+	import journal
+	from samplestore import SampleStore, MarkerStore
+	with tempfile.TemporaryDirectory() as directory:
+		for count in args.samples:
+			times, values, monotonic = syntheticSession(count)
+			sessionJournal = journal.SessionJournal.create(directory, {"video": "benchmark"}, syncInterval=0.1)
+			start = time.perf_counter()
+			for row in zip(times.tolist(), values.tolist(), monotonic.tolist()):
+				sessionJournal.append(journal.SAMPLE, *row)
+			appendSeconds = time.perf_counter() - start
+			sessionJournal.close()
+
+			start = time.perf_counter()
+			header, records = journal.readJournal(sessionJournal.path)
+			samples, markers = SampleStore(), MarkerStore()
+			journal.replayJournal(records, samples, markers)
+			recoverSeconds = time.perf_counter() - start
+			assert len(samples) == count
+			print(f"{count} records ({os.path.getsize(sessionJournal.path) / 2**20:.1f} MiB): append {appendSeconds / count * 1e9:6.0f} ns/record, "
+				f"recover {recoverSeconds * 1000:8.1f} ms")
+			os.remove(sessionJournal.path)
+
+def benchFormats(args):
+	import os, tempfile
+	import exporters
+	with tempfile.TemporaryDirectory() as directory:
+		for count in args.samples:
+			data = sessionExportData(count)
+			for exporter in exporters.EXPORTERS:
+				if not exporter.isAvailable():
+					print(f"{count} rows {exporter.name:<8} skipped, {exporter.requires} is not installed")
+					continue
+				filename = os.path.join(directory, "session" + exporter.extension)
+				result = exporter.write(filename, data)
+				print(f"{count} rows {exporter.name:<8} {result.seconds * 1000:9.1f} ms {result.rowsPerSecond():12.0f} rows/s {os.path.getsize(filename) / 2**10:10.1f} KiB")
+
+def benchIcons(args):
+	# per tick cost of the play/pause icon and button updates, offscreen so it runs without a display
+	import os
+	os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+	from PyQt5 import QtWidgets
+	import qtawesome
+	from icons import IconCache
+	app = QtWidgets.QApplication.instance() or QtWidgets.QApplication(sys.argv)
+	buttons = [{"name": "playButton", "icon": "fa5s.play", "color": "#3e3e3e"}, {"name": "pauseButton", "icon": "fa5s.pause", "color": "#3e3e3e"}]
+	buttons += [{"name": "button" + str(i), "icon": "fa5s.stop", "color": "#3e3e3e"} for i in range(10)]
+	widgets = [QtWidgets.QPushButton() for i in range(10)]
+	playButton = QtWidgets.QPushButton()
+	iconCache = IconCache()
+	controlState = {}
+
+	def legacyTick(showButtons):
+		# what updateUI did every 200 ms
+		for widget in widgets:
+			widget.setEnabled(showButtons)
+		button_names = ["pauseButton"] if showButtons else ["playButton"]
+		buttonItem = [button for button in buttons if button["name"] in button_names][0]
+		playButton.setIcon(qtawesome.icon(buttonItem["icon"], color=buttonItem["color"]))
+
+	def cachedTick(showButtons):
+		# what updateControls does: compare with the last applied state, touch widgets only on a change
+		for i, widget in enumerate(widgets):
+			if controlState.get(i) != showButtons:
+				controlState[i] = showButtons
+				widget.setEnabled(showButtons)
+		if controlState.get("showPauseIcon") != showButtons:
+			controlState["showPauseIcon"] = showButtons
+			buttonItem = buttons[1] if showButtons else buttons[0]
+			playButton.setIcon(iconCache.icon(buttonItem["icon"], buttonItem["color"], 80))
+
+	for name, tick in [("rebuild every tick", legacyTick), ("cached", cachedTick)]:
+		for label, states in [("state unchanged", [True] * args.ticks), ("state flips every tick", [i % 2 == 0 for i in range(args.ticks)])]:
+			start = time.process_time()
+			for state in states:
+				tick(state)
+				app.processEvents()
+			seconds = time.process_time() - start
+			print(f"{name:<20} {label:<24} {seconds / args.ticks * 1e6:8.1f} us CPU per tick")
+
+def benchSound(args):
+	# delay between a click and the start of the feedback sound, needs libvlc and an audio device
+	import os, tempfile
+	from PyQt5 import QtCore, QtWidgets
+	import vlc
+	from feedbacksound import FeedbackSound
+	app = QtWidgets.QApplication.instance() or QtWidgets.QApplication(sys.argv)
+	source = os.path.join(os.path.dirname(os.path.abspath(__file__)), args.sound)
+
+	def wait(seconds):
+		deadline = time.monotonic() + seconds
+		while time.monotonic() < deadline:
+			app.processEvents(QtCore.QEventLoop.AllEvents, 5)
+			time.sleep(0.001)
+
+	with tempfile.TemporaryDirectory() as directory:
+		sound = FeedbackSound(vlc.Instance(), source, directory, minInterval=args.min_interval)
+		wait(2) # let the decoding finish
+		output = "QSoundEffect" if sound.effect is not None else "libvlc player"
+		for i in range(args.clicks):
+			sound.play()
+			wait(args.interval)
+		count, median, maximum = sound.latencyStats()
+		print(f"{output}: {args.clicks} clicks every {args.interval * 1000:.0f} ms, {sound.skipped} rate limited, play() to output: "
+			+ (f"median {median * 1000:.1f} ms, max {maximum * 1000:.1f} ms ({count} measured)" if count > 0 else "not measured"))
+
+	try:
+		from playsound import playsound
+	except ImportError:
+		return
+	# playsound starts a decoder per call, only the time until the call returns can be measured
+	start = time.perf_counter()
+	for i in range(args.clicks):
+		playsound(source, block=False)
+	print(f"playsound: {(time.perf_counter() - start) / args.clicks * 1000:.1f} ms per call")
+
+def benchDevice(args):
+	# replays an axis trace through the input device path without hardware: poll rate, jitter and how closely the ratings follow the trace
+	import os, tempfile
+	import numpy as np
+	from inputdevices import ReplayDevice, AxisMapper, AxisPoller, writeTrace
+	from sampler import RatingSampler
+	if args.trace is None:
+		# a dial turned slowly back and forth with some sensor noise, 1000 readings per second
+		times = np.arange(0, args.seconds, 0.001)
+		values = np.clip(np.sin(times * 2 * np.pi / 4) * 1.1 + np.random.default_rng(0).normal(0, 0.02, len(times)), -1, 1)
+		directory = tempfile.mkdtemp()
+		trace = os.path.join(directory, "trace.csv")
+		writeTrace(trace, times, values)
+	else:
+		trace = args.trace
+	device = ReplayDevice.fromFile(trace)
+
+	ratings = []
+	samples = []
+	sampler = RatingSampler(lambda monotonicTime: int((monotonicTime - device.start) * 1000), lambda: True, lambda *sample: samples.append(sample), args.sample_rate)
+	mapper = AxisMapper(-10, 10, args.smoothing, args.deadband)
+	polls = []
+	def sink(value, monotonicTime):
+		ratings.append((monotonicTime, value, time.monotonic()))
+		sampler.setRating(value, monotonicTime)
+	poller = AxisPoller(device, mapper, sink, args.rate)
+	read = device.read
+	def timedRead():
+		polls.append(time.monotonic())
+		return read()
+	device.read = timedRead
+	poller.start()
+	sampler.start()
+	while not device.finished():
+		time.sleep(0.05)
+	poller.stop()
+	sampler.stop()
+
+	intervals = np.diff(polls) * 1000
+	ratingTimes, ratingValues, handled = [np.array(column) for column in zip(*ratings)]
+	# the rating that was current at every reading of the trace against the trace itself mapped without smoothing
+	reference = np.array([AxisMapper(-10, 10, 0, args.deadband).map(value, 0) for value in device.values])
+	current = ratingValues[np.clip(np.searchsorted(ratingTimes - device.start, device.times, side="right") - 1, 0, len(ratingValues) - 1)]
+	print(f"{len(polls)} polls at {len(polls) / device.times[-1]:.0f}/s (target {args.rate}), interval p50 {np.percentile(intervals, 50):.2f} ms p99 {np.percentile(intervals, 99):.2f} ms max {intervals.max():.2f} ms")
+	print(f"{len(ratings)} rating changes, {len(samples)} samples, ratings within {ratingValues.min():g}..{ratingValues.max():g}")
+	print(f"reading to sampler: p50 {np.percentile(handled - ratingTimes, 50) * 1000:.3f} ms, max {(handled - ratingTimes).max() * 1000:.3f} ms")
+	print(f"rating against the unsmoothed trace: mean absolute error {np.abs(current - reference).mean():.3f}, max {np.abs(current - reference).max():.3f}")
+
+def benchClock(args):
+	# Drift of the sample timestamps against the true media time of a simulated clip. Like libvlc, the player
+	# updates the time returned by get_time() every report interval (with jitter), a bit late, and when a seek lands.
+	# It is seeked twice, keeps playing the old position until the seek lands on the keyframe before the target,
+	# and stalls once. Runs in simulated time, so it takes no longer than the computation.
+	import numpy as np
+	from mediaclock import MediaClock, SEEK_SETTLE_TIME
+	rng = np.random.default_rng(args.seed)
+	start = time.monotonic()
+	clock = MediaClock()
+	clock.reset(0)
+	step = 0.001
+	seeks = {round(args.seconds * 0.3 / step): 120000, round(args.seconds * 0.6 / step): 5000}
+	stall = range(round(args.seconds * 0.8 / step), round((args.seconds * 0.8 + 0.4) / step))
+	truth = 0.0
+	reported = 0.0
+	nextReport = 0.0
+	landing = None
+	landedAt = None
+	inFlight = 0
+	# errors of all samples and of the samples within SEEK_SETTLE_TIME after a seek landed
+	errors = {"get_time()": ([], []), "media clock": ([], [])}
+	clock.setRate(args.rate, start)
+	clock.setPlaying(True, start)
+	for tick in range(round(args.seconds / step)):
+		now = start + tick * step
+		if tick in seeks:
+			clock.seek(seeks[tick], now)
+			landing = (now + args.seek_ms / 1000, seeks[tick] - rng.uniform(0, args.keyframe_ms))
+		if landing is not None and now >= landing[0]:
+			truth = reported = landing[1]
+			clock.update(reported, now)
+			landedAt = now
+			landing = None
+			nextReport = now + args.report_interval / 1000 * rng.uniform(0.5, 1.5)
+		if tick in stall:
+			if tick == stall.start:
+				clock.setPlaying(False, now)
+			continue
+		if tick == stall.stop:
+			clock.setPlaying(True, now)
+		truth += step * 1000 * args.rate
+		if now >= nextReport:
+			# until a seek lands these are still times of the old position
+			reported = truth - rng.uniform(0, args.report_lag)
+			clock.update(reported, now)
+			nextReport = now + args.report_interval / 1000 * rng.uniform(0.5, 1.5)
+		if tick % round(1 / args.sample_rate / step) == 0:
+			if landing is not None:
+				# the app stamps these with the seek target while the old position is still on screen
+				inFlight += 1
+				continue
+			afterSeek = landedAt is not None and now - landedAt < SEEK_SETTLE_TIME
+			# a sample stamped with the time polled with get_time() and with the media clock
+			for name, stamp in [("get_time()", reported), ("media clock", clock.now(now))]:
+				errors[name][0].append(stamp - truth)
+				if afterSeek:
+					errors[name][1].append(stamp - truth)
+	for name, (allErrors, seekErrors) in errors.items():
+		for label, values in [("", allErrors), (" after seeks", seekErrors)]:
+			values = np.abs(values)
+			print(f"{name + label:<24} error against the true media time: mean {values.mean():6.1f} ms, p95 {np.percentile(values, 95):6.1f} ms, max {values.max():7.1f} ms ({len(values)} samples)")
+	print(f"media clock: {clock.corrections} slewed corrections, {clock.resyncs} resyncs, {inFlight} samples while a seek was in flight left out")
+
+def benchSeek(args):
+	# Scrubbing against a simulated player that handles one seek after the other and needs --seek-ms for each.
+	# Compares sending every slider change to the player with the seek scheduler.
+	import os
+	os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+	from PyQt5 import QtCore, QtWidgets
+	from seeking import SeekScheduler
+	app = QtWidgets.QApplication.instance() or QtWidgets.QApplication(sys.argv)
+
+	class SlowPlayer(object):
+		def __init__(self):
+			self.queue = []
+			self.time = 0
+			self.busyUntil = 0.0
+			self.reported = None
+		def set_time(self, ms, fast=False):
+			# libvlc queues the seeks and works through them in order
+			self.busyUntil = max(self.busyUntil, time.monotonic()) + args.seek_ms / 1000
+			self.queue.append((self.busyUntil, ms))
+		def poll(self):
+			while self.queue and self.queue[0][0] <= time.monotonic():
+				self.time = self.queue.pop(0)[1]
+				if self.reported is not None:
+					self.reported(self.time)
+
+	def run(useScheduler):
+		player = SlowPlayer()
+		scheduler = SeekScheduler(player, timeout=1000)
+		if useScheduler:
+			player.reported = scheduler.timeReported
+		targets = [int(i * 997) % 600000 for i in range(args.requests)]
+		start = time.monotonic()
+		for i, target in enumerate(targets):
+			while time.monotonic() < start + i * args.interval / 1000:
+				player.poll()
+				app.processEvents()
+			if useScheduler:
+				scheduler.seek(target)
+			else:
+				player.set_time(target)
+		lastRequest = time.monotonic()
+		while player.queue or scheduler.isBusy():
+			player.poll()
+			app.processEvents()
+		arrived = time.monotonic() - lastRequest
+		sent = scheduler.sent if useScheduler else args.requests
+		print(f"{'seek scheduler' if useScheduler else 'every change':<15} {sent:4d} of {args.requests} seeks sent, at the last target {arrived * 1000:7.0f} ms after the last change, final time {'ok' if player.time == targets[-1] else 'wrong'}")
+		if useScheduler:
+			requested, sent, median, maximum = scheduler.stats()
+			print(f"{'':<15} seek latency median {median * 1000:.0f} ms, max {maximum * 1000:.0f} ms")
+
+	run(False)
+	run(True)
+	return skipSteps(args, app)
+
+def skipSteps(args, app):
+	# Repeated 1 s skips like held arrow keys, against a player on its own thread that keeps reporting its time
+	# like libvlc every --report-ms, also while a seek is on the way. Each skip starts from the engine's cached time,
+	# so the skips only add up if no report from before a seek moves that time back.
+	import threading
+	import vlc
+	from vlc import EventType
+	from playback import PlaybackEngine
+
+	class Event(object):
+		def __init__(self, eventType, newTime):
+			self.type = eventType
+			self.u = type("EventData", (), {"new_time": newTime})
+
+	class ReportingPlayer(object):
+		def __init__(self):
+			self.callbacks = {}
+			self.time = 0
+			self.queue = []
+			self.lock = threading.Lock()
+			self.running = True
+			self.thread = threading.Thread(target=self.run, daemon=True)
+		def event_manager(self):
+			return self
+		def event_attach(self, eventType, callback):
+			self.callbacks.setdefault(eventType, []).append(callback)
+		def set_time(self, ms, fast=False):
+			with self.lock:
+				self.queue.append((time.monotonic() + args.seek_ms / 1000, ms))
+		def run(self):
+			while self.running:
+				with self.lock:
+					while self.queue and self.queue[0][0] <= time.monotonic():
+						self.time = self.queue.pop(0)[1]
+					reported = self.time
+				for callback in self.callbacks.get(EventType.MediaPlayerTimeChanged, []):
+					callback(Event(EventType.MediaPlayerTimeChanged, reported))
+				time.sleep(args.report_ms / 1000)
+		def __getattr__(self, name):
+			return lambda *a, **k: 0
+
+	player = ReportingPlayer()
+	engine = PlaybackEngine(player)
+	engine.setDuration(3600000)
+	player.thread.start()
+	for step in range(args.steps):
+		engine.setTime(engine.time + 1000)
+		end = time.monotonic() + args.interval / 1000
+		while time.monotonic() < end:
+			app.processEvents()
+			time.sleep(0.001)
+	end = time.monotonic() + 2
+	while time.monotonic() < end and (engine.seeker.isBusy() or player.queue):
+		app.processEvents()
+		time.sleep(0.001)
+	# the reports after the last seek
+	end = time.monotonic() + 5 * args.report_ms / 1000
+	while time.monotonic() < end:
+		app.processEvents()
+		time.sleep(0.001)
+	player.running = False
+	expected = args.steps * 1000
+	print(f"{args.steps} skips of 1 s every {args.interval:.0f} ms: engine time {engine.time} ms, player time {player.time} ms, expected {expected} ms, "
+		+ f"{engine.seeker.sent} seeks sent, {'ok' if engine.time == expected and player.time == expected else 'wrong'}")
+	return 0 if engine.time == expected and player.time == expected else 1
+
+def benchEndOfMedia(args):
+	# Runs the end of media handling against a mocked player that answers from its own thread like libvlc, and checks
+	# that the GUI thread never sleeps: time.sleep() must not be called on it and a 1 ms timer must keep firing.
+	import os, threading
+	os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+	from PyQt5 import QtCore, QtWidgets
+	import vlc
+	from vlc import EventType
+	from playback import PlaybackEngine
+	app = QtWidgets.QApplication.instance() or QtWidgets.QApplication(sys.argv)
+
+	class Event(object):
+		def __init__(self, eventType):
+			self.type = eventType
+			self.u = None
+
+	class MockPlayer(object):
+		# reaches Playing and Paused after a delay on another thread, or never if respond is False
+		def __init__(self, respond):
+			self.respond = respond
+			self.callbacks = {}
+			self.state = vlc.State.Ended
+		def event_manager(self):
+			return self
+		def event_attach(self, eventType, callback):
+			self.callbacks.setdefault(eventType, []).append(callback)
+		def fire(self, eventType, state, delay):
+			def run():
+				time.sleep(delay)
+				self.state = state
+				for callback in self.callbacks.get(eventType, []):
+					callback(Event(eventType))
+			threading.Thread(target=run, daemon=True).start()
+		def stop(self):
+			self.state = vlc.State.Stopped
+		def play(self):
+			if self.respond:
+				self.fire(EventType.MediaPlayerPlaying, vlc.State.Playing, args.delay / 1000)
+		def pause(self):
+			if self.respond:
+				self.fire(EventType.MediaPlayerPaused, vlc.State.Paused, args.delay / 1000)
+		def set_time(self, *a):
+			pass
+		def set_position(self, *a):
+			pass
+
+	guiThread = threading.current_thread()
+	sleep = time.sleep
+	sleepsOnGuiThread = []
+	def checkedSleep(seconds):
+		if threading.current_thread() is guiThread:
+			sleepsOnGuiThread.append(seconds)
+		sleep(seconds)
+	time.sleep = checkedSleep
+
+	for name, respond in [("player answers", True), ("player never answers", False)]:
+		engine = PlaybackEngine(MockPlayer(respond))
+		engine.endOfMedia.timer.setInterval(args.timeout)
+		result = []
+		engine.endOfMedia.finished.connect(result.append)
+		beats = []
+		heartbeat = QtCore.QTimer()
+		heartbeat.setTimerType(QtCore.Qt.PreciseTimer)
+		heartbeat.timeout.connect(lambda: beats.append(time.monotonic()))
+		heartbeat.start(1)
+		start = time.monotonic()
+		engine.endOfMedia.start()
+		while len(result) == 0 and time.monotonic() - start < args.timeout / 1000 + 2:
+			app.processEvents(QtCore.QEventLoop.AllEvents, 5)
+		heartbeat.stop()
+		gaps = [b - a for a, b in zip(beats, beats[1:])]
+		print(f"{name:<21} finished {'with the last frame' if result == [True] else 'by the timeout' if result == [False] else 'never'} after {(time.monotonic() - start) * 1000:.0f} ms, "
+			+ f"longest GUI stall {max(gaps) * 1000 if gaps else 0:.1f} ms, time.sleep on the GUI thread: {len(sleepsOnGuiThread)} calls")
+	time.sleep = sleep
+	return 1 if sleepsOnGuiThread else 0
+
+def benchPlaylist(args):
+	# gap between two clips when the next clip is opened after the end of the previous one, as a session with one video
+	# per load does, against switching to a second player that preloaded it. Needs libvlc and a few video files.
+	import os, tempfile
+	os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+	from PyQt5 import QtWidgets
+	import vlc
+	from playback import PlaybackStats
+	from mediacache import MediaCache
+	from deck import Deck
+	app = QtWidgets.QApplication.instance() or QtWidgets.QApplication(sys.argv)
+	instance = vlc.Instance("--vout=dummy", "--aout=dummy")
+	stats = PlaybackStats()
+
+	def waitUntil(predicate, timeout=10.0):
+		deadline = time.monotonic() + timeout
+		while not predicate():
+			if time.monotonic() > deadline:
+				return False
+			app.processEvents()
+			time.sleep(0.001)
+		return True
+
+	def playToEnd(deck):
+		# plays only the last part of the clip, returns when libvlc reported the end
+		deck.mediaplayer.play()
+		waitUntil(lambda: deck.engine.state == vlc.State.Playing)
+		deck.engine.setTime(max(deck.engine.duration - args.tail, 0))
+		waitUntil(lambda: deck.engine.state == vlc.State.Ended, args.tail / 1000 + 10)
+		return deck.engine.stateTime
+
+	def startedAfter(deck, endedAt):
+		deck.mediaplayer.play()
+		if not waitUntil(lambda: deck.engine.state == vlc.State.Playing):
+			return None
+		return deck.engine.stateTime - endedAt
+
+	with tempfile.TemporaryDirectory() as directory:
+		# a fresh media cache per run, so both parse every clip
+		deck = Deck(instance, stats, MediaCache(os.path.join(directory, "reopen.json")))
+		reopenGaps = []
+		for index, path in enumerate(args.clips):
+			deck.open(path)
+			deck.load()
+			waitUntil(lambda: deck.info is not None)
+			if index > 0:
+				reopenGaps.append(startedAfter(deck, endedAt))
+			endedAt = playToEnd(deck)
+		deck.stop()
+
+		cache = MediaCache(os.path.join(directory, "preload.json"))
+		decks = [Deck(instance, stats, cache), Deck(instance, stats, cache)]
+		preloadGaps = []
+		decks[0].open(args.clips[0])
+		decks[0].load()
+		waitUntil(lambda: decks[0].info is not None)
+		for index in range(len(args.clips)):
+			deck, standby = decks[index % 2], decks[(index + 1) % 2]
+			if index > 0:
+				preloadGaps.append(startedAfter(deck, endedAt))
+				standby.stop()
+			if index + 1 < len(args.clips):
+				# in a session the next clip has the whole current clip to preload
+				standby.preload(args.clips[index + 1])
+				waitUntil(standby.isPrepared)
+			endedAt = playToEnd(deck)
+		for deck in decks:
+			deck.stop()
+
+	for name, gaps in [("open after the end", reopenGaps), ("preloaded player", preloadGaps)]:
+		measured = sorted(gap for gap in gaps if gap is not None)
+		if len(measured) == 0:
+			print(f"{name:<20} no clip started")
+			continue
+		print(f"{name:<20} {len(measured)} switches, gap median {measured[len(measured) // 2] * 1000:.1f} ms, max {measured[-1] * 1000:.1f} ms"
+			+ (f", {len(gaps) - len(measured)} clips did not start" if len(measured) < len(gaps) else ""))
+
+def benchTimeline(args):
+	# time to build the timeline index of a video with different numbers of worker processes, and the cost of a hover preview. Needs libvlc.
+	import os, tempfile
+	os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+	from PyQt5 import QtCore, QtWidgets
+	from mediacache import MediaInfo, fingerprint
+	from timeline import TimelineIndexer, TimelinePreview
+	app = QtWidgets.QApplication.instance() or QtWidgets.QApplication(sys.argv)
+	info = MediaInfo(int(args.duration * 1000), [], fingerprint(args.video))
+	index = None
+	for workers in args.workers:
+		with tempfile.TemporaryDirectory() as directory:
+			indexer = TimelineIndexer(directory, workers, args.interval)
+			result = []
+			indexer.finished.connect(lambda path, built: result.append(built))
+			indexer.failed.connect(result.append)
+			start = time.perf_counter()
+			indexer.index(args.video, info)
+			while len(result) == 0:
+				app.processEvents(QtCore.QEventLoop.AllEvents, 50)
+			seconds = time.perf_counter() - start
+			if isinstance(result[0], str):
+				print(f"{workers} workers: failed: {result[0]}")
+				return 1
+			index = result[0]
+			print(f"{workers} workers: {len(index.times)} thumbnails and {len(index.loudness)} loudness values in {seconds:.2f} s")
+	preview = TimelinePreview()
+	start = time.perf_counter()
+	for i in range(args.hovers):
+		# every hover on another second, so nothing is reused
+		preview.showAt(index, i * 1000 % max(info.duration, 1), QtCore.QPoint(100, 100))
+	print(f"hover preview: {(time.perf_counter() - start) / args.hovers * 1000:.2f} ms per position, the main player is not touched")
+
+def benchRaters(args):
+	# many simulated raters on this machine against one coordinator with a simulated media clock: rating throughput and
+	# how far the media time stamped by the raters is from the coordinator's own media time at the same moment
+	from mediaclock import MediaClock
+	from multirater import Coordinator, RaterClient
+	from samplestore import lastValuePerTimestamp, mergeStreams
+	clock = MediaClock()
+	clock.setPlaying(True)
+	coordinator = Coordinator(args.address, clock.now, lambda: True, args.clock_rate, measureSkew=True)
+	coordinator.start()
+	clients = [RaterClient(args.address, f"rater{i + 1}") for i in range(args.raters)]
+	for client in clients:
+		client.connect()
+	# a few pings and clock messages before the ratings start
+	time.sleep(args.warmup)
+	coordinator.clear()
+	random = np.random.default_rng(0)
+	interval = 1.0 / args.rate
+	start = time.monotonic()
+	deadline = start
+	while time.monotonic() - start < args.seconds:
+		# every rater changes its rating rate times per second
+		for client, value in zip(clients, random.integers(-10, 11, len(clients))):
+			client.setRating(int(value))
+		deadline = max(deadline + interval, time.monotonic())
+		time.sleep(max(deadline - time.monotonic(), 0))
+	sent = sum(client.sent for client in clients)
+	waitUntil = time.monotonic() + 5
+	while coordinator.received < sent and time.monotonic() < waitUntil:
+		time.sleep(0.01)
+	seconds = time.monotonic() - start
+	received, median, maximum = coordinator.stats()
+	print(f"{args.raters} raters over {args.address}: {received}/{sent} ratings received, {received / seconds:.0f} ratings/s")
+	print(f"clock skew of the rater stamps: median {median:.1f} ms, max {maximum:.1f} ms" if median is not None else "no clock skew measured")
+	merged = lambda: mergeStreams([lastValuePerTimestamp(*store.view("time", "value")) for name, store in coordinator.raters()])
+	(times, columns), mergeSeconds, peak = measure(merged)
+	print(f"merge into {len(columns)} columns: {len(times)} rows in {mergeSeconds:.3f} s")
+	for client in clients:
+		client.close()
+	coordinator.stop()
+	return 0 if received == sent and (maximum is None or maximum <= args.max_skew) else 1
+
+def benchPlot(args):
+	# per frame cost of the live rating plot while the sampler appends, on top of a long session, offscreen so it runs without a display
+	import os
+	os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+	from PyQt5 import QtWidgets
+	from samplestore import SampleStore, MarkerStore
+	from ratingplot import RatingPlot
+	app = QtWidgets.QApplication.instance() or QtWidgets.QApplication(sys.argv)
+	perFrame = max(args.rate // args.fps, 1)
+	times, values, monotonic = syntheticSession(args.samples + args.frames * perFrame, args.rate)
+	samples = SampleStore()
+	markers = MarkerStore()
+	samples.extend(times[:args.samples], values[:args.samples], monotonic[:args.samples])
+	markerTimes = times[:args.samples:args.rate * 30]
+	markers.extend(markerTimes, np.ones(len(markerTimes)))
+	plot = RatingPlot(samples, markers)
+	plot.resize(args.width, args.height)
+	plot.setSpan(times[-1] + 1)
+	plot.show()
+	app.processEvents()
+	start = time.perf_counter()
+	plot.rebuild()
+	rebuildSeconds = time.perf_counter() - start
+	start = time.perf_counter()
+	plot.repaint()
+	repaintSeconds = time.perf_counter() - start
+	print(f"{args.samples} samples on {args.width} columns: rebuild {rebuildSeconds * 1000:.2f} ms, full repaint {repaintSeconds * 1000:.2f} ms")
+	frames = []
+	for frame in range(args.frames):
+		# what the sampler appends between two refreshes of the plot
+		first = args.samples + frame * perFrame
+		samples.extend(times[first:first + perFrame], values[first:first + perFrame], monotonic[first:first + perFrame])
+		start = time.perf_counter()
+		plot.refresh()
+		plot.setPlayhead(times[first + perFrame - 1])
+		app.processEvents()
+		frames.append(time.perf_counter() - start)
+	frames = np.array(frames) * 1000
+	print(f"{args.frames} frames of {perFrame} new samples: median {np.median(frames):.3f} ms, p99 {np.percentile(frames, 99):.3f} ms, max {frames.max():.3f} ms")
+	plot.close()
+	return 0 if np.percentile(frames, 99) <= args.max_frame else 1
+
+def benchSaves(args):
+	# intermediate saves spread over a long session: the full export every time against appending the new rows
+	import os, tempfile
+	from samplestore import SampleStore, MarkerStore
+	from saveworker import SaveSnapshot, IncrementalSave
+	from exporters import exporterByName
+	count = int(args.minutes * 60 * args.rate)
+	times, values, monotonic = syntheticSession(count, args.rate)
+	bounds = np.linspace(0, count, args.saves + 1).astype(int)
+	with tempfile.TemporaryDirectory() as directory:
+		modes = [("incremental", None)] + [("full " + name, name) for name in args.formats]
+		for label, format in modes:
+			samples, markers = SampleStore(), MarkerStore()
+			incremental = IncrementalSave(os.path.join(directory, "session.rows.csv")) if format is None else None
+			seconds = []
+			for first, last in zip(bounds[:-1], bounds[1:]):
+				samples.extend(times[first:last], values[first:last], monotonic[first:last])
+				markers.append(times[last - 1], 1)
+				snapshot = SaveSnapshot.take(os.path.join(directory, "session." + str(format)), format or "csv", samples, markers, 1, -10, 10,
+					{"video": "benchmark"}, None, incremental)
+				start = time.perf_counter()
+				if incremental is not None:
+					incremental.append(snapshot)
+				else:
+					exporterByName(format).write(snapshot.filename, snapshot.exportData())
+				seconds.append(time.perf_counter() - start)
+			print(f"{label:<16} {args.saves} saves of a {args.minutes:.0f} min session ({count} samples): total {sum(seconds):8.2f} s, "
+				f"first {seconds[0] * 1000:8.1f} ms, last {seconds[-1] * 1000:8.1f} ms")
+
+def benchBatch(args):
+	# batch mode over a directory as the app leaves it: every export comes with its metadata and the rows of its
+	# incremental saves, and an export that did not finish left its partial file. Checks that each session is read once.
+	import os, tempfile, contextlib, io
+	import batch
+	from samplestore import SampleStore, MarkerStore
+	from saveworker import SaveSnapshot, IncrementalSave
+	from exporters import exporterByName, incrementalFilename
+	count = int(args.minutes * 60 * args.rate)
+	with tempfile.TemporaryDirectory() as directory:
+		for session in range(args.sessions):
+			times, values, monotonic = syntheticSession(count, args.rate, session)
+			samples, markers = SampleStore(), MarkerStore()
+			samples.extend(times, values, monotonic)
+			filename = os.path.join(directory, f"session{session}.csv")
+			snapshot = SaveSnapshot.take(filename, "csv", samples, markers, 1, -10, 10, {"video": "benchmark"}, None, IncrementalSave(incrementalFilename(filename)))
+			snapshot.incremental.append(snapshot)
+			exporterByName("csv").write(filename, snapshot.exportData())
+			with open(os.path.join(directory, f".session{session}.csv.partial"), "w") as file:
+				file.write(",".join(["time_ms", "rating", "marker"]) + "\n")
+		files = len(os.listdir(directory))
+		found = batch.findSessions([directory])
+		aggregate = os.path.join(directory, "aggregate.csv")
+		start = time.perf_counter()
+		with contextlib.redirect_stdout(io.StringIO()):
+			failed = batch.main([directory, "--aggregate", aggregate] + (["--workers", str(args.workers)] if args.workers else []))
+		seconds = time.perf_counter() - start
+		with open(aggregate, encoding="utf-8") as file:
+			rows = sum(1 for line in file) - 1
+	print(f"{len(found)} of {args.sessions} sessions found among {files} files, "
+		f"{rows} aggregated rows for {args.sessions * count} samples, {seconds:.2f} s ({args.sessions * count / seconds:.0f} rows/s)")
+	return 0 if failed == 0 and len(found) == args.sessions and rows == args.sessions * count else 1
+
+def benchStartup(args):
+	# time until the window is painted and the default video is loaded, from the --profile-startup report of the app
+	# started in a new process for every run. The first run also fills the icon and media caches, the median is over
+	# the runs after it. --record appends the medians to a JSON lines file to compare releases.
+	import os, subprocess, json, statistics, datetime
+	import version
+	command = args.command or [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py")]
+	command = command + ["--profile-startup", "--quit-after-startup"]
+	if args.video is not None:
+		command += ["--set", "defaultVideoPath=" + json.dumps(args.video)]
+	environment = dict(os.environ)
+	if args.offscreen:
+		environment["QT_QPA_PLATFORM"] = "offscreen"
+	phases = {}
+	walls = []
+	for run in range(args.runs):
+		start = time.perf_counter()
+		try:
+			process = subprocess.run(command, capture_output=True, text=True, timeout=args.timeout, env=environment)
+		except subprocess.TimeoutExpired:
+			print(f"run {run + 1} did not finish within {args.timeout} s")
+			return 1
+		walls.append(time.perf_counter() - start)
+		report = {}
+		for line in process.stdout.splitlines():
+			if line.startswith("phase "):
+				name, ms = line.split()[1:3]
+				report[name] = float(ms)
+		if "ready" not in report:
+			print(f"run {run + 1} printed no startup profile:\n{process.stdout[-2000:]}{process.stderr[-2000:]}")
+			return 1
+		for name, ms in report.items():
+			phases.setdefault(name, []).append(ms)
+	warm = lambda values: statistics.median(values[1:] if len(values) > 1 else values)
+	print(f"{'phase':<14} {'first run':>10} {'median':>10}  (ms since app.py started)")
+	for name, values in phases.items():
+		print(f"{name:<14} {values[0]:10.1f} {warm(values):10.1f}")
+	print(f"{'process':<14} {walls[0] * 1000:10.1f} {warm(walls) * 1000:10.1f}  (launch to exit, with the interpreter)")
+	if args.record is not None:
+		record = {"date": datetime.datetime.now().isoformat(timespec="seconds"), "version": version.VERSION, "command": command[:2],
+			"runs": args.runs, "process_ms": round(warm(walls) * 1000, 1), "phases_ms": {name: round(warm(values), 1) for name, values in phases.items()}}
+		with open(args.record, "a", encoding="utf-8") as file:
+			file.write(json.dumps(record) + "\n")
+	return 0
+
+def main(argv):
+	parser = argparse.ArgumentParser(description="Benchmarks for Psychometric Study")
+	subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+	store = subparsers.add_parser("store", help="memory and append latency of the sample store against a list of lists")
+	store.add_argument("--samples", type=int, nargs="+", default=[10**4, 10**5, 10**6])
+	store.set_defaults(func=benchStore)
+
+	reduce = subparsers.add_parser("reduce", help="last value per timestamp and marker alignment as done by save()")
+	reduce.add_argument("--samples", type=int, nargs="+", default=[10**4, 10**5, 10**6])
+	reduce.set_defaults(func=benchReduce)
+
+	xlsx = subparsers.add_parser("xlsx", help="rows per second and peak memory of the XLSX export")
+	xlsx.add_argument("--samples", type=int, nargs="+", default=[10**4, 10**5])
+	xlsx.set_defaults(func=benchXlsx)
+
+	journal = subparsers.add_parser("journal", help="append cost and recovery time of the session journal")
+	journal.add_argument("--samples", type=int, nargs="+", default=[10**4, 10**5, 10**6])
+	journal.set_defaults(func=benchJournal)
+
+	formats = subparsers.add_parser("formats", help="write time and file size of every export format")
+	formats.add_argument("--samples", type=int, nargs="+", default=[10**4, 10**5, 10**6])
+	formats.set_defaults(func=benchFormats)
+
+	icons = subparsers.add_parser("icons", help="CPU cost per UI tick of rebuilding the play/pause icon against the icon cache")
+	icons.add_argument("--ticks", type=int, default=2000)
+	icons.set_defaults(func=benchIcons)
+
+	sound = subparsers.add_parser("sound", help="latency of the button feedback sound")
+	sound.add_argument("--sound", default="buttonSound.mp3")
+	sound.add_argument("--clicks", type=int, default=50)
+	sound.add_argument("--interval", type=float, default=0.2, help="seconds between clicks")
+	sound.add_argument("--min-interval", type=float, default=0.08, help="rate limit of the feedback sound")
+	sound.set_defaults(func=benchSound)
+
+	device = subparsers.add_parser("device", help="replay an axis trace through the analog input path, checks it without hardware")
+	device.add_argument("--trace", default=None, help="CSV with time_s and value in -1..1 (default: a synthetic dial trace)")
+	device.add_argument("--seconds", type=float, default=5.0, help="length of the synthetic trace")
+	device.add_argument("--rate", type=int, default=500, help="poll rate")
+	device.add_argument("--sample-rate", type=int, default=10)
+	device.add_argument("--smoothing", type=float, default=0.03)
+	device.add_argument("--deadband", type=float, default=0.05)
+	device.set_defaults(func=benchDevice)
+
+	clock = subparsers.add_parser("clock", help="timestamp drift of get_time() polling against the media clock on a simulated clip")
+	clock.add_argument("--seconds", type=float, default=120.0)
+	clock.add_argument("--rate", type=float, default=1.0, help="playback rate")
+	clock.add_argument("--report-interval", type=float, default=250.0, help="ms between the time reports of the player")
+	clock.add_argument("--report-lag", type=float, default=40.0, help="the reported time is up to this many ms behind")
+	clock.add_argument("--sample-rate", type=int, default=100)
+	clock.add_argument("--seek-ms", type=float, default=50.0, help="time the player needs to land a seek")
+	clock.add_argument("--keyframe-ms", type=float, default=500.0, help="a seek lands up to this many ms before its target")
+	clock.add_argument("--seed", type=int, default=0)
+	clock.set_defaults(func=benchClock)
+
+	seek = subparsers.add_parser("seek", help="seeks sent and time to reach the target while scrubbing, with and without the seek scheduler")
+	seek.add_argument("--requests", type=int, default=100, help="slider changes")
+	seek.add_argument("--interval", type=float, default=10.0, help="ms between slider changes")
+	seek.add_argument("--seek-ms", type=float, default=40.0, help="time the simulated player needs per seek")
+	seek.add_argument("--steps", type=int, default=20, help="1 s skips in a row")
+	seek.add_argument("--report-ms", type=float, default=50.0, help="ms between the time reports of the simulated player")
+	seek.set_defaults(func=benchSeek)
+
+	endOfMedia = subparsers.add_parser("endofmedia", help="end of media handling against a mocked player, checks that the GUI thread never sleeps")
+	endOfMedia.add_argument("--delay", type=float, default=50.0, help="ms the mocked player needs per state change")
+	endOfMedia.add_argument("--timeout", type=int, default=1000, help="ms until the handling gives up")
+	endOfMedia.set_defaults(func=benchEndOfMedia)
+
+	playlist = subparsers.add_parser("playlist", help="gap between clips with and without preloading the next clip on a second player, needs libvlc")
+	playlist.add_argument("clips", nargs="+", help="at least two video files, played in this order")
+	playlist.add_argument("--tail", type=float, default=1000.0, help="ms played at the end of every clip")
+	playlist.set_defaults(func=benchPlaylist)
+
+	timelineIndex = subparsers.add_parser("timeline", help="build time of the thumbnail and loudness index per number of workers, and the cost of a hover preview, needs libvlc")
+	timelineIndex.add_argument("video")
+	timelineIndex.add_argument("--duration", type=float, required=True, help="length of the video in seconds")
+	timelineIndex.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+	timelineIndex.add_argument("--interval", type=float, default=5.0, help="seconds of video per thumbnail")
+	timelineIndex.add_argument("--hovers", type=int, default=200)
+	timelineIndex.set_defaults(func=benchTimeline)
+
+	raters = subparsers.add_parser("raters", help="throughput and clock skew of many simulated raters sending to one coordinator over a local socket")
+	raters.add_argument("--raters", type=int, default=50)
+	raters.add_argument("--rate", type=float, default=20.0, help="rating changes per second and rater")
+	raters.add_argument("--seconds", type=float, default=5.0)
+	raters.add_argument("--warmup", type=float, default=1.0, help="seconds for the clock to settle before rating")
+	raters.add_argument("--address", default="127.0.0.1:47899", help="host:port or unix:/path")
+	raters.add_argument("--clock-rate", type=int, default=20, help="clock broadcasts per second")
+	raters.add_argument("--max-skew", type=float, default=50.0, help="ms, the benchmark fails above this")
+	raters.set_defaults(func=benchRaters)
+
+	plot = subparsers.add_parser("plot", help="per frame cost of the live rating plot at a million samples, offscreen")
+	plot.add_argument("--samples", type=int, default=10**6)
+	plot.add_argument("--rate", type=int, default=100, help="samples per second")
+	plot.add_argument("--fps", type=int, default=30, help="refreshes of the plot per second")
+	plot.add_argument("--frames", type=int, default=1000)
+	plot.add_argument("--width", type=int, default=1200)
+	plot.add_argument("--height", type=int, default=100)
+	plot.add_argument("--max-frame", type=float, default=1.0, help="ms, the benchmark fails when the 99th percentile is above this")
+	plot.set_defaults(func=benchPlot)
+
+	saves = subparsers.add_parser("saves", help="time of repeated intermediate saves over a long session, full exports against incremental saves")
+	saves.add_argument("--minutes", type=float, default=120)
+	saves.add_argument("--rate", type=int, default=100, help="samples per second")
+	saves.add_argument("--saves", type=int, default=50)
+	saves.add_argument("--formats", nargs="*", default=["csv"], help="formats of the full exports to compare with, xlsx takes minutes")
+	saves.set_defaults(func=benchSaves)
+
+	batchMode = subparsers.add_parser("batch", help="aggregation of a directory of exports with their incremental rows and metadata, checks that every session is read once")
+	batchMode.add_argument("--sessions", type=int, default=20)
+	batchMode.add_argument("--minutes", type=float, default=10)
+	batchMode.add_argument("--rate", type=int, default=100, help="samples per second")
+	batchMode.add_argument("--workers", type=int, default=None)
+	batchMode.set_defaults(func=benchBatch)
+
+	startup = subparsers.add_parser("startup", help="time until the window is painted and the default video is loaded, needs libvlc")
+	startup.add_argument("--command", nargs="+", help="the app to start, e.g. dist/PsychometricStudy/PsychometricStudy (default: app.py)")
+	startup.add_argument("--video", help="default video loaded at startup")
+	startup.add_argument("--runs", type=int, default=5)
+	startup.add_argument("--timeout", type=float, default=60.0, help="seconds per run")
+	startup.add_argument("--offscreen", action="store_true", help="start without showing the window")
+	startup.add_argument("--record", help="JSON lines file the medians are appended to")
+	startup.set_defaults(func=benchStartup)
+
+	args = parser.parse_args(argv)
+	return args.func(args)
+
+if __name__ == '__main__':
+	sys.exit(main(sys.argv[1:]))
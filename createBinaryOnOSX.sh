@@ -1 +1 @@
-python3 -m PyInstaller  --noconsole app.py --name PsychometricStudy --additional-hooks-dir hooks/ --icon icon.png --clean --osx-bundle-identifier=com.idogawa.psychometricstudy --noconfirm --add-binary="buttonSound.mp3:."
\ No newline at end of file
+python3 -m PyInstaller  --noconsole app.py --name PsychometricStudy --additional-hooks-dir hooks/ --icon icon.png --clean --osx-bundle-identifier=com.idogawa.psychometricstudy --noconfirm --add-binary="buttonSound.mp3:." --hidden-import batch --hidden-import rater --hidden-import multirater
\ No newline at end of file
@@ -0,0 +1,111 @@
+from PyQt5 import QtCore
+import vlc
+from playback import PlaybackEngine, setVideoOutput
+from mediacache import MediaLoader
+import seeking
+
+# libvlc opens the media and stops on its first frame
+START_PAUSED_OPTION = ":start-paused"
+DEFAULT_PRELOAD_TIMEOUT = 10000 # ms
+
+class Deck(QtCore.QObject):
+	# One libvlc player with its engine, media loader and video frame. A playlist session uses two: one plays the
+	# current clip while the other one opens the next clip and waits muted and paused on its first frame until it is shown.
+	ready = QtCore.pyqtSignal(bool) # False if the preloaded clip did not open
+
+	IDLE = 0
+	LOADING = 1
+	STARTING = 2
+	READY = 3
+	FAILED = 4
+
+	def __init__(self, instance, stats, cache, frame=None, timeout=DEFAULT_PRELOAD_TIMEOUT, parent=None):
+		super(Deck, self).__init__(parent)
+		self.instance = instance
+		self.mediaplayer = stats.wrap(instance.media_player_new())
+		self.engine = PlaybackEngine(self.mediaplayer, stats, self)
+		self.loader = MediaLoader(cache, parent=self)
+		self.frame = frame
+		self.media = None
+		self.path = None
+		self.info = None
+		self.step = self.IDLE
+		self.timer = QtCore.QTimer(self)
+		self.timer.setSingleShot(True)
+		self.timer.setInterval(timeout)
+		self.timer.timeout.connect(self.timedOut)
+		self.loader.loaded.connect(self.loaded)
+		self.engine.stateChanged.connect(self.stateChanged)
+		self.mediaplayer.video_set_key_input(False) # disable hotkeys on VLC
+		self.mediaplayer.video_set_mouse_input(False) # disable mouse events on VLC
+		if frame is not None:
+			setVideoOutput(self.mediaplayer, frame)
+
+	def open(self, path, fastSeek=False, startPaused=False):
+		# replaces the media of the player without playing it, load() reads its metadata
+		self.finish(self.IDLE)
+		self.path = path
+		self.info = None
+		self.media = self.instance.media_new(str(path))
+		if fastSeek and not seeking.FAST_SEEK_PER_CALL:
+			# libvlc 3 can only make all seeks of a media fast
+			self.media.add_option(seeking.FAST_SEEK_OPTION)
+		if startPaused:
+			self.media.add_option(START_PAUSED_OPTION)
+		self.mediaplayer.set_media(self.media)
+		self.engine.setMedia(self.media)
+
+	def load(self):
+		# True if the metadata came from the cache and loaded was already emitted
+		return self.loader.load(self.path, self.media)
+
+	def preload(self, path, fastSeek=False):
+		# opens the clip, parses it and decodes its first frame in the background, ready is emitted once it can be shown
+		self.open(path, fastSeek, True)
+		self.step = self.LOADING
+		self.timer.start()
+		self.load()
+
+	def isPrepared(self):
+		return self.step in (self.READY, self.FAILED)
+
+	def loaded(self, media, info):
+		if media is not self.media:
+			return
+		self.info = info
+		self.engine.setDuration(info.duration)
+		if self.step == self.LOADING:
+			self.step = self.STARTING
+			self.mediaplayer.audio_set_mute(True)
+			self.mediaplayer.play()
+
+	def stateChanged(self, state):
+		if self.step != self.STARTING:
+			return
+		if state == vlc.State.Playing:
+			# :start-paused was not applied, pause as early as possible
+			self.mediaplayer.set_pause(1)
+			self.engine.setTime(0)
+		elif state == vlc.State.Paused:
+			self.mediaplayer.audio_set_mute(False)
+			self.finish(self.READY)
+			self.ready.emit(True)
+		elif state == vlc.State.Error:
+			self.timedOut()
+
+	def timedOut(self):
+		print(f"The next clip {self.path} could not be preloaded")
+		self.mediaplayer.audio_set_mute(False)
+		self.finish(self.FAILED)
+		self.ready.emit(False)
+
+	def finish(self, step):
+		self.step = step
+		self.timer.stop()
+
+	def stop(self):
+		self.finish(self.IDLE)
+		self.mediaplayer.stop()
+		self.media = None
+		self.path = None
+		self.info = None
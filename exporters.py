@@ -0,0 +1,256 @@
+import os, json, time, importlib.util
+from collections import namedtuple
+import numpy as np
+
+# The reduced session as it is written to a file. times are media times in ms,
+# hasMarker is True on the rows where a marker is drawn at markerPosition. metadata is an optional
+# flat dictionary about the session (e.g. the input latencies) that is stored with the rows. raters is an optional
+# list of (name, values) with one more rating column per rater of a multi-rater session, NaN where a rater had no rating yet.
+ExportData = namedtuple("ExportData", ["times", "values", "hasMarker", "markerPosition", "lowerValue", "upperValue", "metadata", "raters"])
+ExportData.__new__.__defaults__ = (None, None)
+
+# rows converted to Python objects at once while streaming
+CHUNK_ROWS = 10000
+MS_PER_DAY = 86400000.0
+XLSX_MAX_ROWS = 1048576 # rows of an Excel sheet, about 2.9 hours at 100 samples per second
+
+class ExportCancelled(Exception):
+	pass
+
+def reportProgress(progress, cancelled, done, total):
+	# called between chunks by the exporters, raises ExportCancelled if the export should stop
+	if cancelled is not None and cancelled():
+		raise ExportCancelled()
+	if progress is not None:
+		progress(done / total if total > 0 else 1.0)
+
+def markerPositionForRange(lowerValue, upperValue):
+	# markers are drawn on the zero line if the range contains it, else on the bottom of the chart
+	if lowerValue < 0 and upperValue > 0:
+		return 0
+	return lowerValue
+
+def iterateChunks(data, chunkRows=CHUNK_ROWS):
+	# yields (first row, times, values, hasMarker) as lists, so only one chunk is converted at a time
+	for start in range(0, len(data.times), chunkRows):
+		stop = start + chunkRows
+		yield start, data.times[start:stop].tolist(), data.values[start:stop].tolist(), data.hasMarker[start:stop].tolist()
+
+class ExportResult(namedtuple("ExportResult", ["filename", "rows", "seconds"])):
+
+	def rowsPerSecond(self):
+		return self.rows / self.seconds if self.seconds > 0 else float("inf")
+
+	def __str__(self):
+		return f"{self.rows} rows written to {self.filename} in {self.seconds:.3f} s ({self.rowsPerSecond():.0f} rows/s)"
+
+# column names of the formats meant for analysis software
+COLUMNS = ["time_ms", "rating", "marker"]
+METADATA_KEY = "psychometricstudy"
+
+def raterColumns(data):
+	# (column name, values) of the raters, after the COLUMNS
+	return [("rating_" + name, values) for name, values in (data.raters or [])]
+
+# extension of the file that intermediate saves append to next to the export, see saveworker.IncrementalSave
+INCREMENTAL_EXTENSION = ".rows.csv"
+
+def incrementalFilename(filename):
+	return os.path.splitext(filename)[0] + INCREMENTAL_EXTENSION
+
+def metadataFilename(filename):
+	# formats without room for metadata get it in a JSON file next to them
+	return filename + ".json"
+
+def writeXlsx(filename, data, progress=None, cancelled=None):
+	# Streams the rows into xlsxwriter's constant_memory mode, which flushes every row to disk
+	# as soon as the next one starts, so rows have to be written in order. The time column
+	# holds native Excel times (fractions of a day) instead of formatted strings.
+	# xlsxwriter is imported on the first export instead of at the start of the app
+	import xlsxwriter
+	rows = len(data.times)
+	if rows > XLSX_MAX_ROWS:
+		# constant_memory mode drops the rows past the end of the sheet without an error
+		raise ValueError(f"The session has {rows} rows, an Excel sheet holds at most {XLSX_MAX_ROWS}. "
+			+ "Use Save as with a .csv or .parquet file name to export it.")
+	workbook = xlsxwriter.Workbook(filename, {'constant_memory': True})
+	worksheet = workbook.add_worksheet()
+	timeFormat = workbook.add_format({'num_format': '[h]:mm:ss.000'})
+
+	raters = raterColumns(data)
+	for first, times, values, hasMarker in iterateChunks(data):
+		reportProgress(progress, cancelled, first, rows)
+		raterValues = [column[first:first + len(times)].tolist() for name, column in raters]
+		for row, (ms, value, marker) in enumerate(zip(times, values, hasMarker), first):
+			worksheet.write_number(row, 0, ms / MS_PER_DAY, timeFormat)
+			if value == value:
+				worksheet.write_number(row, 1, value)
+			if marker:
+				worksheet.write_number(row, 2, data.markerPosition)
+			for column, raterValue in enumerate(raterValues, 3):
+				# no cell before the first rating of a rater
+				if raterValue[row - first] == raterValue[row - first]:
+					worksheet.write_number(row, column, raterValue[row - first])
+	reportProgress(progress, cancelled, rows, rows)
+
+	chart = workbook.add_chart({'type': 'line'})
+
+	chart.add_series({
+		'categories': '=Sheet1!$A$1:$A$'+str(rows),
+		'values': '=Sheet1!$B$1:$B$'+str(rows),
+		'name': 'Psychometric Study'
+	})
+
+	marker_chart = workbook.add_chart({'type': 'scatter'})
+	marker_chart.add_series({
+		'categories': '=Sheet1!$A$1:$A$'+str(rows),
+		'values': '=Sheet1!$C$1:$C$'+str(rows),
+		'name': 'Markers'
+	})
+
+	for column, (name, values) in enumerate(raters, 3):
+		letter = xlsxwriter.utility.xl_col_to_name(column)
+		chart.add_series({
+			'categories': '=Sheet1!$A$1:$A$'+str(rows),
+			'values': f'=Sheet1!${letter}$1:${letter}$'+str(rows),
+			'name': name
+		})
+
+	# Combine the charts.
+	chart.combine(marker_chart)
+
+	chart.set_y_axis({'name': 'response', 'name_font': {
+	                 'size': 14, 'bold': True}, 'num_font':  {'italic': True},
+					'min': data.lowerValue, 'max': data.upperValue,
+					'crossing': data.lowerValue
+					 })
+
+	chart.set_x_axis({'name': 'time', 'num_format': 'h:mm:ss',
+	                 'name_font': {'size': 14, 'bold': True}, 'num_font':  {'italic': True},
+					  'major_gridlines': {
+							'visible': True,
+							'line': {'width': 1, 'dash_type': 'solid'}
+						},
+						'position_axis': 'on_tick'
+					})
+
+	worksheet.insert_chart(0, 3 + len(raters), chart)
+
+	if data.metadata:
+		metadataSheet = workbook.add_worksheet("Metadata")
+		for row, (key, value) in enumerate(data.metadata.items()):
+			metadataSheet.write(row, 0, key)
+			metadataSheet.write(row, 1, value)
+	workbook.close()
+
+def writeCsv(filename, data, progress=None, cancelled=None):
+	# streamed chunk by chunk, marker is 1 on the rows with a marker
+	rows = len(data.times)
+	raters = raterColumns(data)
+	with open(filename, "w", newline="", encoding="utf-8") as file:
+		file.write(",".join(COLUMNS + [name for name, values in raters]) + "\n")
+		for first, times, values, hasMarker in iterateChunks(data):
+			reportProgress(progress, cancelled, first, rows)
+			if len(raters) == 0:
+				file.write("".join([f"{ms},{value:g},{int(marker)}\n" for ms, value, marker in zip(times, values, hasMarker)]))
+				continue
+			# the cells of a rater stay empty before its first rating
+			raterCells = zip(*[["" if value != value else f"{value:g}" for value in column[first:first + len(times)].tolist()] for name, column in raters])
+			file.write("".join([f"{ms},{'' if value != value else format(value, 'g')},{int(marker)},{','.join(cells)}\n" for ms, value, marker, cells in zip(times, values, hasMarker, raterCells)]))
+	if data.metadata:
+		with open(metadataFilename(filename), "w", encoding="utf-8") as file:
+			json.dump(data.metadata, file, indent=1)
+	reportProgress(progress, cancelled, rows, rows)
+
+def writeNpz(filename, data, progress=None, cancelled=None):
+	# the columns are written as they are, without converting a single value
+	reportProgress(progress, cancelled, 0, 1)
+	with open(filename, "wb") as file:
+		extra = {"metadata": json.dumps(data.metadata)} if data.metadata else {}
+		extra.update(raterColumns(data))
+		np.savez(file, time_ms=data.times, rating=data.values, marker=data.hasMarker, **extra)
+	reportProgress(progress, cancelled, 1, 1)
+
+def arrowTable(data):
+	import pyarrow
+	metadata = {METADATA_KEY: json.dumps(data.metadata)} if data.metadata else None
+	raters = raterColumns(data)
+	return pyarrow.table([pyarrow.array(data.times), pyarrow.array(data.values), pyarrow.array(data.hasMarker)] + [pyarrow.array(values) for name, values in raters],
+		names=COLUMNS + [name for name, values in raters], metadata=metadata)
+
+def writeParquet(filename, data, progress=None, cancelled=None):
+	import pyarrow.parquet
+	reportProgress(progress, cancelled, 0, 1)
+	pyarrow.parquet.write_table(arrowTable(data), filename)
+	reportProgress(progress, cancelled, 1, 1)
+
+def writeFeather(filename, data, progress=None, cancelled=None):
+	import pyarrow.feather
+	reportProgress(progress, cancelled, 0, 1)
+	pyarrow.feather.write_feather(arrowTable(data), filename)
+	reportProgress(progress, cancelled, 1, 1)
+
+def writeHdf5(filename, data, progress=None, cancelled=None):
+	import h5py
+	reportProgress(progress, cancelled, 0, 1)
+	with h5py.File(filename, "w") as file:
+		for name, column in list(zip(COLUMNS, [data.times, data.values, data.hasMarker])) + raterColumns(data):
+			file.create_dataset(name, data=column, compression="gzip", shuffle=True)
+		file.attrs["lowerValue"] = data.lowerValue
+		file.attrs["upperValue"] = data.upperValue
+		if data.metadata:
+			file.attrs["metadata"] = json.dumps(data.metadata)
+	reportProgress(progress, cancelled, 1, 1)
+
+class Exporter(namedtuple("Exporter", ["name", "extension", "description", "writer", "requires"])):
+	# requires names the optional module the format needs, if any
+
+	def isAvailable(self):
+		return self.requires is None or importlib.util.find_spec(self.requires) is not None
+
+	def fileFilter(self):
+		return f"{self.description} (*{self.extension})"
+
+	def write(self, filename, data, progress=None, cancelled=None):
+		# write next to the target and rename at the end, so a cancelled or failed export keeps the previous file
+		start = time.perf_counter()
+		directory, name = os.path.split(filename)
+		partialFilename = os.path.join(directory, "." + name + ".partial")
+		files = [(partialFilename, filename), (metadataFilename(partialFilename), metadataFilename(filename))]
+		try:
+			self.writer(partialFilename, data, progress, cancelled)
+			for partial, target in files:
+				if os.path.exists(partial):
+					os.replace(partial, target)
+		finally:
+			for partial, target in files:
+				if os.path.exists(partial):
+					os.remove(partial)
+		return ExportResult(filename, len(data.times), time.perf_counter() - start)
+
+EXPORTERS = [
+	Exporter("xlsx", ".xlsx", "Excel Files", writeXlsx, None),
+	Exporter("csv", ".csv", "CSV Files", writeCsv, None),
+	Exporter("npz", ".npz", "NumPy Archives", writeNpz, None),
+	Exporter("parquet", ".parquet", "Parquet Files", writeParquet, "pyarrow"),
+	Exporter("feather", ".feather", "Arrow Feather Files", writeFeather, "pyarrow"),
+	Exporter("hdf5", ".h5", "HDF5 Files", writeHdf5, "h5py"),
+]
+DEFAULT_EXPORTER = "xlsx"
+
+def availableExporters():
+	return [exporter for exporter in EXPORTERS if exporter.isAvailable()]
+
+def exporterByName(name):
+	for exporter in EXPORTERS:
+		if exporter.name == name:
+			return exporter
+	raise ValueError("Unknown export format " + str(name) + ", supported formats are " + ", ".join(exporter.name for exporter in EXPORTERS))
+
+def exporterForFilename(filename, default=DEFAULT_EXPORTER):
+	# the format follows the extension of the file, files without a known extension use the default format
+	extension = os.path.splitext(filename)[1].lower()
+	for exporter in EXPORTERS:
+		if exporter.extension == extension:
+			return exporter
+	return exporterByName(default)
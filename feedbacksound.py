@@ -0,0 +1,136 @@
+import os, ctypes, threading, time, wave
+from collections import deque
+from PyQt5 import QtCore
+import vlc
+from vlc import EventType
+
+try:
+	# QtMultimedia is missing in some PyQt5 builds or without an audio backend, libvlc is used then
+	from PyQt5 import QtMultimedia
+except ImportError:
+	QtMultimedia = None
+
+# PCM format the sound is decoded to
+SAMPLE_RATE = 44100
+CHANNELS = 2
+SAMPLE_WIDTH = 2
+
+def decodeToWav(instance, source, target, timeout=10.0):
+	# Decodes the audio of source into a WAV file with libvlc's audio callbacks. Blocks until the end of the sound.
+	chunks = []
+	done = threading.Event()
+	failed = []
+
+	@vlc.CallbackDecorators.AudioPlayCb
+	def playCallback(opaque, samples, count, pts):
+		chunks.append(ctypes.string_at(samples, count * CHANNELS * SAMPLE_WIDTH))
+
+	player = instance.media_player_new()
+	player.audio_set_callbacks(playCallback, None, None, None, None, None)
+	player.audio_set_format("S16N", SAMPLE_RATE, CHANNELS)
+	player.set_media(instance.media_new(source))
+	events = player.event_manager()
+	events.event_attach(EventType.MediaPlayerEndReached, lambda event: done.set())
+	events.event_attach(EventType.MediaPlayerEncounteredError, lambda event: (failed.append(True), done.set()))
+	player.play()
+	finished = done.wait(timeout)
+	player.stop()
+	player.release()
+	if not finished or failed or not chunks:
+		raise RuntimeError("Could not decode " + source)
+
+	partial = target + ".partial"
+	with wave.open(partial, "wb") as file:
+		file.setnchannels(CHANNELS)
+		file.setsampwidth(SAMPLE_WIDTH)
+		file.setframerate(SAMPLE_RATE)
+		file.writeframes(b"".join(chunks))
+	os.replace(partial, target)
+
+def cachedWavPath(source, cacheDirectory):
+	# the decoded file is reused until the source changes
+	stat = os.stat(source)
+	name = os.path.splitext(os.path.basename(source))[0]
+	return os.path.join(cacheDirectory, f"{name}-{stat.st_size}-{int(stat.st_mtime)}.wav")
+
+class FeedbackSound(QtCore.QObject):
+	# Button feedback sound played through one persistent output instead of a new player per click.
+	# The mp3 is decoded once on a worker thread into a WAV file in the cache, which a preloaded
+	# QSoundEffect plays with low latency. Until that is ready, or without QtMultimedia, a dedicated
+	# libvlc player with the media already set is used. Clicks closer together than minInterval
+	# (e.g. auto repeated Up/Down presses) do not start the sound again.
+	decoded = QtCore.pyqtSignal(str)
+	vlcPlaying = QtCore.pyqtSignal()
+
+	def __init__(self, instance, source, cacheDirectory, minInterval=0.08, parent=None):
+		super(FeedbackSound, self).__init__(parent)
+		self.instance = instance
+		self.source = source
+		self.minInterval = minInterval
+		self.lastPlayed = -minInterval
+		self.requested = None
+		self.latencies = deque(maxlen=1000)
+		self.skipped = 0
+		self.effect = None
+		self.player = None
+		if not os.path.isfile(source):
+			print("The feedback sound " + source + " does not exist.")
+			return
+
+		self.player = instance.media_player_new()
+		self.player.set_media(instance.media_new(source))
+		self.player.event_manager().event_attach(EventType.MediaPlayerPlaying, lambda event: self.vlcPlaying.emit())
+		self.vlcPlaying.connect(self.recordLatency)
+
+		if QtMultimedia is not None:
+			self.decoded.connect(self.loadEffect)
+			wavPath = cachedWavPath(source, cacheDirectory)
+			if os.path.isfile(wavPath):
+				self.loadEffect(wavPath)
+			else:
+				threading.Thread(target=self.decode, args=(cacheDirectory, wavPath), name="FeedbackSound", daemon=True).start()
+
+	def decode(self, cacheDirectory, wavPath):
+		try:
+			os.makedirs(cacheDirectory, exist_ok=True)
+			decodeToWav(self.instance, self.source, wavPath)
+		except Exception as e:
+			print(f"The feedback sound could not be decoded, using libvlc to play it: {e}")
+		else:
+			self.decoded.emit(wavPath)
+
+	def loadEffect(self, wavPath):
+		effect = QtMultimedia.QSoundEffect(self)
+		effect.setSource(QtCore.QUrl.fromLocalFile(wavPath))
+		effect.playingChanged.connect(self.effectPlayingChanged)
+		self.effect = effect
+
+	def effectPlayingChanged(self):
+		if self.effect.isPlaying():
+			self.recordLatency()
+
+	def recordLatency(self):
+		if self.requested is not None:
+			self.latencies.append(time.monotonic() - self.requested)
+			self.requested = None
+
+	def play(self):
+		now = time.monotonic()
+		if now - self.lastPlayed < self.minInterval:
+			self.skipped += 1
+			return
+		self.lastPlayed = now
+		self.requested = now
+		if self.effect is not None and self.effect.status() == QtMultimedia.QSoundEffect.Ready:
+			self.effect.play()
+		elif self.player is not None:
+			if self.player.get_state() in {vlc.State.Playing, vlc.State.Ended, vlc.State.Error}:
+				self.player.stop()
+			self.player.play()
+
+	def latencyStats(self):
+		# (count, median, maximum) of the delay between play() and the start of the output, in seconds
+		if len(self.latencies) == 0:
+			return 0, None, None
+		ordered = sorted(self.latencies)
+		return len(ordered), ordered[len(ordered) // 2], ordered[-1]
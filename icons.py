@@ -0,0 +1,82 @@
+import os, hashlib
+from collections import OrderedDict
+from PyQt5 import QtCore, QtGui
+import version
+
+ICON_MODES = [(QtGui.QIcon.Normal, "normal"), (QtGui.QIcon.Disabled, "disabled"), (QtGui.QIcon.Active, "active")]
+
+class IconCache(object):
+	# Icons rendered once per (icon name, color, size) and kept in a small LRU cache.
+	# qtawesome icons draw the font glyph again on every paint, the cached icons hold ready made pixmaps.
+	# With a directory the pixmaps are also kept on disk as PNG files. Importing qtawesome and loading its fonts
+	# takes longer than the rest of the window, with all icons on disk the app starts without them.
+
+	def __init__(self, maxSize=64, directory=None):
+		self.maxSize = maxSize
+		self.directory = directory
+		self.icons = OrderedDict()
+		self.hits = 0
+		self.misses = 0
+
+	def icon(self, name, color, size):
+		key = (name, color, size)
+		icon = self.icons.get(key)
+		if icon is not None:
+			self.hits += 1
+			self.icons.move_to_end(key)
+			return icon
+		self.misses += 1
+		icon = self.render(name, color, size)
+		self.icons[key] = icon
+		if len(self.icons) > self.maxSize:
+			self.icons.popitem(last=False)
+		return icon
+
+	def render(self, name, color, size):
+		icon = self.load(name, color, size)
+		if icon is not None:
+			return icon
+		import qtawesome
+		source = qtawesome.icon(name, color=color)
+		icon = QtGui.QIcon()
+		for mode, modeName in ICON_MODES:
+			pixmap = source.pixmap(QtCore.QSize(size, size), mode)
+			icon.addPixmap(pixmap, mode)
+			if self.directory is not None:
+				pixmap.save(self.filename(name, color, size, modeName), "PNG")
+		return icon
+
+	def filename(self, name, color, size, modeName):
+		# a new version of the app can come with other icons
+		ratio = QtGui.QGuiApplication.instance().devicePixelRatio()
+		key = hashlib.md5(f"{name}|{color}|{size}|{ratio}|{version.VERSION}".encode("utf-8")).hexdigest()
+		return os.path.join(self.directory, f"{key}-{modeName}.png")
+
+	def load(self, name, color, size):
+		# the icon from the disk cache, None if it is not there yet
+		if self.directory is None:
+			return None
+		try:
+			os.makedirs(self.directory, exist_ok=True)
+		except OSError:
+			self.directory = None
+			return None
+		icon = QtGui.QIcon()
+		for mode, modeName in ICON_MODES:
+			pixmap = QtGui.QPixmap(self.filename(name, color, size, modeName))
+			if pixmap.isNull():
+				return None
+			pixmap.setDevicePixelRatio(QtGui.QGuiApplication.instance().devicePixelRatio())
+			icon.addPixmap(pixmap, mode)
+		return icon
+
+	def clear(self):
+		self.icons.clear()
+
+def buttonStyleSheet(buttons, defaultColor):
+	# one style sheet for all buttons, so Qt parses and polishes it once instead of once per button
+	rules = []
+	for button in buttons:
+		if "type" not in button or button["type"] == "button":
+			rules.append("QPushButton#" + button["name"] + " { color: " + button.get("color", defaultColor) + "; }")
+	return "\n".join(rules)
@@ -0,0 +1,275 @@
+import os, math, struct, threading, time
+import numpy as np
+
+# Analog rating input. A device returns raw axis readings, an AxisMapper turns them into ratings
+# in the configured range and an AxisPoller reads the device on its own thread at a fixed rate and
+# passes every change on with its time.monotonic() timestamp.
+
+DEFAULT_POLL_RATE = 500 # readings per second
+DEFAULT_SMOOTHING = 0.03 # time constant of the smoothing in seconds, 0 turns it off
+DEFAULT_DEADBAND = 0.05 # part of the axis around its center that counts as the center
+DEFAULT_RESOLUTION = 0.1 # ratings are rounded to this step
+
+class InputDeviceError(Exception):
+	pass
+
+class AxisMapper(object):
+	# Maps raw readings from axisMin..axisMax onto lowerValue..upperValue, with the center of the axis on
+	# the center of the range. Readings within the deadband around the center count as the center.
+
+	def __init__(self, lowerValue, upperValue, smoothing=DEFAULT_SMOOTHING, deadband=DEFAULT_DEADBAND,
+			resolution=DEFAULT_RESOLUTION, invert=False):
+		self.setRange(lowerValue, upperValue)
+		self.setAxisRange(-1.0, 1.0)
+		self.smoothing = smoothing
+		self.deadband = min(max(deadband, 0.0), 0.99)
+		self.resolution = resolution
+		self.invert = invert
+		self.reset()
+
+	def setRange(self, lowerValue, upperValue):
+		self.lowerValue = lowerValue
+		self.upperValue = upperValue
+
+	def setAxisRange(self, axisMin, axisMax):
+		if axisMax <= axisMin:
+			raise ValueError(f"The axis range {axisMin}..{axisMax} is empty")
+		self.axisMin = axisMin
+		self.axisMax = axisMax
+
+	def reset(self):
+		self.smoothed = None
+		self.lastTime = None
+
+	def normalize(self, raw):
+		# -1..1 with the deadband removed
+		position = 2.0 * (min(max(raw, self.axisMin), self.axisMax) - self.axisMin) / (self.axisMax - self.axisMin) - 1.0
+		if self.invert:
+			position = -position
+		if abs(position) <= self.deadband:
+			return 0.0
+		return math.copysign((abs(position) - self.deadband) / (1.0 - self.deadband), position)
+
+	def map(self, raw, monotonicTime):
+		position = self.normalize(raw)
+		if self.smoothed is None or self.smoothing <= 0:
+			self.smoothed = position
+		else:
+			# exponential moving average that behaves the same at every poll rate
+			alpha = 1.0 - math.exp(-max(monotonicTime - self.lastTime, 0.0) / self.smoothing)
+			self.smoothed += alpha * (position - self.smoothed)
+		self.lastTime = monotonicTime
+		value = self.lowerValue + (self.smoothed + 1.0) / 2.0 * (self.upperValue - self.lowerValue)
+		if self.resolution > 0:
+			value = round(round(value / self.resolution) * self.resolution, 6)
+		return value
+
+class InputDevice(object):
+	# read() returns the latest (raw value, monotonic time) or None if nothing changed since the last call
+
+	axisMin = -1.0
+	axisMax = 1.0
+
+	def open(self):
+		pass
+
+	def read(self):
+		return None
+
+	def close(self):
+		pass
+
+class JoystickDevice(InputDevice):
+	# Linux joystick interface (/dev/input/js*), available for every HID joystick, gamepad and wheel without extra packages
+	EVENT = struct.Struct("IhBB") # time in ms, value, type, axis or button number
+	AXIS_EVENT = 0x02
+	axisMin = -32767
+	axisMax = 32767
+
+	def __init__(self, path="/dev/input/js0", axis=0):
+		self.path = path
+		self.axis = axis
+		self.fd = None
+
+	def open(self):
+		try:
+			self.fd = os.open(self.path, os.O_RDONLY | os.O_NONBLOCK)
+		except OSError as e:
+			raise InputDeviceError(f"Could not open the joystick {self.path}: {e}")
+
+	def read(self):
+		latest = None
+		while True:
+			try:
+				data = os.read(self.fd, self.EVENT.size * 64)
+			except BlockingIOError:
+				break
+			if not data:
+				break
+			for offset in range(0, len(data) - self.EVENT.size + 1, self.EVENT.size):
+				eventTime, value, kind, number = self.EVENT.unpack_from(data, offset)
+				# the initial state of the axes is reported with the init flag (0x80) set
+				if kind & ~0x80 == self.AXIS_EVENT and number == self.axis:
+					latest = value
+		return (latest, time.monotonic()) if latest is not None else None
+
+	def close(self):
+		if self.fd is not None:
+			os.close(self.fd)
+			self.fd = None
+
+class EvdevDevice(InputDevice):
+	# Any absolute axis of an evdev device (dials, sliders, joysticks), needs the evdev package
+
+	def __init__(self, path, axis="ABS_X"):
+		self.path = path
+		self.axisName = axis
+		self.device = None
+
+	def open(self):
+		try:
+			import evdev
+		except ImportError:
+			raise InputDeviceError("Reading evdev devices needs the evdev package (pip install evdev)")
+		try:
+			self.device = evdev.InputDevice(self.path)
+		except OSError as e:
+			raise InputDeviceError(f"Could not open the input device {self.path}: {e}")
+		self.axisCode = evdev.ecodes.ecodes[self.axisName]
+		self.absoluteType = evdev.ecodes.EV_ABS
+		info = self.device.absinfo(self.axisCode)
+		self.axisMin, self.axisMax = info.min, info.max
+		self.initial = info.value
+
+	def read(self):
+		if self.initial is not None:
+			# the position the axis had when the device was opened
+			initial, self.initial = self.initial, None
+			return initial, time.monotonic()
+		latest = None
+		try:
+			for event in self.device.read():
+				if event.type == self.absoluteType and event.code == self.axisCode:
+					latest = event
+		except BlockingIOError:
+			pass
+		if latest is None:
+			return None
+		# the kernel stamps the events with the wall clock, move them onto the monotonic clock
+		return latest.value, latest.timestamp() - (time.time() - time.monotonic())
+
+	def close(self):
+		if self.device is not None:
+			self.device.close()
+			self.device = None
+
+class ReplayDevice(InputDevice):
+	# Plays back a recorded axis trace in real time, for checking the input path without hardware.
+	# times are seconds from the start of the trace, values raw axis readings.
+
+	def __init__(self, times, values, axisMin=-1.0, axisMax=1.0, loop=False):
+		self.times = np.asarray(times, dtype=np.float64)
+		self.values = np.asarray(values, dtype=np.float64)
+		self.axisMin = axisMin
+		self.axisMax = axisMax
+		self.loop = loop
+		self.start = None
+		self.index = -1
+
+	@classmethod
+	def fromFile(cls, path, axisMin=-1.0, axisMax=1.0, loop=False):
+		# CSV with a header and the columns time_s and value, as written by writeTrace
+		table = np.atleast_1d(np.genfromtxt(path, delimiter=",", names=True))
+		return cls(table["time_s"], table["value"], axisMin, axisMax, loop)
+
+	def open(self):
+		self.start = time.monotonic()
+		self.index = -1
+
+	def finished(self):
+		return not self.loop and self.start is not None and time.monotonic() - self.start > self.times[-1]
+
+	def read(self):
+		now = time.monotonic()
+		elapsed = now - self.start
+		if self.loop:
+			elapsed %= self.times[-1]
+		index = int(np.searchsorted(self.times, elapsed, side="right")) - 1
+		if index == self.index or index < 0:
+			return None
+		self.index = index
+		return self.values[index], (now if self.loop else self.start + self.times[index])
+
+def writeTrace(path, times, values):
+	with open(path, "w", encoding="utf-8") as file:
+		file.write("time_s,value\n")
+		file.write("".join(f"{t:.6f},{value:g}\n" for t, value in zip(times, values)))
+
+def deviceFromConfig(config):
+	# device from the "inputDevice" entry of default.json
+	kind = config.get("type", "joystick")
+	if kind == "joystick":
+		return JoystickDevice(config.get("path", "/dev/input/js0"), config.get("axis", 0))
+	elif kind == "evdev":
+		return EvdevDevice(config["path"], config.get("axis", "ABS_X"))
+	elif kind == "replay":
+		return ReplayDevice.fromFile(config["path"], config.get("axisMin", -1.0), config.get("axisMax", 1.0), config.get("loop", False))
+	raise InputDeviceError("Unknown input device type " + str(kind) + ", supported types are joystick, evdev and replay")
+
+class AxisPoller(object):
+	# Reads the device at a fixed rate on its own thread and calls sink(rating, monotonic time) when the mapped rating changes.
+	# Like RatingSampler it sleeps until absolute deadlines so the rate does not drift.
+
+	def __init__(self, device, mapper, sink, rate=DEFAULT_POLL_RATE):
+		self.device = device
+		self.mapper = mapper
+		self.sink = sink
+		self.interval = 1.0 / rate
+		self.value = None
+		self.polls = 0
+		self.stopEvent = threading.Event()
+		self.thread = None
+
+	def start(self):
+		self.device.open()
+		self.mapper.setAxisRange(self.device.axisMin, self.device.axisMax)
+		self.mapper.reset()
+		self.stopEvent.clear()
+		self.thread = threading.Thread(target=self.run, name="AxisPoller", daemon=True)
+		self.thread.start()
+
+	def stop(self):
+		self.stopEvent.set()
+		if self.thread is not None:
+			self.thread.join()
+			self.thread = None
+		self.device.close()
+
+	def resend(self):
+		# pass the current rating on with the next reading even if it did not change, e.g. after the rating was reset
+		self.value = None
+
+	def run(self):
+		deadline = time.monotonic()
+		raw = None
+		while True:
+			deadline += self.interval
+			delay = deadline - time.monotonic()
+			if delay < 0:
+				deadline = time.monotonic()
+				delay = 0
+			if self.stopEvent.wait(delay):
+				break
+			self.polls += 1
+			reading = self.device.read()
+			if reading is not None:
+				raw, monotonicTime = reading
+			elif raw is not None and (self.mapper.smoothing > 0 or self.value is None):
+				# keep smoothing towards the last reading, a device only reports changes
+				monotonicTime = time.monotonic()
+			else:
+				continue
+			value = self.mapper.map(raw, monotonicTime)
+			if value != self.value:
+				self.value = value
+				self.sink(value, monotonicTime)
@@ -0,0 +1,126 @@
+import os, json, glob, struct, threading, time, weakref
+import numpy as np
+
+# A journal file starts with MAGIC, the length of a JSON header and the header itself,
+# followed by fixed-width little endian records: kind, media time, value, monotonic time.
+MAGIC = b"PSJ1"
+HEADER_LENGTH = struct.Struct("<I")
+RECORD = struct.Struct("<Bqdd")
+RECORD_DTYPE = np.dtype([("kind", "u1"), ("time", "<i8"), ("value", "<f8"), ("monotonic", "<f8")])
+SAMPLE = 1
+MARKER = 2
+# units of the media times, stored as "unit" in the header
+MINUTE = 0
+SECOND = 1
+MS = 2
+
+JOURNAL_PREFIX = "PsychometricStudy-"
+JOURNAL_EXTENSION = ".journal"
+DEFAULT_SYNC_INTERVAL = 1.0
+# a journal that was not touched for this many seconds does not belong to a running app
+STALE_AFTER = 10.0
+
+class JournalError(Exception):
+	pass
+
+class SessionJournal(object):
+	# Append-only journal of every sample and marker of a session, so a crash or power loss loses at most
+	# the last syncInterval seconds. Records are packed into a memory buffer by append() and written and
+	# fsynced by a background thread.
+	instances = weakref.WeakSet()
+
+	def __init__(self, path, header, syncInterval=DEFAULT_SYNC_INTERVAL):
+		self.path = path
+		self.syncInterval = syncInterval
+		self.lock = threading.Lock() # protects the buffer
+		self.fileLock = threading.Lock() # keeps the writes in order without blocking append()
+		self.buffer = bytearray()
+		self.file = open(path, "wb")
+		headerBytes = json.dumps(header).encode("utf-8")
+		self.file.write(MAGIC + HEADER_LENGTH.pack(len(headerBytes)) + headerBytes)
+		self.file.flush()
+		os.fsync(self.file.fileno())
+		self.stopEvent = threading.Event()
+		self.thread = threading.Thread(target=self.run, name="SessionJournal", daemon=True)
+		self.thread.start()
+		SessionJournal.instances.add(self)
+
+	@classmethod
+	def create(cls, directory, header, syncInterval=DEFAULT_SYNC_INTERVAL):
+		name = JOURNAL_PREFIX + time.strftime("%Y-%m-%d %H-%M-%S") + "-" + str(os.getpid())
+		path = os.path.join(directory, name + JOURNAL_EXTENSION)
+		attempt = 1
+		while os.path.exists(path):
+			path = os.path.join(directory, name + "-" + str(attempt) + JOURNAL_EXTENSION)
+			attempt += 1
+		return cls(path, header, syncInterval)
+
+	def append(self, kind, mediaTime, value, monotonicTime):
+		with self.lock:
+			self.buffer += RECORD.pack(kind, mediaTime, value, monotonicTime)
+
+	def extend(self, records):
+		# records is an array with RECORD_DTYPE, e.g. the records read from a journal that is recovered
+		with self.lock:
+			self.buffer += records.astype(RECORD_DTYPE).tobytes()
+
+	def run(self):
+		while not self.stopEvent.wait(self.syncInterval):
+			self.flush()
+
+	def flush(self):
+		with self.fileLock:
+			with self.lock:
+				data, self.buffer = self.buffer, bytearray()
+			if self.file is None:
+				return
+			if data:
+				self.file.write(data)
+				self.file.flush()
+				os.fsync(self.file.fileno())
+			else:
+				# show other instances that this journal is still in use
+				os.utime(self.path)
+
+	def close(self, delete=False):
+		self.stopEvent.set()
+		self.flush()
+		with self.fileLock:
+			if self.file is not None:
+				self.file.close()
+				self.file = None
+		if delete and os.path.exists(self.path):
+			os.remove(self.path)
+
+	@classmethod
+	def flushAll(cls):
+		for journal in list(cls.instances):
+			journal.flush()
+
+def findJournals(directory):
+	# journals that are left over from sessions that did not end cleanly, oldest first
+	paths = glob.glob(os.path.join(glob.escape(directory), JOURNAL_PREFIX + "*" + JOURNAL_EXTENSION))
+	return sorted([path for path in paths if time.time() - os.path.getmtime(path) > STALE_AFTER], key=os.path.getmtime)
+
+def readJournal(path):
+	# Returns (header, records). A record torn by a crash at the end of the file is ignored.
+	with open(path, "rb") as file:
+		data = file.read()
+	if data[:len(MAGIC)] != MAGIC or len(data) < len(MAGIC) + HEADER_LENGTH.size:
+		raise JournalError(path + " is not a session journal")
+	headerStart = len(MAGIC) + HEADER_LENGTH.size
+	headerEnd = headerStart + HEADER_LENGTH.unpack_from(data, len(MAGIC))[0]
+	try:
+		header = json.loads(data[headerStart:headerEnd].decode("utf-8"))
+	except ValueError as e:
+		raise JournalError(path + " has a damaged header: " + str(e))
+	count = (len(data) - headerEnd) // RECORD_DTYPE.itemsize
+	records = np.frombuffer(data, dtype=RECORD_DTYPE, count=count, offset=headerEnd)
+	return header, records
+
+def replayJournal(records, samples, markers):
+	# bulk load the records into the sample and marker stores
+	sampleRecords = records[records["kind"] == SAMPLE]
+	markerRecords = records[records["kind"] == MARKER]
+	samples.extend(sampleRecords["time"], sampleRecords["value"], sampleRecords["monotonic"])
+	markers.extend(markerRecords["time"], markerRecords["value"])
@@ -0,0 +1,101 @@
+from PyQt5 import QtCore, QtWidgets
+from PyQt5.QtCore import Qt
+from PyQt5.QtGui import QKeySequence
+
+# repeat of held keys, independent of the keyboard settings of the operating system
+DEFAULT_REPEAT_DELAY = 400 # ms until the first repeat
+DEFAULT_REPEAT_RATE = 20 # repeats per second
+
+def keyCode(event):
+	# arrow keys carry the keypad modifier on macOS and Enter always does, the hotkeys do not use it
+	return event.key() | int(event.modifiers() & ~Qt.KeypadModifier)
+
+class KeyBinding(object):
+
+	def __init__(self, button, onPress, onRelease, autoRepeat):
+		self.button = button
+		self.onPress = onPress
+		self.onRelease = onRelease
+		self.autoRepeat = autoRepeat
+		self.timer = None
+		self.buttonAutoRepeat = False
+
+class ButtonKeys(QtCore.QObject):
+	# Hotkeys that run the handler of their button straight from the key press, instead of
+	# animateClick() which delays the click by 100 ms and drops presses while it animates.
+	# The button is only shown as pressed, Qt repaints it with the next update. Held keys are
+	# repeated by a timer with a configurable rate and the repeats of the operating system are ignored.
+	# press() and release() can also be called by other input devices.
+
+	def __init__(self, window, repeatDelay=DEFAULT_REPEAT_DELAY, repeatRate=DEFAULT_REPEAT_RATE):
+		super(ButtonKeys, self).__init__(window)
+		self.window = window
+		self.bindings = {}
+		self.held = set()
+		self.setRepeat(repeatDelay, repeatRate)
+		QtWidgets.QApplication.instance().installEventFilter(self)
+
+	def setRepeat(self, delay, rate):
+		if rate <= 0:
+			raise ValueError("The key repeat rate must be greater than 0, not " + str(rate))
+		self.repeatDelay = int(delay)
+		self.repeatInterval = max(1, round(1000 / rate))
+
+	def bind(self, hotkey, button, onPress, onRelease=None, autoRepeat=False):
+		binding = KeyBinding(button, onPress, onRelease, autoRepeat)
+		if autoRepeat:
+			binding.timer = QtCore.QTimer(self)
+			binding.timer.setTimerType(Qt.PreciseTimer)
+			binding.timer.timeout.connect(lambda binding=binding: self.repeat(binding))
+		self.bindings[QKeySequence(hotkey)[0]] = binding
+		return binding
+
+	def eventFilter(self, watched, event):
+		if event.type() in (QtCore.QEvent.KeyPress, QtCore.QEvent.KeyRelease):
+			binding = self.bindings.get(keyCode(event))
+			if binding is None or QtWidgets.QApplication.activeWindow() is not self.window:
+				return False
+			if not event.isAutoRepeat():
+				if event.type() == QtCore.QEvent.KeyPress:
+					self.press(binding)
+				else:
+					self.release(binding)
+			return True
+		elif event.type() == QtCore.QEvent.WindowDeactivate and watched is self.window:
+			# the key release goes to another window
+			self.releaseAll()
+		return False
+
+	def press(self, binding):
+		if binding in self.held or not binding.button.isEnabled():
+			return
+		self.held.add(binding)
+		# a pressed down button repeats its mouse handler by itself, which the key repeat replaces
+		binding.buttonAutoRepeat = binding.button.autoRepeat()
+		binding.button.setAutoRepeat(False)
+		binding.button.setDown(True)
+		binding.onPress()
+		if binding.timer is not None:
+			binding.timer.start(self.repeatDelay)
+
+	def repeat(self, binding):
+		if not binding.button.isEnabled():
+			self.release(binding)
+			return
+		binding.timer.setInterval(self.repeatInterval)
+		binding.onPress()
+
+	def release(self, binding):
+		if binding not in self.held:
+			return
+		self.held.discard(binding)
+		if binding.timer is not None:
+			binding.timer.stop()
+		binding.button.setDown(False)
+		binding.button.setAutoRepeat(binding.buttonAutoRepeat)
+		if binding.onRelease is not None:
+			binding.onRelease()
+
+	def releaseAll(self):
+		for binding in list(self.held):
+			self.release(binding)
@@ -0,0 +1,105 @@
+import math, threading, time
+import numpy as np
+
+# Stages of a rating input in the order they happen. An input starts at the first stage that sees it,
+# the hotkey for keyboard input or the button handler for mouse input.
+STAGES = ["key", "handler", "rating", "recorded"]
+PERCENTILES = [50, 95, 99]
+
+class LatencyHistogram(object):
+	# Counts latencies in logarithmic buckets from 10 us to 10 s that are about 5 % wide,
+	# so the memory does not grow with the length of the session.
+	EDGES = np.geomspace(1e-5, 10.0, 281)
+
+	def __init__(self):
+		self.counts = np.zeros(len(self.EDGES) + 1, dtype=np.int64)
+		self.count = 0
+		self.maximum = 0.0
+
+	def add(self, seconds):
+		self.counts[np.searchsorted(self.EDGES, seconds, side="right")] += 1
+		self.count += 1
+		self.maximum = max(self.maximum, seconds)
+
+	def percentile(self, percent):
+		# upper edge of the bucket holding the percentile, in seconds
+		if self.count == 0:
+			return None
+		rank = max(1, math.ceil(percent / 100 * self.count))
+		index = int(np.searchsorted(np.cumsum(self.counts), rank))
+		if index >= len(self.EDGES):
+			return self.maximum
+		return min(float(self.EDGES[index]), self.maximum)
+
+class LatencyTracker(object):
+	# Stamps every stage of a rating input with time.monotonic(), from the hotkey or button press to the
+	# sample that holds the new rating, and keeps a histogram per stage of the time since the input started.
+	# The histograms belong to one session, reset() starts a new one.
+
+	def __init__(self):
+		self.lock = threading.Lock()
+		self.pending = None
+		self.expectedValue = None
+		self.last = None
+		self.reset()
+
+	def reset(self):
+		with self.lock:
+			self.histograms = {stage: LatencyHistogram() for stage in STAGES[1:]}
+			self.pending = None
+			self.last = None
+
+	def begin(self, stage):
+		# a new input replaces one that never got recorded
+		with self.lock:
+			self.pending = {stage: time.monotonic()}
+			self.expectedValue = None
+
+	def mark(self, stage):
+		with self.lock:
+			if self.pending is None:
+				self.pending = {}
+			self.pending[stage] = time.monotonic()
+
+	def expect(self, value):
+		# the rating the input changes to, only a sample with this value ends the input
+		with self.lock:
+			if self.pending is not None:
+				self.pending["rating"] = time.monotonic()
+				self.expectedValue = value
+
+	def recorded(self, value=None, monotonicTime=None):
+		# Called for every recorded sample (with its value) and marker (without). Can be called from the sampler thread.
+		if self.pending is None:
+			return
+		with self.lock:
+			if self.pending is None or (value is not None and ("rating" not in self.pending or value != self.expectedValue)):
+				return
+			pending, self.pending = self.pending, None
+			pending["recorded"] = monotonicTime if monotonicTime is not None else time.monotonic()
+			start = min(pending.values())
+			for stage, histogram in self.histograms.items():
+				if stage in pending:
+					histogram.add(pending[stage] - start)
+			self.last = pending["recorded"] - start
+
+	def end(self):
+		# the input was handled without recording anything, e.g. a rating that was already at the limit or play/pause
+		with self.lock:
+			self.pending = None
+
+	def count(self):
+		return self.histograms["recorded"].count
+
+	def percentile(self, percent, stage="recorded"):
+		return self.histograms[stage].percentile(percent)
+
+	def metadata(self):
+		# flat dictionary for the exported files, latencies in ms
+		metadata = {"latency_inputs": self.count()}
+		for stage, histogram in self.histograms.items():
+			for percent in PERCENTILES:
+				seconds = histogram.percentile(percent)
+				metadata[f"latency_{stage}_p{percent}_ms"] = round(seconds * 1000, 3) if seconds is not None else None
+			metadata[f"latency_{stage}_max_ms"] = round(histogram.maximum * 1000, 3)
+		return metadata
@@ -0,0 +1,138 @@
+import os, json, hashlib, time
+from collections import namedtuple
+from PyQt5 import QtCore
+import vlc
+from vlc import EventType
+
+# entries kept in the cache, the least recently used ones are dropped
+MAX_ENTRIES = 200
+# bytes hashed at the start and at the end of the file for the fingerprint
+FINGERPRINT_BYTES = 64 * 1024
+DEFAULT_PARSE_TIMEOUT = 5000 # ms
+
+# Static metadata of a video. duration is in ms, tracks a list of dictionaries and fingerprint identifies the content of the file.
+MediaInfo = namedtuple("MediaInfo", ["duration", "tracks", "fingerprint"])
+
+def fingerprint(path):
+	# hash of the size and the first and last bytes, fast even for large files and changes when the video is re-encoded or cut
+	size = os.path.getsize(path)
+	digest = hashlib.blake2b(str(size).encode("ascii"), digest_size=16)
+	with open(path, "rb") as file:
+		digest.update(file.read(FINGERPRINT_BYTES))
+		if size > FINGERPRINT_BYTES:
+			file.seek(max(FINGERPRINT_BYTES, size - FINGERPRINT_BYTES))
+			digest.update(file.read(FINGERPRINT_BYTES))
+	return digest.hexdigest()
+
+def fourcc(codec):
+	return codec.to_bytes(4, "little").decode("ascii", "replace").strip("\x00 ")
+
+def trackInfo(track):
+	info = {"type": str(track.type), "codec": fourcc(track.codec)}
+	if track.language:
+		info["language"] = track.language.decode("utf-8", "replace")
+	if track.type == vlc.TrackType.video and track.video:
+		video = track.video.contents
+		info.update(width=video.width, height=video.height)
+		if video.frame_rate_den > 0:
+			info["frameRate"] = video.frame_rate_num / video.frame_rate_den
+	elif track.type == vlc.TrackType.audio and track.audio:
+		audio = track.audio.contents
+		info.update(channels=audio.channels, rate=audio.rate)
+	return info
+
+def readMediaInfo(path, media):
+	# only called once a media is parsed
+	try:
+		tracks = [trackInfo(track) for track in media.tracks_get() or []]
+	except (ValueError, AttributeError):
+		tracks = []
+	return MediaInfo(max(0, media.get_duration()), tracks, fingerprint(path))
+
+class MediaCache(object):
+	# Small JSON file with the MediaInfo of the videos that were opened before, keyed by path, size and mtime,
+	# so a changed file is parsed again. It is read once and written after every new entry.
+
+	def __init__(self, path):
+		self.path = path
+		self.entries = None
+
+	def load(self):
+		if self.entries is None:
+			try:
+				with open(self.path, "r", encoding="utf-8") as file:
+					self.entries = json.load(file)
+			except (OSError, ValueError):
+				self.entries = {}
+		return self.entries
+
+	def key(self, path):
+		stat = os.stat(path)
+		return f"{os.path.abspath(path)}|{stat.st_size}|{stat.st_mtime_ns}"
+
+	def get(self, path):
+		try:
+			entry = self.load().get(self.key(path))
+		except OSError:
+			return None
+		if entry is None:
+			return None
+		entry["used"] = time.time()
+		return MediaInfo(entry["duration"], entry["tracks"], entry["fingerprint"])
+
+	def put(self, path, info):
+		entries = self.load()
+		entries[self.key(path)] = dict(info._asdict(), used=time.time())
+		if len(entries) > MAX_ENTRIES:
+			for key in sorted(entries, key=lambda key: entries[key].get("used", 0))[:len(entries) - MAX_ENTRIES]:
+				del entries[key]
+		try:
+			os.makedirs(os.path.dirname(self.path), exist_ok=True)
+			partial = self.path + ".partial"
+			with open(partial, "w", encoding="utf-8") as file:
+				json.dump(entries, file)
+			os.replace(partial, self.path)
+		except OSError as e:
+			print(f"The media cache could not be written: {e}")
+
+class MediaLoader(QtCore.QObject):
+	# Gets the MediaInfo of a media without blocking: from the cache if the file is known, otherwise
+	# libvlc parses it on its own thread and reports back with MediaParsedChanged.
+	loaded = QtCore.pyqtSignal(object, object) # media, MediaInfo
+
+	vlcParsed = QtCore.pyqtSignal(object, object)
+
+	def __init__(self, cache, timeout=DEFAULT_PARSE_TIMEOUT, parent=None):
+		super(MediaLoader, self).__init__(parent)
+		self.cache = cache
+		self.timeout = timeout
+		self.media = None
+		self.path = None
+		self.vlcParsed.connect(self.handleParsed, QtCore.Qt.QueuedConnection)
+
+	def isLoading(self):
+		return self.media is not None
+
+	def load(self, path, media):
+		# returns True if the metadata came from the cache and loaded was already emitted
+		info = self.cache.get(path)
+		if info is not None:
+			self.media = None
+			self.loaded.emit(media, info)
+			return True
+		self.media = media
+		self.path = path
+		media.event_manager().event_attach(EventType.MediaParsedChanged, lambda event: self.vlcParsed.emit(media, event.u.new_status))
+		if media.parse_with_options(vlc.MediaParseFlag.local, self.timeout) != 0:
+			self.handleParsed(media, None)
+		return False
+
+	def handleParsed(self, media, status):
+		# a media that was replaced by another one before it was parsed is ignored
+		if media is not self.media:
+			return
+		self.media = None
+		info = readMediaInfo(self.path, media)
+		if info.duration > 0:
+			self.cache.put(self.path, info)
+		self.loaded.emit(media, info)
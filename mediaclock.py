@@ -0,0 +1,109 @@
+import threading, time
+
+# differences between the interpolated and the reported time up to this many ms are slewed in, larger ones are jumps
+DEFAULT_RESYNC_THRESHOLD = 250
+# part of the difference corrected at every report
+DEFAULT_SLEW = 0.25
+# reports from before a seek that arrive within this many seconds after it are ignored
+SEEK_SETTLE_TIME = 1.0
+
+class MediaClock(object):
+	# Media time in ms at any time.monotonic() moment. libvlc reports the time only a few times per second,
+	# so between the reports the time is interpolated with the monotonic clock and the playback rate.
+	# Every report corrects the interpolation: small differences are slewed in over a few reports so the
+	# clock does not jump back while playing, differences above resyncThreshold (seeks, stalls) are taken
+	# over at once. All methods are thread safe, update() and setPlaying() are called on the libvlc thread.
+
+	def __init__(self, resyncThreshold=DEFAULT_RESYNC_THRESHOLD, slew=DEFAULT_SLEW):
+		self.resyncThreshold = resyncThreshold
+		self.slew = slew
+		self.lock = threading.Lock()
+		self.rate = 1.0
+		self.playing = False
+		self.reset()
+
+	def reset(self, mediaTime=0):
+		with self.lock:
+			self.base = float(mediaTime)
+			self.baseMonotonic = time.monotonic()
+			self.lastReturned = float(mediaTime)
+			self.lastMonotonic = self.baseMonotonic
+			self.seekTarget = None
+			self.seekTime = None
+			self.seekFrom = None
+			self.corrections = 0
+			self.resyncs = 0
+			self.lastError = 0.0
+
+	def interpolate(self, monotonicTime):
+		if not self.playing:
+			return self.base
+		return self.base + (monotonicTime - self.baseMonotonic) * 1000.0 * self.rate
+
+	def rebase(self, mediaTime, monotonicTime):
+		self.base = float(mediaTime)
+		self.baseMonotonic = monotonicTime
+
+	def now(self, monotonicTime=None):
+		if monotonicTime is None:
+			monotonicTime = time.monotonic()
+		with self.lock:
+			mediaTime = self.interpolate(monotonicTime)
+			if monotonicTime >= self.lastMonotonic:
+				# stamps taken one after another while playing never go back in time
+				if self.playing and mediaTime < self.lastReturned:
+					mediaTime = self.lastReturned
+				self.lastReturned = mediaTime
+				self.lastMonotonic = monotonicTime
+			return int(mediaTime)
+
+	def update(self, mediaTime, monotonicTime=None):
+		# a time reported by libvlc (MediaPlayerTimeChanged)
+		if monotonicTime is None:
+			monotonicTime = time.monotonic()
+		with self.lock:
+			predicted = self.interpolate(monotonicTime)
+			error = mediaTime - predicted
+			if self.seekTarget is not None:
+				# still the time from before the seek, a landing on the keyframe before the target is not
+				fromTarget = abs(mediaTime - self.seekTarget)
+				oldTime = self.seekFrom + ((monotonicTime - self.seekTime) * 1000.0 * self.rate if self.playing else 0)
+				fromOld = abs(mediaTime - oldTime)
+				if fromTarget > self.resyncThreshold and fromOld < fromTarget and monotonicTime - self.seekTime < SEEK_SETTLE_TIME:
+					return
+				self.seekTarget = None
+			self.lastError = error
+			if not self.playing or abs(error) > self.resyncThreshold:
+				self.rebase(mediaTime, monotonicTime)
+				self.lastReturned = float(mediaTime)
+				self.resyncs += 1
+			else:
+				self.rebase(predicted + self.slew * error, monotonicTime)
+				self.corrections += 1
+
+	def setPlaying(self, playing, monotonicTime=None):
+		# the clock runs only while the player is playing, buffering and pauses stop it
+		if monotonicTime is None:
+			monotonicTime = time.monotonic()
+		with self.lock:
+			if playing != self.playing:
+				self.rebase(self.interpolate(monotonicTime), monotonicTime)
+				self.playing = playing
+
+	def setRate(self, rate, monotonicTime=None):
+		if monotonicTime is None:
+			monotonicTime = time.monotonic()
+		with self.lock:
+			self.rebase(self.interpolate(monotonicTime), monotonicTime)
+			self.rate = float(rate)
+
+	def seek(self, mediaTime, monotonicTime=None):
+		# the time the player was asked to go to, taken over until libvlc reports it
+		if monotonicTime is None:
+			monotonicTime = time.monotonic()
+		with self.lock:
+			self.seekFrom = self.interpolate(monotonicTime)
+			self.rebase(mediaTime, monotonicTime)
+			self.lastReturned = float(mediaTime)
+			self.seekTarget = float(mediaTime)
+			self.seekTime = monotonicTime
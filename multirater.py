@@ -0,0 +1,288 @@
+import asyncio, json, re, threading, time
+from collections import deque
+from mediaclock import MediaClock
+from samplestore import SampleStore
+
+# Multi-rater sessions: one app plays the video as the coordinator and broadcasts its media clock, rater clients
+# follow that clock and send their ratings back stamped with it. The messages are JSON objects, one per line:
+#   rater -> coordinator: {"type": "hello", "name": ...}, {"type": "rating", "time": media ms, "value": ..., "sent": monotonic}, {"type": "ping", "sent": ...}
+#   coordinator -> rater: {"type": "welcome", "name": ...}, {"type": "clock", "time": media ms, "playing": ...}, {"type": "pong", "sent": ...}
+# An address is "host:port" for TCP or "unix:/path" for a Unix socket.
+
+DEFAULT_ADDRESS = "127.0.0.1:47800"
+DEFAULT_CLOCK_RATE = 20 # clock broadcasts per second
+PING_INTERVAL = 1.0 # seconds
+# the lowest round trips of this many pings are used for the delay of the clock messages
+RTT_WINDOW = 16
+
+class MultiRaterError(Exception):
+	pass
+
+def parseAddress(address):
+	# ("unix", path) or ("tcp", (host, port))
+	if address.startswith("unix:"):
+		return "unix", address[len("unix:"):]
+	host, separator, port = address.rpartition(":")
+	if separator == "" or not port.isdigit():
+		raise MultiRaterError(f"Invalid address {address}, expected host:port or unix:/path")
+	return "tcp", (host or "127.0.0.1", int(port))
+
+def encode(message):
+	return (json.dumps(message, separators=(",", ":")) + "\n").encode("utf-8")
+
+class LoopThread(object):
+	# an asyncio event loop on its own daemon thread, the app itself stays on the Qt event loop
+
+	def __init__(self, name):
+		self.loop = asyncio.new_event_loop()
+		self.thread = threading.Thread(target=self.loop.run_forever, name=name, daemon=True)
+		self.thread.start()
+
+	def run(self, coroutine, timeout=None):
+		# runs the coroutine on the loop and waits for its result
+		return asyncio.run_coroutine_threadsafe(coroutine, self.loop).result(timeout)
+
+	def call(self, func, *args):
+		self.loop.call_soon_threadsafe(func, *args)
+
+	def stop(self):
+		self.run(self.cancelTasks(), 10)
+		self.loop.call_soon_threadsafe(self.loop.stop)
+		self.thread.join()
+		self.loop.close()
+
+	async def cancelTasks(self):
+		tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+		for task in tasks:
+			task.cancel()
+		await asyncio.gather(*tasks, return_exceptions=True)
+
+class Coordinator(object):
+	# Accepts rater connections, broadcasts the media clock of this app to them and keeps a SampleStore per rater.
+	# mediaTime and isPlaying are called on the thread of the server, like with RatingSampler.
+	# changed is called on that thread too whenever a rater connects or disconnects.
+	# With measureSkew the stamp of every rating is compared to this app's media time at the moment the rating
+	# was sent, which is only meaningful when the raters run on the same machine (the same monotonic clock).
+
+	def __init__(self, address, mediaTime, isPlaying, clockRate=DEFAULT_CLOCK_RATE, measureSkew=False, changed=None):
+		self.address = address
+		self.mediaTime = mediaTime
+		self.isPlaying = isPlaying
+		self.interval = 1.0 / clockRate
+		self.measureSkew = measureSkew
+		self.changed = changed
+		self.lock = threading.Lock()
+		self.stores = {} # name -> SampleStore, kept after a rater disconnects
+		self.writers = {} # name -> StreamWriter of the connected raters
+		self.received = 0
+		self.skews = deque(maxlen=100000)
+		self.runner = None
+		self.server = None
+
+	def start(self):
+		self.runner = LoopThread("Coordinator")
+		try:
+			self.runner.run(self.listen(), 10)
+		except OSError as e:
+			self.runner.stop()
+			self.runner = None
+			raise MultiRaterError(f"Could not listen on {self.address}: {e}")
+		self.broadcaster = asyncio.run_coroutine_threadsafe(self.broadcast(), self.runner.loop)
+
+	async def listen(self):
+		kind, target = parseAddress(self.address)
+		if kind == "unix":
+			self.server = await asyncio.start_unix_server(self.handle, target)
+		else:
+			self.server = await asyncio.start_server(self.handle, *target)
+
+	def stop(self):
+		if self.runner is None:
+			return
+		self.runner.run(self.close(), 10)
+		self.runner.stop()
+		self.runner = None
+
+	async def close(self):
+		self.broadcaster.cancel()
+		self.server.close()
+		for writer in list(self.writers.values()):
+			writer.close()
+		await self.server.wait_closed()
+
+	def raters(self):
+		# (name, SampleStore) of every rater that sent something in this session
+		with self.lock:
+			return sorted(self.stores.items())
+
+	def connected(self):
+		with self.lock:
+			return len(self.writers)
+
+	def clear(self):
+		# a new session, the raters stay connected
+		with self.lock:
+			for store in self.stores.values():
+				store.clear()
+			self.received = 0
+			self.skews.clear()
+
+	def uniqueName(self, name):
+		# letters, digits, - and _ only, as it becomes a column name
+		name = re.sub(r"[^A-Za-z0-9_-]", "_", str(name or "rater"))[:40] or "rater"
+		unique, number = name, 2
+		while unique in self.writers:
+			unique, number = f"{name}_{number}", number + 1
+		return unique
+
+	async def handle(self, reader, writer):
+		name = None
+		try:
+			hello = json.loads(await reader.readline())
+			if hello.get("type") != "hello":
+				return
+			with self.lock:
+				name = self.uniqueName(hello.get("name"))
+				self.writers[name] = writer
+				store = self.stores.setdefault(name, SampleStore())
+			writer.write(encode({"type": "welcome", "name": name}))
+			writer.write(self.clockMessage())
+			if self.changed is not None:
+				self.changed()
+			while True:
+				line = await reader.readline()
+				if not line:
+					break
+				message = json.loads(line)
+				kind = message.get("type")
+				if kind == "rating":
+					store.append(message["time"], message["value"], time.monotonic())
+					self.received += 1
+					if self.measureSkew and "sent" in message:
+						self.skews.append(message["time"] - self.mediaTime(message["sent"]))
+				elif kind == "ping":
+					writer.write(encode({"type": "pong", "sent": message.get("sent")}))
+		except (ValueError, KeyError) as e:
+			print(f"Rater {name}: {e}")
+		except ConnectionError:
+			# a rater that quit without closing the connection
+			pass
+		finally:
+			with self.lock:
+				if name is not None and self.writers.get(name) is writer:
+					del self.writers[name]
+			writer.close()
+			if name is not None and self.changed is not None:
+				self.changed()
+
+	def clockMessage(self):
+		return encode({"type": "clock", "time": self.mediaTime(time.monotonic()), "playing": bool(self.isPlaying())})
+
+	async def broadcast(self):
+		# absolute deadlines like the sampler, so the broadcast rate does not drift
+		deadline = time.monotonic()
+		while True:
+			deadline = max(deadline + self.interval, time.monotonic())
+			await asyncio.sleep(deadline - time.monotonic())
+			with self.lock:
+				writers = list(self.writers.values())
+			if len(writers) == 0:
+				continue
+			message = self.clockMessage()
+			for writer in writers:
+				writer.write(message)
+
+	def stats(self):
+		# (ratings received, median and maximum absolute clock skew in ms or None)
+		skews = sorted(abs(skew) for skew in list(self.skews))
+		if len(skews) == 0:
+			return self.received, None, None
+		return self.received, skews[len(skews) // 2], skews[-1]
+
+class RaterClient(object):
+	# Connects to a Coordinator and follows its media clock: every clock message is taken as the media time at the
+	# moment it was sent, half the smallest recent round trip before it arrived. setRating() and mediaTime() are thread safe.
+
+	def __init__(self, address, name):
+		self.address = address
+		self.name = name
+		self.clock = MediaClock()
+		self.rtts = deque(maxlen=RTT_WINDOW)
+		self.writer = None
+		self.runner = None
+		self.sent = 0
+		self.closed = threading.Event()
+
+	def connect(self, timeout=10):
+		self.runner = LoopThread("RaterClient")
+		try:
+			self.runner.run(self.open(), timeout)
+		except (OSError, asyncio.TimeoutError, ValueError) as e:
+			self.runner.stop()
+			self.runner = None
+			raise MultiRaterError(f"Could not connect to {self.address}: {e}")
+
+	async def open(self):
+		kind, target = parseAddress(self.address)
+		if kind == "unix":
+			reader, self.writer = await asyncio.open_unix_connection(target)
+		else:
+			reader, self.writer = await asyncio.open_connection(*target)
+		self.writer.write(encode({"type": "hello", "name": self.name}))
+		welcome = json.loads(await reader.readline())
+		self.name = welcome.get("name", self.name)
+		self.reading = asyncio.ensure_future(self.read(reader))
+		self.pinging = asyncio.ensure_future(self.ping())
+
+	async def read(self, reader):
+		try:
+			while True:
+				line = await reader.readline()
+				if not line:
+					break
+				received = time.monotonic()
+				message = json.loads(line)
+				kind = message.get("type")
+				if kind == "clock":
+					sentAt = received - self.delay()
+					self.clock.setPlaying(message["playing"], sentAt)
+					self.clock.update(message["time"], sentAt)
+				elif kind == "pong" and message.get("sent") is not None:
+					self.rtts.append(received - message["sent"])
+		except (ValueError, KeyError, ConnectionError) as e:
+			print(f"Connection to the coordinator: {e}")
+		finally:
+			self.closed.set()
+
+	async def ping(self):
+		while True:
+			self.writer.write(encode({"type": "ping", "sent": time.monotonic()}))
+			await asyncio.sleep(PING_INTERVAL)
+
+	def delay(self):
+		# one way delay, half of the smallest recent round trip
+		return min(self.rtts) / 2 if len(self.rtts) > 0 else 0.0
+
+	def isConnected(self):
+		return self.runner is not None and not self.closed.is_set()
+
+	def mediaTime(self, monotonicTime=None):
+		return self.clock.now(monotonicTime)
+
+	def isPlaying(self):
+		return self.clock.playing
+
+	def setRating(self, value, monotonicTime=None):
+		# stamped with the coordinator's media time at the moment of the change
+		if monotonicTime is None:
+			monotonicTime = time.monotonic()
+		message = encode({"type": "rating", "time": self.mediaTime(monotonicTime), "value": value, "sent": monotonicTime})
+		self.sent += 1
+		self.runner.call(self.writer.write, message)
+
+	def close(self):
+		if self.runner is None:
+			return
+		self.runner.call(self.writer.close)
+		self.runner.stop()
+		self.runner = None
@@ -0,0 +1,289 @@
+import sys, time
+from PyQt5 import QtCore
+import vlc
+from vlc import EventType
+from mediaclock import MediaClock
+from seeking import SeekScheduler
+
+# libvlc states in which the rating controls are active
+ACTIVE_STATES = {vlc.State.Opening, vlc.State.Buffering, vlc.State.Playing}
+
+# libvlc player events that change the playback state
+STATE_EVENTS = {
+	EventType.MediaPlayerOpening: vlc.State.Opening,
+	EventType.MediaPlayerBuffering: vlc.State.Buffering,
+	EventType.MediaPlayerPlaying: vlc.State.Playing,
+	EventType.MediaPlayerPaused: vlc.State.Paused,
+	EventType.MediaPlayerStopped: vlc.State.Stopped,
+	EventType.MediaPlayerEndReached: vlc.State.Ended,
+	EventType.MediaPlayerEncounteredError: vlc.State.Error,
+}
+
+def setVideoOutput(mediaplayer, frame):
+	# libvlc draws into the native window of the frame
+	if sys.platform.startswith('linux'):  # for Linux using the X Server
+		mediaplayer.set_xwindow(int(frame.winId()))
+	elif sys.platform == "win32":  # for Windows
+		mediaplayer.set_hwnd(frame.winId())
+	elif sys.platform == "darwin":  # for MacOS
+		mediaplayer.set_nsobject(int(frame.winId()))
+
+class PlaybackStats(QtCore.QObject):
+	# Counts the libvlc calls, libvlc events and repaints made per second of playback.
+	# Enabled with --stats on the command line or "printPlaybackStats": true in default.json
+
+	def __init__(self, enabled=False, parent=None):
+		super(PlaybackStats, self).__init__(parent)
+		self.enabled = enabled
+		self.vlcCalls = 0
+		self.vlcEvents = 0
+		self.repaints = 0
+		# sums over the seconds of playback, for the summary at the end
+		self.playingSeconds = 0
+		self.totalCalls = 0
+		self.totalEvents = 0
+		self.totalRepaints = 0
+		self.isPlaying = lambda: False
+		self.timer = QtCore.QTimer(self)
+		self.timer.setInterval(1000)
+		self.timer.timeout.connect(self.report)
+		if self.enabled:
+			QtCore.QCoreApplication.instance().installEventFilter(self)
+			self.timer.start()
+
+	def wrap(self, target):
+		# only pay for the proxy when the counters are shown
+		if not self.enabled:
+			return target
+		return CountingProxy(target, self)
+
+	def eventFilter(self, obj, event):
+		if event.type() == QtCore.QEvent.Paint:
+			self.repaints += 1
+		return False
+
+	def report(self):
+		if self.isPlaying():
+			print(f"libvlc calls/s: {self.vlcCalls}, libvlc events/s: {self.vlcEvents}, repaints/s: {self.repaints}")
+			self.playingSeconds += 1
+			self.totalCalls += self.vlcCalls
+			self.totalEvents += self.vlcEvents
+			self.totalRepaints += self.repaints
+		self.vlcCalls = 0
+		self.vlcEvents = 0
+		self.repaints = 0
+
+	def printSummary(self):
+		# the averages of the whole run, to compare two builds playing the same clip for the same time
+		if self.enabled and self.playingSeconds > 0:
+			print(f"{self.playingSeconds} s of playback: {self.totalCalls / self.playingSeconds:.1f} libvlc calls/s, "
+				+ f"{self.totalEvents / self.playingSeconds:.1f} libvlc events/s, {self.totalRepaints / self.playingSeconds:.1f} repaints/s")
+
+class CountingProxy(object):
+	# forwards every attribute to the wrapped libvlc object and counts the calls made through it
+
+	def __init__(self, target, stats):
+		self._target = target
+		self._stats = stats
+
+	def __getattr__(self, name):
+		attr = getattr(self._target, name)
+		if not callable(attr):
+			return attr
+		stats = self._stats
+		def countedCall(*args, **kwargs):
+			stats.vlcCalls += 1
+			return attr(*args, **kwargs)
+		return countedCall
+
+class EndOfMedia(QtCore.QObject):
+	# After the end of the media libvlc only keeps working after stop(). To keep the last frame visible,
+	# the media is played again, paused as soon as libvlc reports Playing and moved to the end once it
+	# reports Paused. Every step waits for the libvlc event instead of polling, and gives up after the timeout.
+	finished = QtCore.pyqtSignal(bool) # True if the last frame is shown, False after a timeout
+
+	IDLE = 0
+	WAITING_FOR_PLAYING = 1
+	WAITING_FOR_PAUSED = 2
+
+	def __init__(self, engine, endPosition=0.999, timeout=3000):
+		super(EndOfMedia, self).__init__(engine)
+		self.engine = engine
+		self.endPosition = endPosition
+		self.step = self.IDLE
+		self.timer = QtCore.QTimer(self)
+		self.timer.setSingleShot(True)
+		self.timer.setInterval(timeout)
+		self.timer.timeout.connect(self.timedOut)
+		engine.stateChanged.connect(self.stateChanged)
+
+	def isActive(self):
+		return self.step != self.IDLE
+
+	def start(self):
+		self.engine.mediaplayer.stop()
+		self.step = self.WAITING_FOR_PLAYING
+		self.timer.start()
+		self.engine.mediaplayer.play()
+
+	def stateChanged(self, state):
+		if self.step == self.WAITING_FOR_PLAYING and state == vlc.State.Playing:
+			self.step = self.WAITING_FOR_PAUSED
+			self.timer.start()
+			self.engine.mediaplayer.pause()
+		elif self.step != self.IDLE and state == vlc.State.Paused:
+			# a media opened with :start-paused goes to Paused without Playing
+			self.finish()
+			self.engine.setPosition(self.endPosition)
+			self.finished.emit(True)
+		elif self.step != self.IDLE and state == vlc.State.Error:
+			self.timedOut()
+
+	def timedOut(self):
+		print("libvlc did not reopen the media after the end, it stays stopped")
+		self.finish()
+		self.finished.emit(False)
+
+	def finish(self):
+		self.step = self.IDLE
+		self.timer.stop()
+
+class PlaybackEngine(QtCore.QObject):
+	# Keeps a cached copy of the player state that is updated from libvlc events instead of polling.
+	# libvlc calls the callbacks on its own thread, so they are forwarded through a queued signal
+	# and all public signals are emitted on the GUI thread, only when the value actually changed.
+	stateChanged = QtCore.pyqtSignal(object)
+	timeChanged = QtCore.pyqtSignal(int)
+	positionChanged = QtCore.pyqtSignal(float)
+	durationChanged = QtCore.pyqtSignal(int)
+	endReached = QtCore.pyqtSignal()
+
+	vlcEvent = QtCore.pyqtSignal(object, object, float) # type, value, time.monotonic() of the event
+
+	def __init__(self, mediaplayer, stats=None, parent=None):
+		super(PlaybackEngine, self).__init__(parent)
+		self.mediaplayer = mediaplayer
+		self.stats = stats
+		self.state = vlc.State.NothingSpecial
+		self.time = 0
+		self.position = 0.0
+		self.duration = 0
+		# last state reported by libvlc, written on the libvlc thread so worker threads can read it while the GUI is busy
+		self.vlcState = vlc.State.NothingSpecial
+		# time.monotonic() at which libvlc reported vlcState
+		self.stateTime = None
+		# media time for timestamps, fed from the libvlc thread so it does not wait for the GUI either
+		self.clock = MediaClock()
+		self.seeker = SeekScheduler(self.mediaplayer, parent=self)
+		self.endOfMedia = EndOfMedia(self)
+
+		self.vlcEvent.connect(self.handleVlcEvent, QtCore.Qt.QueuedConnection)
+		events = self.mediaplayer.event_manager()
+		for eventType in list(STATE_EVENTS) + [EventType.MediaPlayerTimeChanged, EventType.MediaPlayerPositionChanged, EventType.MediaPlayerLengthChanged]:
+			events.event_attach(eventType, self.vlcCallback)
+
+	def vlcCallback(self, event):
+		# runs on the libvlc thread: copy the payload and never call back into libvlc here
+		eventTime = time.monotonic()
+		if event.type == EventType.MediaPlayerTimeChanged:
+			value = event.u.new_time
+			self.clock.update(value, eventTime)
+		elif event.type == EventType.MediaPlayerPositionChanged:
+			value = event.u.new_position
+		elif event.type == EventType.MediaPlayerLengthChanged:
+			value = event.u.new_length
+		else:
+			value = None
+			if event.type in STATE_EVENTS:
+				self.stateTime = eventTime
+				self.vlcState = STATE_EVENTS[event.type]
+				self.clock.setPlaying(self.vlcState == vlc.State.Playing, self.stateTime)
+		self.vlcEvent.emit(event.type, value, eventTime)
+
+	def handleVlcEvent(self, eventType, value, eventTime):
+		if self.stats is not None:
+			self.stats.vlcEvents += 1
+		if eventType == EventType.MediaPlayerTimeChanged:
+			# times from before a running seek would move the controls back for a moment
+			if self.seeker.timeReported(value, eventTime):
+				self.setCachedTime(value)
+		elif eventType == EventType.MediaPlayerPositionChanged:
+			if not self.seeker.isBusy() and not self.seeker.isStale(eventTime):
+				self.setCachedPosition(value)
+		elif eventType == EventType.MediaPlayerLengthChanged:
+			self.setDuration(value)
+		elif eventType in STATE_EVENTS:
+			self.setCachedState(STATE_EVENTS[eventType])
+			if eventType == EventType.MediaPlayerEndReached:
+				self.endReached.emit()
+
+	def setCachedState(self, state):
+		if state != self.state:
+			self.state = state
+			self.stateChanged.emit(state)
+
+	def setCachedTime(self, ms):
+		ms = int(ms)
+		if ms != self.time:
+			self.time = ms
+			self.timeChanged.emit(ms)
+
+	def setCachedPosition(self, position):
+		position = float(position)
+		if position != self.position:
+			self.position = position
+			self.positionChanged.emit(position)
+
+	def setDuration(self, ms):
+		ms = int(ms)
+		if ms > 0 and ms != self.duration:
+			self.duration = ms
+			self.durationChanged.emit(ms)
+
+	def setMedia(self, media):
+		self.state = vlc.State.NothingSpecial
+		self.vlcState = vlc.State.NothingSpecial
+		self.time = 0
+		self.position = 0.0
+		self.duration = 0
+		self.clock.setPlaying(False)
+		self.clock.reset(0)
+		self.seeker.cancel()
+		self.endOfMedia.finish()
+		# the duration comes from the media cache or from parsing, see MediaLoader
+		self.timeChanged.emit(0)
+		self.stateChanged.emit(self.state)
+
+	def isPlaying(self):
+		return self.state == vlc.State.Playing and not self.endOfMedia.isActive()
+
+	def vlcIsPlaying(self):
+		# thread safe variant of isPlaying that does not wait for the GUI thread, the replay after the end does not count
+		return self.vlcState == vlc.State.Playing and not self.endOfMedia.isActive()
+
+	def isActive(self):
+		return self.state in ACTIVE_STATES and not self.endOfMedia.isActive()
+
+	def setTime(self, ms, fast=False):
+		# fast seeks go to the nearest keyframe, for coarse jumps
+		self.seeker.seek(ms, fast)
+		self.clock.seek(ms)
+		# libvlc does not report seeks while paused, so update the cache right away
+		self.setCachedTime(ms)
+		if self.duration > 0:
+			self.setCachedPosition(ms / self.duration)
+
+	def setPosition(self, position, fast=False):
+		if self.duration > 0:
+			self.setTime(position * self.duration, fast)
+		else:
+			self.mediaplayer.set_position(float(position))
+		self.setCachedPosition(position)
+
+	def setRate(self, rate):
+		self.mediaplayer.set_rate(float(rate))
+		self.clock.setRate(rate)
+
+	def mediaTime(self, monotonicTime=None):
+		# interpolated media time in ms, safe to call from any thread
+		return self.clock.now(monotonicTime)
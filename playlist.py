@@ -0,0 +1,107 @@
+import os, json, time
+
+# manifests read as one path per line, everything else is read as JSON
+TEXT_MANIFESTS = {".m3u", ".m3u8", ".txt"}
+
+class PlaylistError(Exception):
+	pass
+
+def resolvePaths(entries, directory):
+	# entries are paths or {"path": ...}, relative paths are relative to directory
+	if not isinstance(entries, list) or len(entries) == 0:
+		raise PlaylistError("A playlist needs a list with at least one video")
+	paths = []
+	for entry in entries:
+		if isinstance(entry, dict):
+			entry = entry.get("path")
+		if not isinstance(entry, str) or entry == "":
+			raise PlaylistError(f"Invalid playlist entry {entry!r}")
+		paths.append(os.path.normpath(os.path.join(directory, os.path.expanduser(entry))))
+	return paths
+
+def readManifest(path):
+	# a JSON list of videos (or an object with a "clips" list), or an m3u / text file with one video per line
+	try:
+		with open(path, "r", encoding="utf-8-sig") as file:
+			if os.path.splitext(path)[1].lower() in TEXT_MANIFESTS:
+				entries = [line.strip() for line in file if line.strip() and not line.strip().startswith("#")]
+			else:
+				entries = json.load(file)
+	except (OSError, ValueError) as e:
+		raise PlaylistError(f"The playlist {path} could not be read: {e}")
+	if isinstance(entries, dict):
+		entries = entries.get("clips")
+	return Playlist(resolvePaths(entries, os.path.dirname(os.path.abspath(path))), path)
+
+def playlistFromConfig(value, directory):
+	# "playlist" in default.json: a list of videos or the path of a manifest file
+	if isinstance(value, str):
+		return readManifest(os.path.join(directory, value))
+	return Playlist(resolvePaths(value, directory))
+
+class Playlist(object):
+	# The clips of one session and where each of them starts on the session time line. The ratings of all clips
+	# go into one export, the time of a sample is its time in the clip plus the durations of the clips before it.
+	# gaps are the seconds from the end of a clip to the next clip playing.
+
+	def __init__(self, paths, name=None):
+		self.paths = list(paths)
+		self.name = name if name is not None else self.paths[0]
+		self.index = 0
+		self.starts = [0]
+		self.infos = [None] * len(self.paths)
+		self.gaps = [None] * len(self.paths)
+		self.endedAt = None
+		# the clip ended before the next one was ready
+		self.waiting = False
+
+	def __len__(self):
+		return len(self.paths)
+
+	def current(self):
+		return self.paths[self.index]
+
+	def hasNext(self):
+		return self.index + 1 < len(self.paths)
+
+	def nextPath(self):
+		return self.paths[self.index + 1] if self.hasNext() else None
+
+	def offset(self):
+		# session time in ms at which the current clip starts
+		return self.starts[self.index]
+
+	def setInfo(self, index, info):
+		self.infos[index] = info
+
+	def clipEnded(self, monotonicTime):
+		self.endedAt = monotonicTime if monotonicTime is not None else time.monotonic()
+
+	def advance(self, duration):
+		self.starts.append(self.starts[self.index] + duration)
+		self.index += 1
+
+	def clipStarted(self, monotonicTime):
+		# returns the gap in seconds when the clip follows another one, None otherwise
+		if self.endedAt is None or monotonicTime is None:
+			return None
+		gap, self.endedAt = monotonicTime - self.endedAt, None
+		self.gaps[self.index] = gap
+		return gap
+
+	def metadata(self):
+		metadata = {"playlist": os.path.basename(self.name), "clips": len(self.paths)}
+		for index, path in enumerate(self.paths):
+			prefix = f"clip_{index + 1}_"
+			metadata[prefix + "video"] = os.path.basename(path)
+			if index < len(self.starts):
+				metadata[prefix + "start_ms"] = self.starts[index]
+			if self.infos[index] is not None:
+				metadata[prefix + "duration_ms"] = self.infos[index].duration
+				metadata[prefix + "fingerprint"] = self.infos[index].fingerprint
+			if self.gaps[index] is not None:
+				metadata[prefix + "gap_ms"] = round(self.gaps[index] * 1000, 1)
+		gaps = [gap for gap in self.gaps if gap is not None]
+		if len(gaps) > 0:
+			metadata["clip_gap_max_ms"] = round(max(gaps) * 1000, 1)
+		return metadata
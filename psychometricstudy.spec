@@ -9,7 +9,7 @@ a = Analysis(
     pathex=[],
     binaries=[('buttonSound.mp3', '.')],
     datas=[],
-    hiddenimports=[],
+    hiddenimports=['batch', 'rater', 'multirater'],
     hookspath=['hooks/'],
     hooksconfig={},
     runtime_hooks=[],
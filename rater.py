@@ -0,0 +1,104 @@
+#! /usr/bin/env python3
+# Rating-only client for multi-rater sessions, without video and without libvlc. It follows the media clock of the
+# app started as coordinator and sends the ratings to it, the coordinator writes them into its export.
+# Usage: python3 app.py --rater 127.0.0.1:47800 --name P1 (or python3 rater.py ...)
+import sys, argparse, datetime
+from PyQt5 import QtCore, QtWidgets
+from PyQt5.QtGui import QFont
+from multirater import RaterClient, MultiRaterError, DEFAULT_ADDRESS
+from keyinput import ButtonKeys
+
+class RaterWindow(QtWidgets.QWidget):
+
+	def __init__(self, client, lowerValue=-10, upperValue=10):
+		super(RaterWindow, self).__init__()
+		self.client = client
+		self.lowerValue = lowerValue
+		self.upperValue = upperValue
+		self.points = 0
+		self.wasPlaying = False
+		self.setWindowTitle("Psychometric Study - " + client.name)
+		self.setMinimumSize(400, 250)
+
+		self.statusLabel = QtWidgets.QLabel()
+		self.incButton = QtWidgets.QPushButton("+")
+		self.counterLabel = QtWidgets.QLabel("0")
+		self.decButton = QtWidgets.QPushButton("-")
+		for widget in [self.incButton, self.counterLabel, self.decButton]:
+			widget.setFont(QFont(QFont().defaultFamily(), 21))
+			widget.setFocusPolicy(QtCore.Qt.NoFocus)
+		self.counterLabel.setAlignment(QtCore.Qt.AlignCenter)
+		self.incButton.setAutoRepeat(True)
+		self.decButton.setAutoRepeat(True)
+		self.incButton.pressed.connect(self.increase)
+		self.decButton.pressed.connect(self.decrease)
+
+		hbox = QtWidgets.QHBoxLayout()
+		hbox.addWidget(self.decButton)
+		hbox.addWidget(self.counterLabel)
+		hbox.addWidget(self.incButton)
+		vbox = QtWidgets.QVBoxLayout(self)
+		vbox.addWidget(self.statusLabel)
+		vbox.addLayout(hbox)
+		vbox.addWidget(QtWidgets.QLabel("Hotkeys:&nbsp;<b>Up</b>/<b>Down</b> to increase/decrease points"))
+
+		self.buttonKeys = ButtonKeys(self)
+		self.buttonKeys.bind("Up", self.incButton, self.increase, autoRepeat=True)
+		self.buttonKeys.bind("Down", self.decButton, self.decrease, autoRepeat=True)
+
+		# the rating buttons work while the coordinator plays, like in the app
+		self.timer = QtCore.QTimer(self)
+		self.timer.setInterval(100)
+		self.timer.timeout.connect(self.updateStatus)
+		self.timer.start()
+		self.updateStatus()
+
+	def updateStatus(self):
+		playing = self.client.isConnected() and self.client.isPlaying()
+		if playing and not self.wasPlaying:
+			# the rating at the start of the playback, so the column of this rater starts with a value
+			self.client.setRating(self.points)
+		self.wasPlaying = playing
+		self.incButton.setEnabled(playing)
+		self.decButton.setEnabled(playing)
+		if not self.client.isConnected():
+			self.statusLabel.setText("Disconnected from the coordinator")
+		else:
+			seconds = int(self.client.mediaTime() / 1000)
+			self.statusLabel.setText(f"{self.client.name}: {'playing' if playing else 'paused'} {datetime.timedelta(seconds=seconds)}, "
+				+ f"delay {self.client.delay() * 1000:.1f} ms")
+
+	def increase(self):
+		if self.points < self.upperValue:
+			self.points += 1
+			self.client.setRating(self.points)
+			self.counterLabel.setText(str(self.points))
+
+	def decrease(self):
+		if self.points > self.lowerValue:
+			self.points -= 1
+			self.client.setRating(self.points)
+			self.counterLabel.setText(str(self.points))
+
+def main(argv):
+	parser = argparse.ArgumentParser(prog="app.py --rater", description="Rate along with a Psychometric Study coordinator.")
+	parser.add_argument("address", nargs="?", default=DEFAULT_ADDRESS, help="host:port or unix:/path of the coordinator (default: %(default)s)")
+	parser.add_argument("--name", default="rater", help="name of the rating column in the export")
+	parser.add_argument("--lower", type=int, default=-10)
+	parser.add_argument("--upper", type=int, default=10)
+	args = parser.parse_args(argv)
+
+	app = QtWidgets.QApplication.instance() or QtWidgets.QApplication(sys.argv[:1])
+	client = RaterClient(args.address, args.name)
+	try:
+		client.connect()
+	except MultiRaterError as e:
+		QtWidgets.QMessageBox.critical(None, "Error", str(e))
+		return 1
+	window = RaterWindow(client, args.lower, args.upper)
+	app.aboutToQuit.connect(client.close)
+	window.show()
+	return app.exec_()
+
+if __name__ == '__main__':
+	sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,177 @@
+import numpy as np
+from PyQt5 import QtCore, QtGui, QtWidgets
+
+DEFAULT_SPAN = 60000 # time shown across the width until the session is longer, in the time unit of the stores
+REFRESH_INTERVAL = 33 # ms between looks at the stores
+MARGIN = 4 # pixels above and below the rating range
+
+def reduceColumns(columns, values):
+	# (column, min, max, last value) of every column that appears in columns, keeping the order of the values within a column
+	if len(columns) > 1 and not np.all(columns[1:] >= columns[:-1]):
+		order = np.argsort(columns, kind="stable")
+		columns = columns[order]
+		values = values[order]
+	starts = np.flatnonzero(np.concatenate(([True], columns[1:] != columns[:-1])))
+	ends = np.append(starts[1:], len(columns))
+	return columns[starts], np.minimum.reduceat(values, starts), np.maximum.reduceat(values, starts), values[ends - 1]
+
+class RatingPlot(QtWidgets.QWidget):
+	# Live strip chart of the ratings and markers of the session, read from the SampleStore and MarkerStore while the
+	# sampler appends to them. Every pixel column keeps the min, max and last rating of the samples in it, so new samples
+	# only update their own columns and only those columns are repainted, however long the session is. The columns are
+	# rebuilt from the stores when the widget is resized or the session gets longer than the time span.
+
+	def __init__(self, samples, markers, parent=None):
+		super(RatingPlot, self).__init__(parent)
+		self.samples = samples
+		self.markers = markers
+		self.span = DEFAULT_SPAN
+		self.lowerValue = -10
+		self.upperValue = 10
+		self.playheadColumn = None
+		self.lineColor = QtGui.QColor("#3e3e3e")
+		self.gridColor = QtGui.QColor("#d0d0d0")
+		self.markerColor = QtGui.QColor("#F5BD0A")
+		self.playheadColor = QtGui.QColor("#FD3F46")
+		self.setAttribute(QtCore.Qt.WA_OpaquePaintEvent)
+		self.setMinimumHeight(60)
+		self.setSizePolicy(QtWidgets.QSizePolicy.Expanding, QtWidgets.QSizePolicy.Fixed)
+		self.timer = QtCore.QTimer(self)
+		self.timer.setInterval(REFRESH_INTERVAL)
+		self.timer.timeout.connect(self.refresh)
+		self.rebuild()
+
+	def sizeHint(self):
+		return QtCore.QSize(400, 100)
+
+	def showEvent(self, event):
+		self.timer.start()
+		super(RatingPlot, self).showEvent(event)
+
+	def hideEvent(self, event):
+		# nothing is read from the stores while the plot is hidden
+		self.timer.stop()
+		super(RatingPlot, self).hideEvent(event)
+
+	def resizeEvent(self, event):
+		self.rebuild()
+		super(RatingPlot, self).resizeEvent(event)
+
+	def setRange(self, lowerValue, upperValue):
+		if (lowerValue, upperValue) != (self.lowerValue, self.upperValue):
+			self.lowerValue = lowerValue
+			self.upperValue = upperValue
+			self.update()
+
+	def setSpan(self, span):
+		# the session time shown across the width
+		span = max(int(span), 1)
+		if span != self.span:
+			self.span = span
+			self.rebuild()
+
+	def clear(self):
+		self.playheadColumn = None
+		self.rebuild()
+
+	def rebuild(self):
+		width = max(self.width(), 1)
+		self.columnMin = np.full(width, np.inf)
+		self.columnMax = np.full(width, -np.inf)
+		self.columnLast = np.full(width, np.nan)
+		self.columnMarker = np.zeros(width, dtype=bool)
+		self.seenSamples = 0
+		self.seenMarkers = 0
+		self.addRows()
+		self.update()
+
+	def columnsOf(self, times):
+		return np.clip(times * len(self.columnMin) // self.span, 0, len(self.columnMin) - 1).astype(np.int64)
+
+	def addRows(self):
+		# takes the rows appended since the last call into the columns, returns the range of changed columns or None
+		times, values = self.samples.view("time", "value")
+		markerTimes, markerValues = self.markers.view("time", "value")
+		if len(times) < self.seenSamples or len(markerTimes) < self.seenMarkers:
+			# the stores were cleared
+			self.rebuild()
+			return None
+		times, values = times[self.seenSamples:], values[self.seenSamples:]
+		markerTimes = markerTimes[self.seenMarkers:][markerValues[self.seenMarkers:] == 1]
+		if len(times) == 0 and len(markerTimes) == 0:
+			return None
+		latest = max(times.max() if len(times) > 0 else 0, markerTimes.max() if len(markerTimes) > 0 else 0)
+		if latest >= self.span:
+			# the session outgrew the plot, doubling the span keeps the rebuilds rare
+			while latest >= self.span:
+				self.span *= 2
+			self.rebuild()
+			return None
+		self.seenSamples += len(times)
+		self.seenMarkers = len(markerValues)
+		changed = []
+		if len(times) > 0:
+			columns, minimum, maximum, last = reduceColumns(self.columnsOf(times), values)
+			self.columnMin[columns] = np.minimum(self.columnMin[columns], minimum)
+			self.columnMax[columns] = np.maximum(self.columnMax[columns], maximum)
+			self.columnLast[columns] = last
+			changed.append(columns)
+		if len(markerTimes) > 0:
+			columns = self.columnsOf(markerTimes)
+			self.columnMarker[columns] = True
+			changed.append(columns)
+		changed = np.concatenate(changed)
+		# the next column is joined to the changed ones, so it is repainted too
+		return int(changed.min()), min(int(changed.max()) + 1, len(self.columnMin) - 1)
+
+	def refresh(self):
+		changed = self.addRows()
+		if changed is not None:
+			self.updateColumns(*changed)
+
+	def updateColumns(self, first, last):
+		self.update(QtCore.QRect(first, 0, last - first + 1, self.height()))
+
+	def setPlayhead(self, sessionTime):
+		column = int(self.columnsOf(np.int64(sessionTime))) if sessionTime is not None else None
+		if column != self.playheadColumn:
+			for previous in [self.playheadColumn, column]:
+				if previous is not None:
+					self.updateColumns(previous, previous)
+			self.playheadColumn = column
+
+	def valueToY(self, values):
+		span = (self.upperValue - self.lowerValue) or 1
+		return MARGIN + (self.upperValue - values) / span * (self.height() - 2 * MARGIN)
+
+	def paintEvent(self, event):
+		rect = event.rect()
+		first = max(rect.left(), 0)
+		last = min(rect.right(), len(self.columnMin) - 1)
+		painter = QtGui.QPainter(self)
+		painter.fillRect(rect, self.palette().color(QtGui.QPalette.Base))
+		painter.setPen(self.gridColor)
+		for value in {self.lowerValue, self.upperValue, 0 if self.lowerValue < 0 < self.upperValue else self.lowerValue}:
+			y = int(self.valueToY(value))
+			painter.drawLine(rect.left(), y, rect.right(), y)
+		if first <= last:
+			markers = np.flatnonzero(self.columnMarker[first:last + 1]) + first
+			if len(markers) > 0:
+				painter.setPen(self.markerColor)
+				painter.drawLines([QtCore.QLineF(x, 0, x, self.height()) for x in markers.tolist()])
+			# every column is drawn from its min to its max, stretched to the last value of the column before so the line stays connected
+			start = max(first - 1, 0)
+			low, high = self.columnMin[start:last + 1], self.columnMax[start:last + 1]
+			previous = np.concatenate(([np.nan], self.columnLast[start:last]))
+			low = np.fmin(low, previous)
+			high = np.fmax(high, previous)
+			columns = np.flatnonzero(np.isfinite(low) & (self.columnMax[start:last + 1] >= self.columnMin[start:last + 1]))
+			if len(columns) > 0:
+				top = self.valueToY(high[columns]).tolist()
+				bottom = self.valueToY(low[columns]).tolist()
+				painter.setPen(self.lineColor)
+				painter.drawLines([QtCore.QLineF(x + 0.5, y0, x + 0.5, y1 + 1) for x, y0, y1 in zip((columns + start).tolist(), top, bottom)])
+		if self.playheadColumn is not None and first <= self.playheadColumn <= last:
+			painter.setPen(self.playheadColor)
+			painter.drawLine(self.playheadColumn, 0, self.playheadColumn, self.height())
+		painter.end()
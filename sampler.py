@@ -0,0 +1,72 @@
+import threading, time
+
+# rates offered in the settings dialog, in samples per second
+SAMPLE_RATES = [10, 50, 100]
+DEFAULT_SAMPLE_RATE = 10
+
+class RatingSampler(object):
+	# Records the current rating on its own thread at a fixed rate while the video plays,
+	# and immediately whenever the rating changes. Every sample is stamped with the media
+	# time in ms and with time.monotonic(), so it does not depend on the GUI event loop.
+
+	def __init__(self, mediaTime, isPlaying, sink, rate=DEFAULT_SAMPLE_RATE):
+		self.mediaTime = mediaTime # callable returning the media time in ms at a time.monotonic() time, safe to call from any thread
+		self.isPlaying = isPlaying # callable returning True while the player is playing
+		self.sink = sink # called with (media time, rating, monotonic time) for every sample
+		self.rating = 0
+		self.lock = threading.Lock()
+		self.stopEvent = threading.Event()
+		self.thread = None
+		self.setRate(rate)
+
+	def setRate(self, rate):
+		rate = float(rate)
+		if rate <= 0:
+			raise ValueError("The sample rate must be greater than 0, not " + str(rate))
+		self.rate = rate
+		self.interval = 1.0 / rate
+
+	def start(self):
+		if self.thread is None or not self.thread.is_alive():
+			self.stopEvent.clear()
+			self.thread = threading.Thread(target=self.run, name="RatingSampler", daemon=True)
+			self.thread.start()
+
+	def stop(self):
+		self.stopEvent.set()
+		if self.thread is not None:
+			self.thread.join()
+			self.thread = None
+
+	def run(self):
+		# sleep until absolute deadlines so the rate does not drift with the time spent sampling
+		deadline = time.monotonic()
+		while True:
+			deadline += self.interval
+			delay = deadline - time.monotonic()
+			if delay < 0:
+				# we fell behind (e.g. the machine was suspended), skip the missed ticks instead of bursting
+				deadline = time.monotonic()
+				delay = 0
+			if self.stopEvent.wait(delay):
+				break
+			if self.isPlaying():
+				self.sample()
+
+	def sample(self, monotonicTime=None):
+		with self.lock:
+			if monotonicTime is None:
+				monotonicTime = time.monotonic()
+			# stamped with the media time at the moment of the change, not at the moment it is recorded
+			mediaTime = self.mediaTime(monotonicTime)
+			self.sink(mediaTime, self.rating, monotonicTime)
+			return mediaTime
+
+	def setRating(self, rating, monotonicTime=None):
+		# record rating changes right away instead of waiting for the next tick. monotonicTime is when
+		# the change happened if it is known better than now, e.g. from the timestamp of an input device event
+		with self.lock:
+			changed = rating != self.rating
+			self.rating = rating
+		if changed and self.isPlaying():
+			self.sample(monotonicTime)
@@ -0,0 +1,133 @@
+import threading
+import numpy as np
+
+# columns of the stores used by the app: media time in ms, value, monotonic time in seconds
+SAMPLE_COLUMNS = [("time", np.int64), ("value", np.float64), ("monotonic", np.float64)]
+MARKER_COLUMNS = [("time", np.int64), ("value", np.int8)]
+
+class ColumnStore(object):
+	# Append-only columnar storage backed by one preallocated NumPy buffer with a field per column, so appending
+	# a row is a single assignment. When the buffer is full it is replaced by one twice as large, so appends are
+	# amortized O(1). Rows are never written twice and grown buffers are copies, which means a view taken with
+	# view() stays valid and unchanged while new rows are appended from another thread.
+	# There is one writing thread: append() writes the row past self.length and only then raises it, and takes
+	# the lock only to grow the buffer, everything else takes the lock so view() never mixes two sessions.
+
+	def __init__(self, columns, capacity=1024):
+		self.columns = [name for name, dtype in columns]
+		self.dtype = np.dtype(columns)
+		self.lock = threading.Lock()
+		self.clear(capacity)
+
+	def clear(self, capacity=1024):
+		with self.lock:
+			self.length = 0
+			self.rows = np.empty(max(1, int(capacity)), dtype=self.dtype)
+
+	def __len__(self):
+		return self.length
+
+	def capacity(self):
+		return len(self.rows)
+
+	def reserve(self, capacity):
+		with self.lock:
+			if capacity > len(self.rows):
+				self.resize(int(capacity))
+
+	def resize(self, capacity):
+		# the lock must be held by the caller
+		rows = np.empty(capacity, dtype=self.dtype)
+		rows[:self.length] = self.rows[:self.length]
+		self.rows = rows
+
+	def append(self, *row):
+		length = self.length
+		if length == len(self.rows):
+			with self.lock:
+				self.resize(2 * length)
+		self.rows[length] = row
+		self.length = length + 1
+
+	def extend(self, *columns):
+		# append whole columns at once, all columns need to have the same length
+		count = len(columns[0])
+		with self.lock:
+			if self.length + count > len(self.rows):
+				self.resize(max(2 * len(self.rows), self.length + count))
+			for name, column in zip(self.columns, columns):
+				self.rows[name][self.length:self.length + count] = column
+			self.length += count
+
+	def view(self, *names):
+		# zero-copy, read-only slices of the requested columns (all columns if none are given)
+		with self.lock:
+			rows = self.rows
+			length = self.length
+		views = []
+		for name in names or self.columns:
+			column = rows[name][:length]
+			column.flags.writeable = False
+			views.append(column)
+		return views
+
+	def nbytes(self):
+		return self.rows.nbytes
+
+class SampleStore(ColumnStore):
+
+	def __init__(self, capacity=1024):
+		super(SampleStore, self).__init__(SAMPLE_COLUMNS, capacity)
+
+	def preallocate(self, durationMs, rate):
+		# room for a whole session at the sample rate plus the samples recorded on every rating change
+		self.clear(int(durationMs / 1000.0 * rate * 1.25) + 1024)
+
+class MarkerStore(ColumnStore):
+
+	def __init__(self, capacity=256):
+		super(MarkerStore, self).__init__(MARKER_COLUMNS, capacity)
+
+def lastValuePerTimestamp(times, values):
+	# Sorts the samples by time and keeps the value recorded last for every timestamp.
+	# The sampler appends in time order, so the sort is skipped unless the user seeked backwards.
+	if len(times) > 1 and not np.all(times[1:] >= times[:-1]):
+		# a stable sort keeps samples with the same time in recording order
+		order = np.argsort(times, kind="stable")
+		times = times[order]
+		values = values[order]
+	last = np.ones(len(times), dtype=bool)
+	last[:-1] = times[1:] != times[:-1]
+	return times[last], values[last]
+
+def alignMarkers(times, markerTimes, markerValues):
+	# Merge-join of the markers onto the sorted, unique sample times.
+	# Returns a boolean column that is True on every row that has a marker.
+	markerTimes, markerValues = lastValuePerTimestamp(markerTimes, markerValues)
+	markerTimes = markerTimes[markerValues == 1]
+	rows = np.searchsorted(times, markerTimes)
+	found = rows < len(times)
+	found[found] = times[rows[found]] == markerTimes[found]
+	hasMarker = np.zeros(len(times), dtype=bool)
+	hasMarker[rows[found]] = True
+	return hasMarker
+
+def mergeStreams(streams):
+	# Puts reduced (times, values) streams, e.g. of several raters, on the union of their timestamps. Every column
+	# holds the last value of its stream at or before each time and NaN before the first value of the stream.
+	if len(streams) == 0:
+		return np.zeros(0, dtype=np.int64), []
+	times = np.unique(np.concatenate([streamTimes for streamTimes, streamValues in streams]))
+	columns = []
+	for streamTimes, streamValues in streams:
+		rows = np.searchsorted(streamTimes, times, side="right") - 1
+		column = np.full(len(times), np.nan)
+		column[rows >= 0] = streamValues[rows[rows >= 0]]
+		columns.append(column)
+	return times, columns
+
+def reduceSession(samples, markers):
+	# the x (time), y (rating) and marker columns of the export, computed in a single sort-and-reduce pass
+	times, values = lastValuePerTimestamp(*samples.view("time", "value"))
+	hasMarker = alignMarkers(times, *markers.view("time", "value"))
+	return times, values, hasMarker
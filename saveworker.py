@@ -0,0 +1,206 @@
+import os, json, time, threading
+from collections import namedtuple
+import numpy as np
+from PyQt5 import QtCore
+from samplestore import lastValuePerTimestamp, alignMarkers, mergeStreams
+from exporters import ExportData, ExportResult, ExportCancelled, COLUMNS, markerPositionForRange, exporterByName, metadataFilename, reportProgress
+from exporters import INCREMENTAL_EXTENSION, incrementalFilename
+
+class SaveSnapshot(namedtuple("SaveSnapshot", ["filename", "format", "samples", "markers", "timeFactor", "lowerValue", "upperValue", "metadata", "raters", "incremental"])):
+	# Immutable copy of everything a save needs. samples and markers are the read-only views of the
+	# stores, which stay unchanged while the sampler keeps appending, so taking a snapshot costs nothing.
+	# raters are (name, store) of the other raters of a multi-rater session.
+	# With an IncrementalSave only the rows after its high-water marks are appended to its file instead of exporting.
+
+	@classmethod
+	def take(cls, filename, format, samples, markers, timeFactor, lowerValue, upperValue, metadata=None, raters=None, incremental=None):
+		return cls(incremental.filename if incremental is not None else filename, format, samples.view("time", "value"), markers.view("time", "value"),
+			timeFactor, lowerValue, upperValue, metadata, [(name, store.view("time", "value")) for name, store in (raters or [])], incremental)
+
+	def sampleCount(self):
+		return len(self.samples[0])
+
+	def markerCount(self):
+		return len(self.markers[0])
+
+	def exportData(self):
+		# Only take the latest value for every timestamp and line the markers up with it
+		times, values = lastValuePerTimestamp(*self.samples)
+		raters = None
+		if self.raters:
+			# one column per rater on the timestamps of all of them
+			times, columns = mergeStreams([(times, values)] + [lastValuePerTimestamp(*stream) for name, stream in self.raters])
+			values = columns[0]
+			raters = [(name, column) for (name, stream), column in zip(self.raters, columns[1:])]
+		hasMarker = alignMarkers(times, *self.markers)
+		return ExportData(times * self.timeFactor, values, hasMarker, markerPositionForRange(self.lowerValue, self.upperValue),
+			self.lowerValue, self.upperValue, self.metadata, raters)
+
+class IncrementalSave(object):
+	# Intermediate saves of a long session: every save appends only the rows recorded since the previous one to a CSV
+	# file, so a save costs the same at the end of the session as at its start. The high-water marks are the number of
+	# rows of each store that are already in the file. The rows are "time_ms,rating,marker,rater" with the rater
+	# empty for the ratings of this app. After a seek backwards a time can appear again in a later save, the later row
+	# wins, so every row holds the whole state at its time: the latest rating and whether a marker is set. A marker set
+	# or cleared after its sample was saved gets a row with the rating already saved for that time, or without rating
+	# if no sample has that time. The full export with its chart is written separately at the end of the session.
+	# Only used from the save task, and the BackgroundSaver runs one task at a time.
+
+	def __init__(self, filename):
+		self.filename = filename
+		self.sampleMark = 0
+		self.markerMark = 0
+		self.raterMarks = {}
+		self.rows = 0
+		self.saves = 0
+
+	def isStarted(self):
+		return self.saves > 0
+
+	def append(self, snapshot, progress=None, cancelled=None):
+		start = time.perf_counter()
+		reportProgress(progress, cancelled, 0, 1)
+		sampleTimes, sampleValues = snapshot.samples
+		markerTimes, markerValues = snapshot.markers
+		# stores that got shorter were cleared, they start over
+		sampleMark = self.sampleMark if self.sampleMark <= len(sampleTimes) else 0
+		markerMark = self.markerMark if self.markerMark <= len(markerTimes) else 0
+		times, values = lastValuePerTimestamp(sampleTimes[sampleMark:], sampleValues[sampleMark:])
+		# the markers are few, all of them are aligned so a time saved again keeps its marker
+		hasMarker = alignMarkers(times, markerTimes, markerValues)
+		# markers set or cleared since the last save at times without a new sample
+		changed = np.unique(markerTimes[markerMark:])
+		changed = changed[~np.isin(changed, times)]
+		if len(changed) > 0:
+			changedMarker = alignMarkers(changed, markerTimes, markerValues)
+			# the rating of those times was saved before, it is written again so the row does not erase it
+			earlier = np.isin(sampleTimes[:sampleMark], changed)
+			knownTimes, knownValues = lastValuePerTimestamp(sampleTimes[:sampleMark][earlier], sampleValues[:sampleMark][earlier])
+			changedValues = np.full(len(changed), np.nan)
+			changedValues[np.isin(changed, knownTimes)] = knownValues
+			order = np.argsort(np.concatenate((times, changed)), kind="stable")
+			times = np.concatenate((times, changed))[order]
+			values = np.concatenate((values, changedValues))[order]
+			hasMarker = np.concatenate((hasMarker, changedMarker))[order]
+		times = times * snapshot.timeFactor
+		lines = [f"{ms},{'' if value != value else format(value, 'g')},{int(marker)},\n" for ms, value, marker in zip(times.tolist(), values.tolist(), hasMarker.tolist())]
+		raterMarks = {}
+		for name, (raterTimes, raterValues) in snapshot.raters:
+			mark = self.raterMarks.get(name, 0)
+			mark = mark if mark <= len(raterTimes) else 0
+			reducedTimes, reducedValues = lastValuePerTimestamp(raterTimes[mark:], raterValues[mark:])
+			lines += [f"{ms},{value:g},0,{name}\n" for ms, value in zip((reducedTimes * snapshot.timeFactor).tolist(), reducedValues.tolist())]
+			raterMarks[name] = len(raterTimes)
+		reportProgress(progress, cancelled, 0.5, 1)
+		# the file is started over by the first save of this session
+		with open(self.filename, "a" if self.isStarted() else "w", newline="", encoding="utf-8") as file:
+			if not self.isStarted():
+				file.write(",".join(COLUMNS + ["rater"]) + "\n")
+			file.write("".join(lines))
+		if snapshot.metadata:
+			partial = metadataFilename(self.filename) + ".partial"
+			with open(partial, "w", encoding="utf-8") as file:
+				json.dump(snapshot.metadata, file, indent=1)
+			os.replace(partial, metadataFilename(self.filename))
+		self.sampleMark = len(sampleTimes)
+		self.markerMark = len(markerTimes)
+		self.raterMarks.update(raterMarks)
+		self.rows += len(lines)
+		self.saves += 1
+		# written, too late to cancel
+		reportProgress(progress, None, 1, 1)
+		return ExportResult(self.filename, len(lines), time.perf_counter() - start)
+
+class SaveSignals(QtCore.QObject):
+	progress = QtCore.pyqtSignal(float)
+	saved = QtCore.pyqtSignal(object, object) # snapshot, ExportResult
+	failed = QtCore.pyqtSignal(object, str) # snapshot, error message
+	cancelled = QtCore.pyqtSignal(object) # snapshot
+
+class SaveTask(QtCore.QRunnable):
+
+	def __init__(self, snapshot):
+		super(SaveTask, self).__init__()
+		self.snapshot = snapshot
+		self.signals = SaveSignals()
+		self.cancelEvent = threading.Event()
+		self.setAutoDelete(False)
+
+	def cancel(self):
+		self.cancelEvent.set()
+
+	def run(self):
+		try:
+			if self.snapshot.incremental is not None:
+				result = self.snapshot.incremental.append(self.snapshot, self.signals.progress.emit, self.cancelEvent.is_set)
+			else:
+				exporter = exporterByName(self.snapshot.format)
+				result = exporter.write(self.snapshot.filename, self.snapshot.exportData(), self.signals.progress.emit, self.cancelEvent.is_set)
+		except ExportCancelled:
+			self.signals.cancelled.emit(self.snapshot)
+		except Exception as e:
+			self.signals.failed.emit(self.snapshot, str(e))
+		else:
+			self.signals.saved.emit(self.snapshot, result)
+
+class BackgroundSaver(QtCore.QObject):
+	# Runs one save at a time on the global thread pool. A save requested while another one is running
+	# replaces any save that is already waiting, so repeated requests are written once with the newest data.
+	started = QtCore.pyqtSignal(object)
+	progress = QtCore.pyqtSignal(float)
+	saved = QtCore.pyqtSignal(object, object)
+	failed = QtCore.pyqtSignal(object, str)
+	cancelled = QtCore.pyqtSignal(object)
+
+	def __init__(self, parent=None):
+		super(BackgroundSaver, self).__init__(parent)
+		self.task = None
+		self.pending = None
+
+	def isBusy(self):
+		return self.task is not None
+
+	def save(self, snapshot):
+		if self.task is not None:
+			self.pending = snapshot
+		else:
+			self.start(snapshot)
+
+	def start(self, snapshot):
+		self.task = SaveTask(snapshot)
+		self.task.signals.progress.connect(self.progress)
+		self.task.signals.saved.connect(self.taskSaved)
+		self.task.signals.failed.connect(self.taskFailed)
+		self.task.signals.cancelled.connect(self.taskCancelled)
+		self.started.emit(snapshot)
+		QtCore.QThreadPool.globalInstance().start(self.task)
+
+	def cancel(self):
+		self.pending = None
+		if self.task is not None:
+			self.task.cancel()
+
+	def wait(self):
+		# blocks until the running and the waiting saves are done, used when the app quits. The signals of the tasks are
+		# queued to this thread, whose event loop no longer runs after app.exec_() returned, so they are delivered here
+		while self.task is not None:
+			QtCore.QThreadPool.globalInstance().waitForDone()
+			QtCore.QCoreApplication.sendPostedEvents()
+
+	def taskSaved(self, snapshot, result):
+		self.saved.emit(snapshot, result)
+		self.next()
+
+	def taskFailed(self, snapshot, message):
+		self.failed.emit(snapshot, message)
+		self.next()
+
+	def taskCancelled(self, snapshot):
+		self.cancelled.emit(snapshot)
+		self.next()
+
+	def next(self):
+		self.task = None
+		if self.pending is not None:
+			snapshot, self.pending = self.pending, None
+			self.start(snapshot)
@@ -0,0 +1,106 @@
+import inspect, time
+from collections import deque
+from PyQt5 import QtCore
+import vlc
+from mediaclock import DEFAULT_RESYNC_THRESHOLD
+
+# libvlc 4 takes a fast flag with every seek, libvlc 3 only has the :input-fast-seek media option
+FAST_SEEK_PER_CALL = len(inspect.signature(vlc.libvlc_media_player_set_time).parameters) > 2
+FAST_SEEK_OPTION = ":input-fast-seek"
+
+# a seek counts as done when libvlc reports a time this close to the target after the seek was sent, the same
+# threshold the media clock takes a report as a jump at
+DEFAULT_TOLERANCE = DEFAULT_RESYNC_THRESHOLD
+# or after this many ms, libvlc does not report seeks while paused
+DEFAULT_TIMEOUT = 250
+
+class SeekScheduler(QtCore.QObject):
+	# Sends at most one seek to libvlc at a time. Seeks requested while one is in flight replace each other,
+	# so scrubbing and auto repeated skips end up as one seek to the latest target instead of a queue in libvlc.
+	# A seek is released by the first time report of the player near its target, or by the timeout. Reports are
+	# queued to the GUI thread, so the ones libvlc made before the latest seek was sent are ignored: they still show
+	# the old time and would release the seek and move the cached time back. Must be used from the GUI thread.
+
+	def __init__(self, mediaplayer, tolerance=DEFAULT_TOLERANCE, timeout=DEFAULT_TIMEOUT, parent=None):
+		super(SeekScheduler, self).__init__(parent)
+		self.mediaplayer = mediaplayer
+		self.tolerance = tolerance
+		self.inFlight = None # (target in ms, fast, time.monotonic() it was sent)
+		self.pending = None # (target in ms, fast)
+		self.sentAt = None # time.monotonic() the latest seek was sent
+		self.requested = 0
+		self.sent = 0
+		self.latencies = deque(maxlen=1000)
+		self.timer = QtCore.QTimer(self)
+		self.timer.setSingleShot(True)
+		self.timer.setInterval(timeout)
+		self.timer.timeout.connect(self.release)
+
+	def isBusy(self):
+		return self.inFlight is not None
+
+	def target(self):
+		# the time the player will end up at, None if no seek is waiting
+		if self.pending is not None:
+			return self.pending[0]
+		if self.inFlight is not None:
+			return self.inFlight[0]
+		return None
+
+	def seek(self, ms, fast=False):
+		self.requested += 1
+		if self.inFlight is not None:
+			self.pending = (int(ms), fast)
+		else:
+			self.send(int(ms), fast)
+
+	def send(self, ms, fast):
+		self.sent += 1
+		self.sentAt = time.monotonic()
+		self.inFlight = (ms, fast, self.sentAt)
+		if FAST_SEEK_PER_CALL:
+			self.mediaplayer.set_time(ms, fast)
+		else:
+			self.mediaplayer.set_time(ms)
+		self.timer.start()
+
+	def isStale(self, reportTime):
+		# True for a report libvlc made before the latest seek was sent
+		return self.sentAt is not None and reportTime < self.sentAt
+
+	def timeReported(self, ms, reportTime=None):
+		# called with every MediaPlayerTimeChanged and the time.monotonic() libvlc reported it at, returns False for
+		# times from before the latest seek. While libvlc seeks it can still report the old time, which is further
+		# from the target than the tolerance unless the seek is shorter than that.
+		if self.isStale(time.monotonic() if reportTime is None else reportTime):
+			return False
+		if self.inFlight is None:
+			return True
+		if abs(ms - self.inFlight[0]) > self.tolerance:
+			return False
+		self.release()
+		# the time of a seek that was waiting for this one is already cached
+		return self.inFlight is None
+
+	def release(self):
+		if self.inFlight is None:
+			return
+		self.latencies.append(time.monotonic() - self.inFlight[2])
+		self.inFlight = None
+		self.timer.stop()
+		if self.pending is not None:
+			(ms, fast), self.pending = self.pending, None
+			self.send(ms, fast)
+
+	def cancel(self):
+		self.pending = None
+		self.inFlight = None
+		self.sentAt = None
+		self.timer.stop()
+
+	def stats(self):
+		# (seeks requested, seeks sent to libvlc, median and maximum time from sending a seek to its release in seconds)
+		ordered = sorted(self.latencies)
+		if len(ordered) == 0:
+			return self.requested, self.sent, None, None
+		return self.requested, self.sent, ordered[len(ordered) // 2], ordered[-1]
@@ -0,0 +1,253 @@
+import os, re, sys, json
+from collections import namedtuple
+from PyQt5 import QtCore
+from sampler import DEFAULT_SAMPLE_RATE
+from keyinput import DEFAULT_REPEAT_DELAY, DEFAULT_REPEAT_RATE
+from journal import DEFAULT_SYNC_INTERVAL, STALE_AFTER
+
+# The settings of the app, validated against SCHEMA when they are loaded. Every setting is an attribute of Settings,
+# so the code that runs on every tick or save reads a plain attribute instead of looking keys up in the JSON.
+# The sources, from the lowest to the highest precedence:
+#   the defaults in SCHEMA
+#   default.json next to the bundled app, next to the executable and in the user config directory
+#   PSYCHOMETRICSTUDY_<SETTING> environment variables, e.g. PSYCHOMETRICSTUDY_SAMPLE_RATE=50
+#   --set <setting>=<value> arguments, e.g. --set lowerSliderValue=-5
+# Values from the environment and the command line are read as JSON, or as a string if they are no valid JSON.
+
+SETTINGS_FILENAME = "default.json"
+ENVIRONMENT_PREFIX = "PSYCHOMETRICSTUDY_"
+ARGUMENT = "--set"
+RELOAD_DELAY = 300 # ms, editors write a file in more than one step
+RANGE_LIMIT = 10 # the range dialog goes from -10 to 10
+
+class SettingsError(Exception):
+	pass
+
+# type is a tuple of the accepted JSON types, with None for null. check raises ValueError for a value of the right type
+# that is still invalid. live settings are applied while the app runs when a file changes, the others after a restart.
+Setting = namedtuple("Setting", ["name", "type", "default", "check", "live"])
+
+def positive(value):
+	if value <= 0:
+		raise ValueError("must be greater than 0")
+
+def notNegative(value):
+	if value < 0:
+		raise ValueError("must not be negative")
+
+def inRange(value):
+	if not -RANGE_LIMIT <= value <= RANGE_LIMIT:
+		raise ValueError(f"must be between {-RANGE_LIMIT} and {RANGE_LIMIT}")
+
+def syncInterval(value):
+	# another instance recovers a journal that was not touched for STALE_AFTER seconds, a running app touches it every interval
+	positive(value)
+	if value > STALE_AFTER / 2:
+		raise ValueError(f"must not be greater than {STALE_AFTER / 2:g} seconds")
+
+def exportFormat(value):
+	import exporters
+	exporters.exporterByName(value)
+
+NUMBER = (int, float)
+SCHEMA = [
+	Setting("defaultVideoPath", (str, None), None, None, False),
+	Setting("defaultExcelPath", (str, None), None, None, False),
+	Setting("defaultExcelSaveFolder", (str, None), None, None, True),
+	Setting("playlist", (list, str, None), None, None, False),
+	Setting("lowerSliderValue", (int,), -10, inRange, True),
+	Setting("upperSliderValue", (int,), 10, inRange, True),
+	Setting("skipTimeInSec", NUMBER, 60, positive, True),
+	Setting("sampleRate", NUMBER, DEFAULT_SAMPLE_RATE, positive, True),
+	Setting("exportFormat", (str,), "xlsx", exportFormat, True),
+	Setting("keyRepeatDelay", (int,), DEFAULT_REPEAT_DELAY, notNegative, True),
+	Setting("keyRepeatRate", NUMBER, DEFAULT_REPEAT_RATE, positive, True),
+	Setting("autoReturnRatingsToZero", (bool,), False, None, True),
+	Setting("saveAfterPlaying", (bool,), True, None, True),
+	Setting("openExcelAfterSave", (bool,), False, None, True),
+	Setting("incrementalSave", (bool,), False, None, True),
+	Setting("journalSyncInterval", NUMBER, DEFAULT_SYNC_INTERVAL, syncInterval, True),
+	Setting("showLivePlot", (bool,), False, None, True),
+	Setting("livePlotHeight", (int,), 100, positive, True),
+	Setting("timelineIndex", (bool,), True, None, True),
+	Setting("timelineWorkers", (int, None), None, positive, False),
+	Setting("fastSeek", (bool,), False, None, False),
+	Setting("showLatencyOverlay", (bool,), False, None, False),
+	Setting("printPlaybackStats", (bool,), False, None, False),
+	Setting("inputDevice", (dict, None), None, None, False),
+	Setting("coordinator", (str, bool, None), None, None, False),
+]
+SCHEMA_BY_NAME = {setting.name: setting for setting in SCHEMA}
+
+TYPE_NAMES = {bool: "true or false", int: "an integer", float: "a number", str: "a string", list: "a list", dict: "an object", None: "null"}
+
+def isOfType(value, types):
+	if value is None:
+		return None in types
+	if isinstance(value, bool):
+		# JSON booleans are no numbers
+		return bool in types
+	return any(kind is not None and isinstance(value, kind) for kind in types)
+
+def validate(setting, value):
+	if not isOfType(value, setting.type):
+		names = [TYPE_NAMES[kind] for kind in setting.type if not (kind is float and int in setting.type)]
+		raise ValueError(f"must be {' or '.join(names)}, not {json.dumps(value)}")
+	if setting.check is not None and value is not None:
+		setting.check(value)
+
+def environmentName(name):
+	return ENVIRONMENT_PREFIX + re.sub(r"([A-Z])", r"_\1", name).upper()
+
+def parseValue(text):
+	try:
+		return json.loads(text)
+	except ValueError:
+		return text
+
+def readFile(path):
+	# the settings of one file, {} if it does not exist
+	if not os.path.isfile(path):
+		return {}
+	try:
+		with open(path, "r", encoding="utf-8-sig") as file:
+			values = json.load(file)
+	except (OSError, ValueError) as e:
+		raise SettingsError(f"{path} could not be read: {e}")
+	if not isinstance(values, dict):
+		raise SettingsError(f"{path} must contain a JSON object")
+	return values
+
+def environmentValues(environ):
+	return {setting.name: parseValue(environ[environmentName(setting.name)]) for setting in SCHEMA if environmentName(setting.name) in environ}
+
+def argumentValues(argv):
+	values = {}
+	for index, arg in enumerate(argv):
+		if arg == ARGUMENT and index + 1 < len(argv):
+			arg = ARGUMENT + "=" + argv[index + 1]
+		if arg.startswith(ARGUMENT + "="):
+			name, separator, value = arg[len(ARGUMENT) + 1:].partition("=")
+			values[name] = parseValue(value)
+	return values
+
+def settingsFiles(*directories):
+	# default.json in every directory, lowest precedence first, each file only once
+	files = []
+	for directory in directories:
+		path = os.path.join(directory, SETTINGS_FILENAME)
+		if os.path.realpath(path) not in [os.path.realpath(file) for file in files]:
+			files.append(path)
+	return files
+
+def loadSettings(files, environ=None, argv=None):
+	# never raises, settings with errors keep their defaults and the errors are in Settings.errors
+	settings = Settings()
+	layers = []
+	for path in files:
+		try:
+			layers.append((path, readFile(path)))
+		except SettingsError as e:
+			settings.errors.append(str(e))
+	layers.append(("environment", environmentValues(os.environ if environ is None else environ)))
+	layers.append(("command line", argumentValues(sys.argv[1:] if argv is None else argv)))
+	for source, values in layers:
+		for name, value in values.items():
+			setting = SCHEMA_BY_NAME.get(name)
+			if setting is None:
+				settings.errors.append(f"{source}: unknown setting {name}")
+				continue
+			try:
+				validate(setting, value)
+			except ValueError as e:
+				settings.errors.append(f"{source}: {name} {e}")
+				settings.invalid.add(name)
+				continue
+			setattr(settings, name, value)
+			settings.sources[name] = source
+	if settings.lowerSliderValue > settings.upperSliderValue:
+		settings.errors.append(f"lowerSliderValue {settings.lowerSliderValue} must not be greater than upperSliderValue {settings.upperSliderValue}")
+		settings.invalid.update(["lowerSliderValue", "upperSliderValue"])
+		settings.lowerSliderValue = SCHEMA_BY_NAME["lowerSliderValue"].default
+		settings.upperSliderValue = SCHEMA_BY_NAME["upperSliderValue"].default
+	return settings
+
+class Settings(object):
+	# every setting of SCHEMA as an attribute, sources tells which file or other source set it
+
+	def __init__(self):
+		for setting in SCHEMA:
+			setattr(self, setting.name, setting.default)
+		self.sources = {}
+		self.errors = []
+		self.invalid = set()
+
+	def isSet(self, name):
+		return name in self.sources
+
+	def directoryOf(self, name):
+		# relative paths in a setting are relative to the file that set it
+		source = self.sources.get(name)
+		return os.path.dirname(os.path.abspath(source)) if source is not None and os.path.isfile(source) else os.getcwd()
+
+	def changes(self, other):
+		# names of the settings with a different value in other
+		return [setting.name for setting in SCHEMA if getattr(self, setting.name) != getattr(other, setting.name)]
+
+class SettingsWatcher(QtCore.QObject):
+	# Loads the settings again when one of the files is changed, created or removed. reloaded is emitted with the new
+	# Settings and the names of the settings that changed, the window applies the live ones.
+	reloaded = QtCore.pyqtSignal(object, list)
+
+	def __init__(self, files, settings, parent=None):
+		super(SettingsWatcher, self).__init__(parent)
+		self.files = files
+		self.settings = settings
+		self.watcher = QtCore.QFileSystemWatcher(self)
+		self.watcher.fileChanged.connect(self.scheduleReload)
+		self.watcher.directoryChanged.connect(self.directoryChanged)
+		self.timer = QtCore.QTimer(self)
+		self.timer.setSingleShot(True)
+		self.timer.setInterval(RELOAD_DELAY)
+		self.timer.timeout.connect(self.reload)
+		self.watch()
+
+	def watch(self):
+		# editors often replace the file, which ends its watch, so the watches are set up again after every change.
+		# The directory of a missing file is watched to notice when it is created.
+		self.present = self.presentFiles()
+		paths = []
+		for path in self.files:
+			if os.path.isfile(path):
+				paths.append(path)
+			elif os.path.isdir(os.path.dirname(path)):
+				paths.append(os.path.dirname(path))
+		watched = self.watcher.files() + self.watcher.directories()
+		if len(watched) > 0:
+			self.watcher.removePaths(watched)
+		if len(paths) > 0:
+			self.watcher.addPaths(paths)
+
+	def presentFiles(self):
+		return [path for path in self.files if os.path.isfile(path)]
+
+	def directoryChanged(self, path):
+		# only a settings file that was created counts, the journals and exports written next to the app change
+		# the directory too
+		if self.presentFiles() != self.present:
+			self.scheduleReload(path)
+
+	def scheduleReload(self, path):
+		self.timer.start()
+
+	def reload(self):
+		self.watch()
+		settings = loadSettings(self.files)
+		# settings with errors keep their current value
+		for name in settings.invalid:
+			setattr(settings, name, getattr(self.settings, name))
+		changes = self.settings.changes(settings)
+		errors = settings.errors != self.settings.errors
+		self.settings = settings
+		if len(changes) > 0 or errors:
+			self.reloaded.emit(settings, changes)
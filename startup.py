@@ -0,0 +1,68 @@
+import sys, time, builtins, threading
+
+# Startup profile of the app for --profile-startup: the time of the imports of app.py per module and the phases until
+# the window is painted and the default video is loaded. Only the outermost import of a module is timed, the modules it
+# imports count towards it, so the import times add up to the time spent importing.
+# The report has one "phase <name> <ms>" line per phase and one "import <module> <ms>" line per module,
+# which is what benchmark.py startup reads.
+
+REPORT_IMPORTS = 15 # slowest modules in the report
+
+class StartupProfile(object):
+
+	def __init__(self):
+		self.start = time.perf_counter()
+		self.phases = [] # (name, seconds since start)
+		self.imports = {} # module -> seconds
+		self.depth = 0
+		self.originalImport = None
+		self.thread = threading.get_ident()
+		self.reported = False
+
+	def watchImports(self):
+		self.originalImport = builtins.__import__
+		builtins.__import__ = self.timedImport
+
+	def stopWatchingImports(self):
+		if self.originalImport is not None:
+			builtins.__import__ = self.originalImport
+			self.originalImport = None
+
+	def timedImport(self, name, *args, **kwargs):
+		# imports of other threads are not timed
+		if self.depth > 0 or threading.get_ident() != self.thread:
+			return self.originalImport(name, *args, **kwargs)
+		self.depth += 1
+		start = time.perf_counter()
+		try:
+			return self.originalImport(name, *args, **kwargs)
+		finally:
+			self.depth -= 1
+			self.imports[name] = self.imports.get(name, 0) + time.perf_counter() - start
+
+	def mark(self, phase):
+		self.phases.append((phase, time.perf_counter() - self.start))
+
+	def report(self):
+		lines = ["Startup profile, ms since app.py started:"]
+		previous = 0
+		for name, seconds in self.phases:
+			lines.append(f"phase  {name:<20} {seconds * 1000:9.1f} ms  (+{(seconds - previous) * 1000:.1f})")
+			previous = seconds
+		if len(self.imports) > 0:
+			lines.append(f"Slowest of {len(self.imports)} imported modules, {sum(self.imports.values()) * 1000:.1f} ms in total:")
+			for module, seconds in sorted(self.imports.items(), key=lambda item: -item[1])[:REPORT_IMPORTS]:
+				lines.append(f"import {module:<20} {seconds * 1000:9.1f} ms")
+		return "\n".join(lines)
+
+	def printReport(self, fallbackFilename=None):
+		# windowed apps on Windows have no stdout, their report goes to fallbackFilename
+		if self.reported:
+			return
+		self.reported = True
+		self.stopWatchingImports()
+		if sys.stdout is not None:
+			print(self.report(), flush=True)
+		elif fallbackFilename is not None:
+			with open(fallbackFilename, "w", encoding="utf-8") as file:
+				file.write(self.report() + "\n")
@@ -0,0 +1,215 @@
+import os, multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from PyQt5 import QtCore, QtGui, QtWidgets
+from timelineworker import initWorker, grabThumbnails, measureLoudness, LOUDNESS_RATE, SILENCE
+
+# Thumbnails and an audio loudness envelope of a video, for previews while hovering the position slider.
+# The video is decoded at low resolution by libvlc players in worker processes, never by the player of the
+# session (see timelineworker.py), and the result is cached on disk by the fingerprint of the video.
+
+THUMBNAIL_WIDTH = 160
+DEFAULT_THUMBNAIL_INTERVAL = 5.0 # seconds of video per thumbnail
+MAX_THUMBNAILS = 400
+THUMBNAILS_PER_TASK = 16
+MAX_CACHED_INDEXES = 50
+
+def thumbnailTimes(duration, interval=DEFAULT_THUMBNAIL_INTERVAL):
+	# one thumbnail from the middle of every interval, at most MAX_THUMBNAILS
+	count = int(min(max(duration / (interval * 1000), 1), MAX_THUMBNAILS))
+	step = duration / count
+	return (np.arange(count) * step + step / 2).astype(np.int64)
+
+def thumbnailSize(info):
+	# THUMBNAIL_WIDTH wide with the aspect ratio of the video track, 16:9 if it is unknown
+	for track in info.tracks:
+		if track.get("width") and track.get("height"):
+			return THUMBNAIL_WIDTH, max(2, int(THUMBNAIL_WIDTH * track["height"] / track["width"]) // 2 * 2)
+	return THUMBNAIL_WIDTH, 90
+
+class TimelineIndex(object):
+	# thumbnails is an (n, height, width, 3) sprite sheet with the thumbnail of times[i] at i, loudness the envelope in dBFS at rate values per second
+
+	def __init__(self, times, thumbnails, loudness, rate=LOUDNESS_RATE):
+		self.times = times
+		self.thumbnails = thumbnails
+		self.loudness = loudness
+		self.rate = rate
+
+	@classmethod
+	def load(cls, path):
+		with np.load(path) as data:
+			return cls(data["times"], data["thumbnails"], data["loudness"], int(data["rate"]))
+
+	def save(self, path):
+		partial = path + ".partial"
+		with open(partial, "wb") as file:
+			np.savez(file, times=self.times, thumbnails=self.thumbnails, loudness=self.loudness, rate=self.rate)
+		os.replace(partial, path)
+
+	def thumbnailAt(self, ms):
+		# index of the thumbnail closest to ms
+		if len(self.times) == 0:
+			return None
+		index = int(np.searchsorted(self.times, ms))
+		if index > 0 and (index == len(self.times) or ms - self.times[index - 1] < self.times[index] - ms):
+			index -= 1
+		return index
+
+	def loudnessAround(self, ms, seconds):
+		# the envelope from ms - seconds to ms + seconds, padded with silence outside of the video
+		center = int(ms * self.rate / 1000)
+		span = int(seconds * self.rate)
+		window = np.full(2 * span + 1, SILENCE, dtype=np.float32)
+		start, end = max(center - span, 0), min(center + span + 1, len(self.loudness))
+		if start < end:
+			window[start - (center - span):end - (center - span)] = self.loudness[start:end]
+		return window
+
+class TimelineIndexer(QtCore.QObject):
+	# Builds the TimelineIndex of a video in a process pool, or loads it from the cache. The thumbnails are
+	# split into small tasks so the progress moves and a cancel stops the workers at the next thumbnail.
+	progress = QtCore.pyqtSignal(float)
+	finished = QtCore.pyqtSignal(object, object) # path, TimelineIndex
+	failed = QtCore.pyqtSignal(str)
+	cancelled = QtCore.pyqtSignal()
+
+	taskDone = QtCore.pyqtSignal(object)
+
+	def __init__(self, cacheDirectory, workers=None, interval=DEFAULT_THUMBNAIL_INTERVAL, parent=None):
+		super(TimelineIndexer, self).__init__(parent)
+		self.cacheDirectory = cacheDirectory
+		self.workers = workers if workers is not None else max(1, min(4, (os.cpu_count() or 2) // 2))
+		self.interval = interval
+		# spawned workers do not inherit the threads of Qt and libvlc
+		self.context = multiprocessing.get_context("spawn")
+		self.executor = None
+		self.futures = []
+		self.taskDone.connect(self.handleTaskDone, QtCore.Qt.QueuedConnection)
+
+	def isBusy(self):
+		return self.executor is not None
+
+	def cachePath(self, info, width, height):
+		return os.path.join(self.cacheDirectory, f"{info.fingerprint}-{width}x{height}-{self.interval:g}s.npz")
+
+	def index(self, path, info):
+		# returns True if the index came from the cache and finished was already emitted
+		self.cancel(quiet=True)
+		if info.duration <= 0:
+			return False
+		width, height = thumbnailSize(info)
+		self.path = path
+		self.cacheFile = self.cachePath(info, width, height)
+		if os.path.isfile(self.cacheFile):
+			try:
+				index = TimelineIndex.load(self.cacheFile)
+				os.utime(self.cacheFile)
+				self.finished.emit(path, index)
+				return True
+			except (OSError, ValueError, KeyError) as e:
+				print(f"The timeline index {self.cacheFile} could not be read: {e}")
+		self.times = thumbnailTimes(info.duration, self.interval)
+		self.cancelEvent = self.context.Event()
+		self.executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=self.context, initializer=initWorker, initargs=(self.cancelEvent,))
+		self.futures = [self.executor.submit(measureLoudness, path)]
+		for start in range(0, len(self.times), THUMBNAILS_PER_TASK):
+			self.futures.append(self.executor.submit(grabThumbnails, path, self.times[start:start + THUMBNAILS_PER_TASK], width, height))
+		self.done = 0
+		self.progress.emit(0.0)
+		for future in self.futures:
+			# called on a thread of the executor
+			future.add_done_callback(self.taskDone.emit)
+		return False
+
+	def handleTaskDone(self, future):
+		if future not in self.futures or future.cancelled():
+			return
+		error = future.exception()
+		if error is not None:
+			self.cancel(quiet=True)
+			self.failed.emit(str(error))
+			return
+		self.done += 1
+		self.progress.emit(self.done / len(self.futures))
+		if self.done == len(self.futures):
+			results = [future.result() for future in self.futures]
+			self.shutdown()
+			index = TimelineIndex(self.times, np.concatenate(results[1:]), results[0])
+			self.store(index)
+			self.finished.emit(self.path, index)
+
+	def store(self, index):
+		try:
+			os.makedirs(self.cacheDirectory, exist_ok=True)
+			index.save(self.cacheFile)
+			cached = sorted((entry for entry in os.scandir(self.cacheDirectory) if entry.name.endswith(".npz")), key=lambda entry: entry.stat().st_mtime)
+			for entry in cached[:max(0, len(cached) - MAX_CACHED_INDEXES)]:
+				os.remove(entry.path)
+		except OSError as e:
+			print(f"The timeline index could not be cached: {e}")
+
+	def shutdown(self):
+		for future in self.futures:
+			future.cancel()
+		self.futures = []
+		if self.executor is not None:
+			self.executor.shutdown(wait=False)
+			self.executor = None
+
+	def cancel(self, quiet=False):
+		if self.executor is None:
+			return
+		# running tasks stop at their next thumbnail, pending ones never start
+		self.cancelEvent.set()
+		self.shutdown()
+		if not quiet:
+			self.cancelled.emit()
+
+class TimelinePreview(QtWidgets.QLabel):
+	# Tool tip window with the thumbnail, the loudness around the hovered time and the time itself
+	ENVELOPE_HEIGHT = 24
+	ENVELOPE_SECONDS = 10
+
+	def __init__(self, parent=None):
+		super(TimelinePreview, self).__init__(parent, QtCore.Qt.ToolTip | QtCore.Qt.FramelessWindowHint)
+		self.setAttribute(QtCore.Qt.WA_TransparentForMouseEvents)
+		self.shown = None
+
+	def showAt(self, index, ms, globalPos):
+		thumbnail = index.thumbnailAt(ms)
+		key = (id(index), thumbnail, int(ms) // 1000)
+		if key != self.shown:
+			self.shown = key
+			self.setPixmap(self.render(index, thumbnail, ms))
+			self.adjustSize()
+		self.move(globalPos.x() - self.width() // 2, globalPos.y() - self.height() - 12)
+		self.show()
+
+	def render(self, index, thumbnail, ms):
+		height, width = index.thumbnails.shape[1:3] if len(index.thumbnails) > 0 else (0, THUMBNAIL_WIDTH)
+		pixmap = QtGui.QPixmap(width, height + self.ENVELOPE_HEIGHT + 18)
+		pixmap.fill(QtGui.QColor(0, 0, 0))
+		painter = QtGui.QPainter(pixmap)
+		if thumbnail is not None:
+			pixels = np.ascontiguousarray(index.thumbnails[thumbnail])
+			image = QtGui.QImage(pixels.data, width, height, width * 3, QtGui.QImage.Format_RGB888)
+			painter.drawImage(0, 0, image)
+		envelope = index.loudnessAround(ms, self.ENVELOPE_SECONDS)
+		if len(index.loudness) > 0:
+			painter.setPen(QtGui.QColor("#76BA1B"))
+			bottom = height + self.ENVELOPE_HEIGHT
+			for x in range(width):
+				level = (envelope[x * len(envelope) // width] - SILENCE) / -SILENCE
+				painter.drawLine(x, bottom, x, bottom - int(level * self.ENVELOPE_HEIGHT))
+			painter.setPen(QtGui.QColor("#F5BD0A"))
+			painter.drawLine(width // 2, height, width // 2, bottom)
+		painter.setPen(QtGui.QColor(255, 255, 255))
+		seconds = int(ms / 1000)
+		painter.drawText(QtCore.QRect(0, height + self.ENVELOPE_HEIGHT, width, 18), QtCore.Qt.AlignCenter, f"{seconds // 3600}:{seconds // 60 % 60:02d}:{seconds % 60:02d}")
+		painter.end()
+		return pixmap
+
+	def hideEvent(self, event):
+		self.shown = None
+		super(TimelinePreview, self).hideEvent(event)
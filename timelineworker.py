@@ -0,0 +1,117 @@
+import os, time, ctypes, threading, tempfile, wave
+import numpy as np
+
+# The parts of the timeline index that run in the worker processes of TimelineIndexer. The workers are spawned,
+# so they import this module and not timeline.py: it does not depend on Qt and imports libvlc only when it is used.
+
+LOUDNESS_SAMPLE_RATE = 8000 # Hz, the audio is decoded at this rate for the envelope
+LOUDNESS_RATE = 10 # envelope values per second
+SILENCE = -60.0 # dBFS, lower levels are clamped to this
+FRAME_TIMEOUT = 3.0 # seconds to wait for a frame after a seek
+SEEK_TOLERANCE = 2500 # ms, frames this close to the target are taken, fast seeks land on keyframes
+
+class TimelineCancelled(Exception):
+	pass
+
+# set in the worker processes by initWorker
+cancelEvent = None
+
+def initWorker(event):
+	global cancelEvent
+	cancelEvent = event
+	# indexing must not take the CPU from the playback of the session
+	if hasattr(os, "nice"):
+		os.nice(10)
+
+def checkCancelled():
+	if cancelEvent is not None and cancelEvent.is_set():
+		raise TimelineCancelled()
+
+def grabThumbnails(path, times, width, height):
+	# runs in a worker process: seeks a headless player to every time and copies the next frame, (len(times), height, width, 3) RGB
+	import vlc
+	instance = vlc.Instance("--quiet", "--no-audio", "--no-spu", "--no-osd", "--no-video-title-show")
+	player = instance.media_player_new()
+	frame = (ctypes.c_ubyte * (width * height * 4))()
+	address = ctypes.addressof(frame)
+	frameLock = threading.Lock()
+	displayed = threading.Event()
+
+	# the decoder writes into frame between lock and unlock
+	@vlc.CallbackDecorators.VideoLockCb
+	def lock(opaque, planes):
+		frameLock.acquire()
+		planes[0] = address
+		return None
+
+	@vlc.CallbackDecorators.VideoUnlockCb
+	def unlock(opaque, picture, planes):
+		frameLock.release()
+
+	@vlc.CallbackDecorators.VideoDisplayCb
+	def display(opaque, picture):
+		displayed.set()
+
+	player.video_set_callbacks(lock, unlock, display, None)
+	player.video_set_format("RV32", width, height, width * 4)
+	media = instance.media_new(str(path))
+	media.add_option(":input-fast-seek")
+	player.set_media(media)
+	thumbnails = np.zeros((len(times), height, width, 3), dtype=np.uint8)
+	pixels = np.frombuffer(frame, dtype=np.uint8).reshape(height, width, 4)
+	player.play()
+	try:
+		for index, ms in enumerate(times):
+			checkCancelled()
+			player.set_time(int(ms))
+			deadline = time.monotonic() + FRAME_TIMEOUT
+			displayed.clear()
+			while time.monotonic() < deadline:
+				# frames decoded before the seek are skipped
+				if displayed.wait(0.05):
+					displayed.clear()
+					if abs(player.get_time() - ms) <= SEEK_TOLERANCE:
+						break
+			with frameLock:
+				# RV32 is BGRA in memory
+				thumbnails[index] = pixels[:, :, 2::-1]
+	finally:
+		player.stop()
+		player.release()
+		instance.release()
+	return thumbnails
+
+def measureLoudness(path, rate=LOUDNESS_RATE):
+	# runs in a worker process: libvlc transcodes the audio to a small WAV file, which is faster than playing it,
+	# and the envelope is the RMS level in dBFS of every 1/rate seconds
+	import vlc
+	with tempfile.TemporaryDirectory() as directory:
+		wavPath = os.path.join(directory, "audio.wav")
+		instance = vlc.Instance("--quiet")
+		media = instance.media_new(str(path))
+		media.add_option(f":sout=#transcode{{acodec=s16l,channels=1,samplerate={LOUDNESS_SAMPLE_RATE}}}:std{{access=file,mux=wav,dst=\"{wavPath}\"}}")
+		media.add_option(":no-sout-video")
+		player = instance.media_player_new()
+		player.set_media(media)
+		player.play()
+		try:
+			while player.get_state() not in (vlc.State.Ended, vlc.State.Error, vlc.State.Stopped):
+				checkCancelled()
+				time.sleep(0.05)
+		finally:
+			player.stop()
+			player.release()
+			instance.release()
+		try:
+			with wave.open(wavPath, "rb") as file:
+				samples = np.frombuffer(file.readframes(file.getnframes()), dtype="<i2")
+		except (OSError, EOFError, wave.Error):
+			# no audio track
+			return np.zeros(0, dtype=np.float32)
+	window = LOUDNESS_SAMPLE_RATE // rate
+	count = len(samples) // window
+	if count == 0:
+		return np.zeros(0, dtype=np.float32)
+	blocks = samples[:count * window].reshape(count, window).astype(np.float32) / 32768.0
+	rms = np.sqrt(np.mean(blocks * blocks, axis=1))
+	return np.maximum(20.0 * np.log10(np.maximum(rms, 1e-9)), SILENCE).astype(np.float32)